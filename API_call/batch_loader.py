@@ -0,0 +1,111 @@
+import asyncio
+import os
+import sys
+from collections import OrderedDict
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from logger import logger
+import API_call.response_cache as rc
+
+
+class BatchLoader:
+    """Sammelt gleichzeitige Einzelanfragen und lädt sie gebündelt (z. B. alle Filme einer Discover-Seite).
+
+    Anfragen werden `batch_window` Sekunden gesammelt oder bis `max_batch` Schlüssel zusammenkommen.
+    Unterklassen implementieren `_load_batch(session, keys)` und liefern ein Dict Schlüssel -> Ergebnis.
+    Ergebnisse erfolgreicher Batches werden (höchstens `max_entries`) im Speicher gehalten und je Schlüssel im
+    HTTP-Response-Cache unter `cache_url(key)` abgelegt: die Zusammensetzung eines Batches hängt vom Timing ab,
+    ein Cache je Batch-URL würde bei einem erneuten Lauf kaum treffen.
+    """
+
+    max_batch = 50
+
+    def __init__(self, fetch, batch_window=0.05, max_entries=4096):
+        self.fetch = fetch  # async fetch(session, url, params=..., schema=..., use_cache=...) -> dict, z. B. fetch_data
+        self.batch_window = batch_window
+        self.max_entries = max_entries
+        self.futures = {}  # Noch nicht beantwortete Schlüssel, gesendet oder nicht
+        self.pending = []  # Schlüssel für den nächsten Batch
+        self.session = None
+        self.flush_timer = None
+        self.tasks = set()  # Laufende Batch-Requests; die Referenz verhindert, dass sie vorzeitig eingesammelt werden
+        self.results = OrderedDict()
+
+    def cache_url(self, key):
+        """URL, unter der das Ergebnis eines einzelnen Schlüssels im Response-Cache liegt (None: nicht cachen)."""
+        return None
+
+    async def _cached(self, key):
+        cache = rc.get_response_cache()
+        url = self.cache_url(key)
+        return await cache.get_async(url) if cache and url else None
+
+    async def get(self, session, key):
+        if not key:
+            return None
+        if key in self.results:
+            self.results.move_to_end(key)
+            return self.results[key]
+        cached = await self._cached(key)
+        if cached and cached.fresh:
+            self._remember(key, cached.data)
+            return cached.data
+
+        future = self.futures.get(key)
+        if future is None:
+            future = self.futures[key] = asyncio.get_running_loop().create_future()
+            self.pending.append(key)
+            self.session = session
+            if len(self.pending) >= self.max_batch:
+                self._flush()
+            elif self.flush_timer is None:
+                self.flush_timer = asyncio.get_running_loop().call_later(self.batch_window, self._flush)
+        return await asyncio.shield(future)
+
+    def _flush(self):
+        if self.flush_timer is not None:
+            self.flush_timer.cancel()
+            self.flush_timer = None
+        batch, self.pending = self.pending, []
+        if batch:
+            task = asyncio.ensure_future(self._load(self.session, batch))
+            self.tasks.add(task)
+            task.add_done_callback(self.tasks.discard)
+
+    async def _load(self, session, batch):
+        try:
+            try:
+                results = await self._load_batch(session, batch)
+            except Exception as e:
+                logger.error(f"{type(self).__name__} batch request failed: {repr(e)}")
+                results = None
+            cache = rc.get_response_cache()
+            for key in batch:
+                if results is not None:  # Nur echte Antworten merken, Fehler sollen beim nächsten Mal erneut geladen werden
+                    result = results.get(key)
+                    self._remember(key, result)
+                    if cache and self.cache_url(key):
+                        await cache.put_async(self.cache_url(key), result)
+                else:  # Lieber eine abgelaufene Antwort als gar keine
+                    cached = await self._cached(key)
+                    result = cached.data if cached else None
+                self._resolve(key, result)
+            logger.debug("%s loaded %s keys in one request", type(self).__name__, len(batch))
+        finally:
+            for key in batch:  # Auch bei Abbruch oder unerwarteten Fehlern darf kein Aufrufer hängen bleiben
+                self._resolve(key, None)
+
+    def _resolve(self, key, result):
+        future = self.futures.pop(key, None)
+        if future is not None and not future.done():
+            future.set_result(result)
+
+    async def _load_batch(self, session, keys):
+        """Dict Schlüssel -> Ergebnis, oder None wenn der Request fehlgeschlagen ist."""
+        raise NotImplementedError
+
+    def _remember(self, key, result):
+        self.results[key] = result
+        self.results.move_to_end(key)
+        while len(self.results) > self.max_entries:
+            self.results.popitem(last=False)
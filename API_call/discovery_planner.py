@@ -0,0 +1,109 @@
+import asyncio
+import datetime
+import os
+import sys
+from dataclasses import dataclass, replace
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from logger import logger
+import API_call.get_Data_API_movie as api_movies
+
+TMDB_MAX_PAGES = 500  # TMDb liefert für Discover keine Seite jenseits von 500
+DEFAULT_START = datetime.date(1900, 1, 1)
+
+# Zusätzliche Genres, nach denen ein einzelner, noch zu großer Tag geteilt wird (mit / ohne Genre)
+SPLIT_GENRES = (35, 14, 10402, 18, 28, 878, 9648, 10749, 10770, 99, 36, 80, 53, 27, 37, 10752)
+
+
+def _aligned(low, high):
+    """Zahl in (low, high] mit den meisten abschließenden Null-Bits.
+
+    Ein Teilungspunkt auf einem festen Raster: er hängt kaum von `high` ab, deshalb bleiben die Partitionen (und ihre
+    Schlüssel im Checkpoint) von Lauf zu Lauf gleich, auch wenn der Katalog bis "heute" reicht.
+    """
+    return max(range(low + 1, high + 1), key=lambda number: number & -number)
+
+
+@dataclass(frozen=True)
+class Partition:
+    """Ausschnitt des Discover-Katalogs: Zeitraum von `primary_release_date` und optional zusätzliche Genre-Filter.
+
+    Ohne `end` ist die Partition nach oben offen (bis heute); ihr Schlüssel enthält dann kein Datum, das sich
+    täglich ändert.
+    """
+    start: datetime.date
+    end: datetime.date = None
+    with_genres: tuple = ()
+    without_genres: tuple = ()
+
+    @property
+    def key(self):
+        """Stabiler Name, z. B. für erledigte Seiten im Crawl-Checkpoint."""
+        key = f"{self.start:%Y-%m-%d}..{self.end:%Y-%m-%d}" if self.end else f"{self.start:%Y-%m-%d}.."
+        if self.with_genres:
+            key += "+" + ",".join(map(str, self.with_genres))
+        if self.without_genres:
+            key += "-" + ",".join(map(str, self.without_genres))
+        return key
+
+    def params(self, base_genres):
+        end = min(self.end or datetime.date.today(), datetime.date.today())  # Noch nicht erschienene Filme auslassen
+        params = {"primary_release_date.gte": f"{self.start:%Y-%m-%d}", "primary_release_date.lte": f"{end:%Y-%m-%d}",
+                  "with_genres": ",".join([base_genres, *map(str, self.with_genres)])}
+        if self.without_genres:
+            params["without_genres"] = ",".join(map(str, self.without_genres))
+        return params
+
+    def split(self):
+        """Zwei disjunkte Hälften: nach Jahr, Monat oder Tag an festen Grenzen (siehe `_aligned`), bei einem einzelnen
+        Tag nach dem nächsten Genre (mit / ohne). Die rechte Hälfte einer offenen Partition bleibt offen."""
+        start = self.start
+        end = self.end or datetime.date(datetime.date.today().year, 12, 31)
+        if start.year < end.year:
+            boundary = datetime.date(_aligned(start.year, end.year), 1, 1)
+        elif start.month < end.month:
+            boundary = datetime.date(start.year, _aligned(start.month - 1, end.month - 1) + 1, 1)
+        elif start.day < end.day:
+            boundary = datetime.date(start.year, start.month, _aligned(start.day - 1, end.day - 1) + 1)
+        else:
+            boundary = None
+        if boundary:
+            return [replace(self, end=boundary - datetime.timedelta(days=1)), replace(self, start=boundary)]
+        used = set(self.with_genres) | set(self.without_genres)
+        genre = next((genre for genre in SPLIT_GENRES if genre not in used), None)
+        if genre is None:
+            return None
+        return [replace(self, with_genres=self.with_genres + (genre,)),
+                replace(self, without_genres=self.without_genres + (genre,))]
+
+
+async def _plan(session, partition, max_pages):
+    data = await api_movies.fetch_discover_page(session, 1, partition=partition)
+    total_pages = data.get("total_pages", 0) if data else 0
+    if total_pages <= max_pages:
+        return [(partition, total_pages)] if total_pages else []
+
+    halves = partition.split()
+    if halves is None:
+        logger.warning(f"Partition {partition.key} still has {total_pages} pages, only the first {max_pages} are crawled")
+        return [(partition, max_pages)]
+    # Beide Hälften parallel planen; die Drosselung übernimmt der Request-Scheduler
+    plans = await asyncio.gather(*[_plan(session, half, max_pages) for half in halves])
+    return [entry for plan in plans for entry in plan]
+
+
+async def plan_partitions(session, start=DEFAULT_START, end=None, max_pages=TMDB_MAX_PAGES):
+    """Teilt den Discover-Katalog in Partitionen mit höchstens `max_pages` Seiten.
+
+    Von jeder Partition wird zuerst Seite 1 geladen, um `total_pages` zu kennen; zu große Partitionen werden
+    rekursiv halbiert. Seite 1 liegt danach im Response-Cache und wird beim Crawlen nicht erneut geladen.
+    Ohne `end` ist die letzte Partition offen (bis heute).
+
+    Returns:
+        list: (Partition, Seitenzahl) für alle nicht-leeren Partitionen, nach Datum sortiert
+    """
+    plan = await _plan(session, Partition(start, end), max_pages)
+    plan.sort(key=lambda entry: (entry[0].start, entry[0].key))
+    logger.info(f"Discovery plan: {len(plan)} partitions, {sum(pages for _, pages in plan)} pages "
+                f"between {start:%Y-%m-%d} and {f'{end:%Y-%m-%d}' if end else 'today'}")
+    return plan
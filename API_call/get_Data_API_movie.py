@@ -4,46 +4,146 @@ import os
 import aiohttp
 import asyncio
 import sys
-import pandas as pd
 import urllib 
+import time
 
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 from logger import logger
 import utils as u
+import metrics
+import API_call.request_scheduler as rs
+import API_call.response_cache as rc
+import API_call.json_codec as json_codec
+from API_call.single_flight import SingleFlight
+from API_call.omdb_key_pool import get_key_pool
+from API_call.wikidata_client import WikidataClient
+from API_call.wikipedia_client import WikipediaClient
+import Data.imdb_title_index as title_index
+import Data.crawl_checkpoint as cp
+from Data.movie_model import (Movie, OmdbRecord, WikipediaRecord, TMDB_DETAILS_FIELDS, TMDB_DISCOVER_FIELDS,
+                               OMDB_FIELDS)
 
 # Load environment variables
 load_dotenv()
 TMDB_API_KEY = os.getenv('TMDB_API_KEY')
-OMDB_API_KEY = os.getenv('OMDB_API_KEY2')
+# all: OMDb für jeden neuen Film; gaps: im Crawl kein OMDb, Bewertungen kommen sofort aus den IMDb-Datasets
+# (Data/imdb_datasets.py), die übrigen OMDb-Felder holt main_update nach
+OMDB_POLICY = os.getenv('omdb_policy', 'all')
+# "Movie not found!" nur kurz cachen: oft nur vorübergehend (z. B. frisch angelegte IMDb-Einträge)
+OMDB_NEGATIVE_TTL = int(os.getenv('omdb_negative_ttl', 6 * 3600))
 
 # Base TMDb URL for Kinderfilme
+KIDS_GENRES = "16,10751,12"  # Animation, Familie, Abenteuer (Komma = alle drei)
+TMDB_DISCOVER_URL = "https://api.themoviedb.org/3/discover/movie"
 BASE_TMDB_DISCOVER_URL = (
-    f"https://api.themoviedb.org/3/discover/movie?"
-    f"api_key={TMDB_API_KEY}&with_genres=16,10751,12"
+    f"{TMDB_DISCOVER_URL}?"
+    f"api_key={TMDB_API_KEY}&with_genres={KIDS_GENRES}"
     f"&include_adult=false&certification.lte=PG-13,G,PG"
 )
 
-async def fetch_data(session, url, retries=3, timeout=10):
+# Pro Endpoint nur die Felder dekodieren, die die Pipeline liest
+TMDB_DETAILS = json_codec.Schema("TmdbDetails", TMDB_DETAILS_FIELDS)
+TMDB_DISCOVER = json_codec.Schema("TmdbDiscover", TMDB_DISCOVER_FIELDS)
+TMDB_CHANGES = json_codec.Schema("TmdbChanges", {"total_pages": None, "results": [{"id": None}]})
+OMDB = json_codec.Schema("Omdb", OMDB_FIELDS)
+WIKIPEDIA_SEARCH = json_codec.Schema("WikipediaSearch", {"query": {"search": [{"title": None}]}})
+WIKIPEDIA_SUMMARY = json_codec.Schema("WikipediaSummary", {"extract": None, "content_urls": {"desktop": {"page": None}}})
+
+# Gemeinsame In-Flight-Deduplizierung für alle Requests dieses Prozesses
+inflight = SingleFlight()
+
+async def fetch_data(session, url, retries=3, timeout=None, params=None, use_cache=True, schema=None):
+    """Holt JSON von `url`; identische gleichzeitige Anfragen teilen sich einen Request (Ergebnis nicht verändern).
+
+    `timeout` ist ein `aiohttp.ClientTimeout`; ohne gelten die Timeouts der Session (siehe `http_session`).
+    Mit `schema` (`json_codec.Schema`) werden nur die darin genannten Felder dekodiert und gecacht; ein Endpoint
+    wird daher immer mit demselben Schema abgefragt.
+    """
+    return await inflight.do(
+        rc.cache_key(url, params),
+        lambda: _fetch_data(session, url, retries, timeout, params, use_cache, schema),
+        remember=use_cache,
+    )
+
+
+async def _fetch_data(session, url, retries, timeout, params, use_cache, schema):
+    upstream = rs.upstream_for(url)
+    cache = rc.get_response_cache() if use_cache else None
+    cached = await cache.get_async(url, params) if cache else None
+    if cached and cached.fresh:
+        metrics.registry.inc("http_cache_hits_total", upstream=upstream)
+        return cached.data
+
     for attempt in range(retries):
+        if attempt:
+            metrics.registry.inc("http_retries_total", upstream=upstream)
         try:
-            async with session.get(url, timeout=timeout) as response:
-                response.raise_for_status()
-                data = await response.json()
-                if data is None:  # Falls die API ein `null`-JSON schickt
-                    logger.warning(f"Received `None` response from {url}")
-                    return {}  # Sicherstellen, dass niemals `None` zurückkommt
-                return data  # Erfolgreiche Antwort zurückgeben
+            queued = time.perf_counter()
+            async with rs.scheduler.slot(url) as limiter:
+                metrics.registry.observe("scheduler_wait_seconds", time.perf_counter() - queued, upstream=upstream)
+                metrics.registry.gauge_add("http_in_flight", 1, upstream=upstream)
+                try:
+                    with metrics.timer("http_request_seconds", upstream=upstream):
+                        async with session.get(url, params=params, timeout=timeout or session.timeout, headers=rc.ResponseCache.validators(cached)) as response:
+                            metrics.registry.inc("http_responses_total", upstream=upstream, status=response.status)
+                            if response.status in (429, 503):
+                                delay = limiter.on_throttled(rs.parse_retry_after(response.headers.get("Retry-After")))
+                                logger.warning(f"HTTP {response.status} on attempt {attempt + 1}/{retries} for {url}, retry in {delay:.1f}s")
+                                continue  # Der Scheduler pausiert den Upstream bis zum nächsten Versuch
+                            if response.status == 304 and cached:  # Unverändert, gecachte Antwort weiterverwenden
+                                limiter.on_success()
+                                await cache.refresh_async(url, params)
+                                return cached.data
+                            if 400 <= response.status < 500:  # Client-Fehler: erneuter Versuch bringt nichts
+                                logger.error(f"HTTP {response.status} for {url}")
+                                error_body = await response.json(content_type=None) if response.content_type == "application/json" else {}
+                                return error_body if isinstance(error_body, dict) else {}
+                            response.raise_for_status()
+                            body = await response.read()
+                            metrics.registry.inc("http_bytes_received_total", len(body), upstream=upstream)
+                            with metrics.timer("json_decode_seconds", upstream=upstream):
+                                data = json_codec.decode(body, schema)
+                            limiter.on_success()
+                            if data is None:  # Falls die API ein `null`-JSON schickt
+                                logger.warning(f"Received `None` response from {url}")
+                                return {}  # Sicherstellen, dass niemals `None` zurückkommt
+                            if cache:
+                                await cache.put_async(url, data, response.headers, params)
+                            return data  # Erfolgreiche Antwort zurückgeben
+                finally:
+                    metrics.registry.gauge_add("http_in_flight", -1, upstream=upstream)
         except asyncio.TimeoutError:
+            metrics.registry.inc("http_timeouts_total", upstream=upstream)
             logger.error(f"Timeout error on attempt {attempt + 1}/{retries} for {url}")
         except aiohttp.ClientError as e:
+            metrics.registry.inc("http_client_errors_total", upstream=upstream)
             logger.error(f"Client error: {e} on {url}")
+        except json_codec.DecodeError as e:  # z. B. HTML-Fehlerseite eines Proxys
+            metrics.registry.inc("http_decode_errors_total", upstream=upstream)
+            logger.error(f"Invalid JSON from {url}: {e}")
 
-        await asyncio.sleep(2)  # Wait before retrying
+        with metrics.timer("retry_sleep_seconds", upstream=upstream):
+            await asyncio.sleep(2 ** attempt)  # Exponentielles Warten vor dem nächsten Versuch
     
+    metrics.registry.inc("http_failures_total", upstream=upstream)
+    if cached:  # Lieber eine abgelaufene Antwort als gar keine
+        logger.warning(f"All {retries} attempts failed for {url}. Using stale cached response.")
+        return cached.data
     logger.error(f"All {retries} attempts failed for {url}. Returning empty dictionary.")
     return {}  # IMMER `{}` zurückgeben, niemals `None`
 
 
+# Wikidata-Entities gebündelt (wbgetentities, bis zu 50 IDs pro Request)
+wikidata = WikidataClient(fetch_data)
+# Wikipedia-Einleitungen gebündelt (Action-API, bis zu 20 Titel pro Request)
+wikipedia_pages = WikipediaClient(fetch_data)
+
+
+def tmdb_details_url(tmdb_movie_id):
+    return f"https://api.themoviedb.org/3/movie/{tmdb_movie_id}?api_key={TMDB_API_KEY}&append_to_response=external_ids"
+
+
+@metrics.timed_stage("tmdb_details", failed=lambda data: not data)
 async def get_more_informations(session, tmdb_movie_id):
     """Holt IMDb-ID von TMDb."""
     try:
@@ -51,8 +151,8 @@ async def get_more_informations(session, tmdb_movie_id):
             logger.warning("Invalid TMDb movie ID: None or empty.")
             return {}
         
-        url = f"https://api.themoviedb.org/3/movie/{tmdb_movie_id}?api_key={TMDB_API_KEY}&append_to_response=external_ids"
-        data = await fetch_data(session, url)
+        url = tmdb_details_url(tmdb_movie_id)
+        data = await fetch_data(session, url, schema=TMDB_DETAILS)
         
         if not data:  # Falls `fetch_data` ein leeres Dictionary zurückgibt
             logger.warning(f"No valid data received from {url}")
@@ -63,109 +163,120 @@ async def get_more_informations(session, tmdb_movie_id):
             logger.warning(f"Movie with TMDb ID {tmdb_movie_id} is not released or not a film.")
             return {}
         
-        logger.debug(f"TMDb Response for {tmdb_movie_id}: {data}")
+        logger.debug("TMDb Response for %s: %s", tmdb_movie_id, data)
         return data
     except Exception as e:
         logger.error(f"Problem occurs in get_more_informations {str(e)}")
         return {}  # ✅ Fehlerfall abfangen, damit kein `None` zurückkommt
     
     
-async def get_movie_details(session, movie, task_id):
-    logger.info(f"[Task {task_id}] Starting to fetch details for movie: {movie.get('title')}")
-    tmdb_movie_id = movie.get("id")
+@metrics.timed_stage("movie_details", failed=lambda movie: movie.error is not None)
+async def get_movie_details(session, movie, task_id, checkpoint=None):
+    """Reichert einen `Movie` mit TMDb-Details, OMDb und Wikipedia an (Fehler landen in `movie.error`)."""
+    logger.info(f"[Task {task_id}] Starting to fetch details for movie: {movie.title}")
+    tmdb_movie_id = movie.id
     if not tmdb_movie_id:
-        logger.warning(f"[Task {task_id}] Skipping movie without TMDb ID: {movie}")
-        movie["error"] = "Missing TMDb ID"
+        logger.warning(f"[Task {task_id}] Skipping movie without TMDb ID: {movie.title}")
+        movie.error = "Missing TMDb ID"
         return movie
 
     data = await get_more_informations(session, tmdb_movie_id)
     if not data:
         logger.warning(f"[Task {task_id}] Skipping movie {tmdb_movie_id} - No Data found.")
-        movie["error"] = "No IMDb ID found"
+        movie.error = "No IMDb ID found"
         return movie
 
     await update_movie_data(session, movie, data)
-    movie["omdb_details"] = await fetch_movie_omdb_wiki(session, movie.get('title'), data.get('imdb_id'), data.get('wikidata_id'), task_id)
-    logger.debug(f"[Task {task_id}] Final movie details: {movie}")
+    if checkpoint:
+        await checkpoint.set_movie_stage(tmdb_movie_id, cp.STAGE_TMDB_DETAILS)
+    movie.omdb, movie.wikipedia = await fetch_movie_omdb_wiki(session, movie.title, movie.tmdb.imdb_id,
+                                                              movie.tmdb.wikidata_id, task_id,
+                                                              with_omdb=OMDB_POLICY != "gaps")
+    if checkpoint:
+        await checkpoint.set_movie_stage(tmdb_movie_id, cp.STAGE_OMDB_WIKI)
+    logger.debug("[Task %s] Final movie details: %s", task_id, movie)  # Lazy: wird nur bei DEBUG formatiert
     return movie
 
 
 async def get_imdb_from_wikidata(session, wikidata_id):
-    url = f"https://www.wikidata.org/wiki/Special:EntityData/{wikidata_id}.json"
-    
-    async with session.get(url) as response:
-        data = await response.json()
-        
-        try:
-            imdb_id = data["entities"][wikidata_id]["claims"]["P345"][0]["mainsnak"]["datavalue"]["value"]
-            logger.info(f"Extracted IMDb ID {imdb_id} from Wikidata ID {wikidata_id}")
-            return imdb_id
-        except KeyError as e:
-            logger.error(f"Problem by extracting imdb using wikidata {e}")
-            return None
+    entity = await wikidata.get(session, wikidata_id)
+    imdb_id = entity.get("imdb_id") if entity else None
+    if imdb_id:
+        logger.info(f"Extracted IMDb ID {imdb_id} from Wikidata ID {wikidata_id}")
+    else:
+        logger.error(f"Problem by extracting imdb using wikidata {wikidata_id}: no P345 claim")
+    return imdb_id
         
 async def update_movie_data(session, movie, data):
-    """ Aktualisiert das Movie-Dictionary mit fehlenden Informationen aus der API-Antwort. """
+    """ Ergänzt den TMDb-Teil eines `Movie` mit fehlenden Informationen aus der API-Antwort. """
     
-    if not isinstance(movie, dict):
-        logger.error("update_movie_data received an invalid movie object (None or not a dict).")
+    if not isinstance(movie, Movie):
+        logger.error("update_movie_data received an invalid movie object (None or not a Movie).")
         return
     
     if not isinstance(data, dict):
-        logger.error(f"update_movie_data received invalid data for movie {movie.get('id', 'Unknown')}")
+        logger.error(f"update_movie_data received invalid data for movie {movie.id}")
         return
     
-    # Liste von relevanten Schlüsseln, die übernommen werden sollen
-    keys_to_update = [
-        "genres", "budget", "imdb_id",
-        "homepage", "tagline", "status", "origin_country", "revenue",
-        "production_companies", "production_countries", "spoken_languages"
-    ]
-    
+    tmdb = movie.tmdb
     try:
-        for key in keys_to_update:
-            movie[key] = data.get(key)  # Ergänzen aus API-Daten
+        tmdb.update_details(data)  # Genres, Budget, IMDb-ID, Studios, ... aus den API-Daten
         
         # Falls external_ids existiert, IMDb ID extrahieren
         if "external_ids" in data:
-            movie['wikidata_id'] = data["external_ids"].get("wikidata_id")
-            if not movie.get("imdb_id"):  # Überprüfen, ob imdb_id fehlt
+            tmdb.wikidata_id = data["external_ids"].get("wikidata_id")
+            if not tmdb.imdb_id:  # Überprüfen, ob imdb_id fehlt
                 if  data["external_ids"].get("imdb_id") is not None:
-                    movie["imdb_id"] = data["external_ids"].get("imdb_id")
-                elif movie.get('wikidata_id'):
-                    logger.info(f"Trying to get IMDb from Wikidata: {movie['wikidata_id']}")
-                    movie["imdb_id"] = await get_imdb_from_wikidata(session, movie['wikidata_id'])
-                    logger.info(f"IMDb ID after Wikidata lookup: {movie['imdb_id']}")
+                    tmdb.imdb_id = data["external_ids"].get("imdb_id")
+                elif tmdb.wikidata_id:
+                    logger.info(f"Trying to get IMDb from Wikidata: {tmdb.wikidata_id}")
+                    tmdb.imdb_id = await get_imdb_from_wikidata(session, tmdb.wikidata_id)
+                    logger.info(f"IMDb ID after Wikidata lookup: {tmdb.imdb_id}")
                 else:
-                    movie["imdb_id"] = await get_missed_imdb_id(movie.get("title"))
+                    tmdb.imdb_id = await get_missed_imdb_id(tmdb.title)
         else:
-            logger.warning(f"External IDs not found for movie {movie.get('id', 'Unknown')}.")
+            logger.warning(f"External IDs not found for movie {movie.id}.")
 
     except Exception as e:
-        logger.error(f"Problem occurred: {str(e)} while updating data for movie {movie.get('id', 'Unknown')}.")
+        logger.error(f"Problem occurred: {str(e)} while updating data for movie {movie.id}.")
+
+async def fetch_discover_page(session, page, limit=20, partition=None):
+    """Eine Seite TMDb Discover, optional eingeschränkt auf eine Partition (siehe discovery_planner.py)."""
+    if partition is None:
+        return await fetch_data(session, f"{BASE_TMDB_DISCOVER_URL}&limit={limit}&page={page}", schema=TMDB_DISCOVER)
+    params = {"api_key": TMDB_API_KEY, "include_adult": "false", "certification.lte": "PG-13,G,PG",
+              **partition.params(KIDS_GENRES), "page": page}
+    return await fetch_data(session, TMDB_DISCOVER_URL, params=params, schema=TMDB_DISCOVER)
+
 
-async def get_kinder_movies_parallel(session, page, limit):
-    """Holt Kinderfilme von TMDb und verarbeitet sie parallel."""
+@metrics.timed_stage("discover_page", failed=lambda movies: movies is None)  # [] = nichts (Neues) auf der Seite
+async def get_kinder_movies_parallel(session, page, limit, checkpoint=None, partition=None):
+    """Holt Kinderfilme von TMDb und verarbeitet sie parallel (mit Checkpoint: bereits gespeicherte Filme werden übersprungen).
+
+    Gibt None zurück, wenn die Seite nicht geladen werden konnte (sie darf dann nicht als erledigt gelten),
+    eine leere Liste dagegen für eine Seite ohne (neue) Filme.
+    """
     
-    url = f"{BASE_TMDB_DISCOVER_URL}&limit={limit}&page={page}"
     try:
-        data = await fetch_data(session, url)
+        data = await fetch_discover_page(session, page, limit, partition)
         if not data:  # Falls `fetch_data` ein leeres Dictionary zurückgibt
-            logger.warning(f"No valid data received from {url}")
-            return []
+            logger.warning(f"No valid data received for discover page {page} {partition.key if partition else ''}")
+            return None
         
-        logger.debug(f"Raw API response: {data}")
-        movies = data.get('results', [])
+        logger.debug("Raw API response: %s", data)
+        # Nur die bekannten TMDb-Felder übernehmen (`genre_ids`, `video`, `adult` entfallen)
+        movies = [Movie.from_tmdb(result) for result in data.get('results', [])]
         if not movies:
             logger.warning(f"No results found for page {page}")
             return []
-        
-        for movie in movies:
-            movie.pop("genre_ids", None)  # Remove if exists
-            movie.pop("video", None)  # Remove if exists
-            movie.pop("adult", None)
 
-        tasks = [asyncio.create_task(get_movie_details(session, movie, task_id)) for task_id, movie in enumerate(movies)]
+        if checkpoint:
+            stored = await checkpoint.stored_movie_ids(movie.id for movie in movies if movie.id)
+            if stored:
+                logger.info(f"Page {page}: skipping {len(stored)} movies already stored in a previous run")
+            movies = [movie for movie in movies if movie.id not in stored]
+
+        tasks = [asyncio.create_task(get_movie_details(session, movie, task_id, checkpoint)) for task_id, movie in enumerate(movies)]
         results = await asyncio.gather(*tasks, return_exceptions=True)
 
         for result in results:
@@ -177,15 +288,61 @@ async def get_kinder_movies_parallel(session, page, limit):
     except aiohttp.ClientError as e:
         logger.error(f"Network error: {e}. Retrying...")
         await asyncio.sleep(1)
-        return []  # ✅ Rückgabe einer leeren Liste statt None
+        return None
 
     except KeyError as e:
         logger.error(f"Data parsing error: {e}.")
-        return []  # ✅ Rückgabe einer leeren Liste
+        return None
 
     except Exception as e:
         logger.error(f"Unexpected error: {repr(e)}.")
-        return []  # ✅ Rückgabe einer leeren Liste
+        return None
+
+async def get_changed_movie_ids(session, start_date, end_date):
+    """Holt alle TMDb-Film-IDs, die sich zwischen `start_date` und `end_date` (max. 14 Tage) geändert haben."""
+    url = (f"https://api.themoviedb.org/3/movie/changes?api_key={TMDB_API_KEY}"
+           f"&start_date={start_date:%Y-%m-%d}&end_date={end_date:%Y-%m-%d}")
+    first_page = await fetch_data(session, f"{url}&page=1", use_cache=False, schema=TMDB_CHANGES)
+    if not first_page:
+        logger.warning(f"No valid data received from TMDb changes between {start_date} and {end_date}")
+        return set()
+
+    pages = [first_page] + await asyncio.gather(
+        *[fetch_data(session, f"{url}&page={page}", use_cache=False, schema=TMDB_CHANGES) for page in range(2, first_page.get("total_pages", 1) + 1)]
+    )
+    changed_ids = {item["id"] for data in pages for item in data.get("results", []) if item.get("id")}
+    logger.info(f"{len(changed_ids)} movies changed on TMDb between {start_date:%Y-%m-%d} and {end_date:%Y-%m-%d}")
+    return changed_ids
+
+@metrics.timed_stage("omdb", failed=lambda data: data is None)
+async def fetch_omdb(session, imdb_id):
+    """Holt OMDb-Daten über den Key-Pool; gecachte Antworten verbrauchen kein Kontingent.
+
+    Gibt None zurück, wenn OMDb nicht verfügbar ist (alle Keys erschöpft, Request fehlgeschlagen). Das ist etwas
+    anderes als `Response: False` ("Movie not found!"): der Film bleibt offen und wird später erneut abgefragt.
+    """
+    url = f"http://www.omdbapi.com/?i={imdb_id}"
+    cache = rc.get_response_cache()
+    cached = await cache.get_async(url) if cache else None
+    if cached and cached.fresh:
+        return cached.data
+
+    omdb_keys = get_key_pool()
+    while (api_key := omdb_keys.acquire()) is not None:
+        # Ohne Cache/Memo im fetch_data, damit Fehlerantworten eines Keys nicht für den nächsten Key gelten
+        data = await fetch_data(session, f"{url}&apikey={api_key}", use_cache=False, schema=OMDB)
+        if omdb_keys.record(api_key, data):
+            if not data:  # fetch_data hat nach allen Versuchen aufgegeben
+                return cached.data if cached else None
+            if cache and data.get("Response") == "True":
+                await cache.put_async(url, data)
+            elif cache and data.get("Response") == "False":  # auch "Movie not found!" spart Kontingent, aber nur kurz
+                await cache.put_async(url, data, ttl=OMDB_NEGATIVE_TTL)
+            return data
+
+    logger.error(f"All OMDb API keys are exhausted for today, skipping OMDb for {imdb_id}.")
+    return cached.data if cached else None
+
 
 async def search_wikipedia(session, film_title):
     """Sucht den besten Wikipedia-Treffer für einen Filmtitel."""
@@ -197,12 +354,10 @@ async def search_wikipedia(session, film_title):
         "format": "json"
     }
     try:
-        async with session.get(base_url, params=params, timeout=10) as response:
-            response.raise_for_status()  # Falls z. B. 404 oder 500 kommt, wird hier eine Exception geworfen
-            data = await response.json()
-            if "query" in data and "search" in data["query"] and len(data["query"]["search"]) > 0:
-                return data["query"]["search"][0]["title"]
-            return ""
+        data = await fetch_data(session, base_url, params=params, schema=WIKIPEDIA_SEARCH)
+        if "query" in data and "search" in data["query"] and len(data["query"]["search"]) > 0:
+            return data["query"]["search"][0]["title"]
+        return ""
     
     except aiohttp.ClientError as e:
         logger.error(f"Wikipedia Search API error: {e}")
@@ -217,10 +372,10 @@ async def search_wikipedia(session, film_title):
         return ""
 
 async def get_wiki_beschreibung(session, film_titel):
-    """Holt die Wikipedia-Beschreibung für einen Filmtitel."""
-    url = f"https://en.wikipedia.org/api/rest_v1/page/summary/{film_titel}"
+    """Holt die Wikipedia-Beschreibung für einen Artikeltitel (einzeln über die REST-API)."""
+    url = f"https://en.wikipedia.org/api/rest_v1/page/summary/{u.get_title_abstract(film_titel)}"
     try:
-        data = await fetch_data(session, url)
+        data = await fetch_data(session, url, schema=WIKIPEDIA_SUMMARY)
         if not data:  # Falls `fetch_data` ein leeres Dictionary zurückgibt
             logger.warning(f"No valid data received from {url}")
             return "", ""
@@ -244,77 +399,72 @@ async def get_wiki_beschreibung(session, film_titel):
         logger.error(f"Unexpected error in Wikipedia get Beschreibung: {repr(e)}")
         return "", ""
 
-async def fetch_movie_omdb_wiki(session, title, imdb_id, wikidata_id, task_id):
-    """Holt Filmdetails von OMDb und Wikipedia parallel."""
-    movie_data = {}
-    
+@metrics.timed_stage("wikipedia")
+async def resolve_wikipedia(session, title, wikidata_id):
+    """Wikipedia-Artikel eines Films: Titel aus dem Wikidata-Sitelink, nur ohne Sitelink über die Suche."""
+    entity = await wikidata.get(session, wikidata_id) if wikidata_id else None
+    wiki_title = entity.get("enwiki_title") if entity else None
+    if not wiki_title:
+        wiki_title = await search_wikipedia(session, title)
+    page = await wikipedia_pages.get(session, wiki_title) if wiki_title else None
+
+    wikipedia = WikipediaRecord(description=(page or {}).get("extract") or "No Description")
+    if entity and entity.get("enwiki_url"):
+        wikipedia.page = urllib.parse.quote(entity["enwiki_url"], safe=":/")
+    elif page and page.get("url"):
+        wikipedia.page = page["url"]
+    elif wikidata_id:
+        wikipedia.page = f"https://www.wikidata.org/wiki/{wikidata_id}"
+    return wikipedia
+
+
+@metrics.timed_stage("omdb_wiki", failed=lambda result: result == (None, None))
+async def fetch_movie_omdb_wiki(session, title, imdb_id, wikidata_id, task_id, with_omdb=True):
+    """Holt Filmdetails von OMDb und Wikipedia parallel (ohne `with_omdb` nur Wikipedia, der Film bleibt `pending_omdb`).
+
+    Returns:
+        tuple: (`OmdbRecord` oder None, `WikipediaRecord` oder None); OMDb-Teil None, wenn OMDb nicht verfügbar war
+    """
     if not imdb_id:
         logger.warning(f"[Task {task_id}] No IMDb ID provided, skipping OMDb fetch.")
-        return movie_data
+        return None, None
 
     try:
-        url_omdb = f"http://www.omdbapi.com/?apikey={OMDB_API_KEY}&i={imdb_id}"
-        omdb_task = fetch_data(session, url_omdb)
-        wiki_title_task = search_wikipedia(session, title)  # Wikipedia-Suche parallel starten
-        
-        wiki_data_task = None
-        if wikidata_id:
-            url_wiki = f"https://www.wikidata.org/wiki/Special:EntityData/{wikidata_id}.json"
-            wiki_data_task = fetch_data(session, url_wiki)
+        if not with_omdb:
+            return None, await resolve_wikipedia(session, title, wikidata_id)
 
-        # Alle Tasks parallel ausführen
-        omdb_result, wiki_title = await asyncio.gather(omdb_task, wiki_title_task)
+        # OMDb und Wikipedia parallel; Wikidata und Wikipedia werden dabei seitenweise gebündelt geladen
+        omdb_result, wikipedia = await asyncio.gather(fetch_omdb(session, imdb_id),
+                                                      resolve_wikipedia(session, title, wikidata_id))
         
         # Debugging: Logge die Rohdaten
-        logger.debug(f"[Task {task_id}] OMDb Response: {omdb_result}")
+        logger.debug("[Task %s] OMDb Response: %s", task_id, omdb_result)
         
-        if isinstance(omdb_result, dict) and omdb_result.get("Response") != "False":
-            remove_keys = {"Title", "Released", "Genre", "Plot", "Language", "Country", 
-                           "imdbID", "DVD", "Production", "Website", "Response"}
-            movie_data = {k: v for k, v in omdb_result.items() if k not in remove_keys}
+        if omdb_result is None:  # Kontingent erschöpft oder OMDb nicht erreichbar: kein Fallback, Film bleibt offen
+            logger.warning(f"[Task {task_id}] OMDb unavailable for IMDb ID {imdb_id}, leaving it pending.")
+            omdb = None
+        elif isinstance(omdb_result, dict) and omdb_result and omdb_result.get("Response") != "False":
+            omdb = OmdbRecord.from_api(omdb_result)  # Zahlenfelder (Bewertungen, Box Office, ...) werden geparst
         else:
             logger.error(f"[Task {task_id}] OMDb API error for IMDb ID {imdb_id}: {omdb_result}")
-
-        # Fallback: Falls `movie_data` nach dem Filtern leer ist
-        if not movie_data:
-            movie_data["fallback_title"] = title  # Wenigstens den Titel speichern
-            logger.warning(f"[Task {task_id}] Filtered OMDb data was empty. Keeping fallback title.")
+            # Fallback: Wenigstens den Titel speichern
+            omdb = OmdbRecord(fallback_title=title)
+            logger.warning(f"[Task {task_id}] OMDb data was empty. Keeping fallback title.")
         
-        # Wikipedia-Beschreibung abrufen
-        link_page = None
-        if isinstance(wiki_title, str):
-            film_beschreibung, link_page = await get_wiki_beschreibung(session, u.get_title_abstract(wiki_title))
-            movie_data["wikipedia_Description"] = film_beschreibung if film_beschreibung else "No Description"
-        
-        # Wikidata abrufen, falls verfügbar
-        if wiki_data_task:
-            wiki_data_result = await wiki_data_task
-            if isinstance(wiki_data_result, dict) and wikidata_id in wiki_data_result.get("entities", {}):
-                entity_data = wiki_data_result["entities"][wikidata_id].get("sitelinks", {})
-                wiki_raw_url = entity_data.get("enwiki", {}).get("url")
-                if not wiki_raw_url and entity_data:
-                    first_key = next(iter(entity_data))
-                    wiki_raw_url = entity_data[first_key]["url"]
-                movie_data["wiki_page"] = urllib.parse.quote(wiki_raw_url, safe=":/") if wiki_raw_url else None
-            else:
-                movie_data["wiki_page"] = link_page or f"https://www.wikidata.org/wiki/{wikidata_id}"
-        
-        return movie_data
+        return omdb, wikipedia
     except Exception as e:
         logger.error(f"[Task {task_id}] Error fetching movie data: {repr(e)}")
-        return {}
+        return None, None
 
 
 async def get_missed_imdb_id(title):
-    """Lädt IMDb-Daten, sucht parallele IMDb-IDs für fehlende Filme und speichert sie."""
+    """Sucht die IMDb-ID für einen Filmtitel im vorab gebauten title.basics-Index."""
     try:
-        file_path = "Data\\title.basics.tsv.gz"  # Update mit dem korrekten Pfad
-        df = pd.read_csv(file_path, sep="\t", dtype=str, na_values="\\N")
-
-        matching_movies = df[df["primaryTitle"].str.contains(title, case=False, na=False)]
-        if not matching_movies.empty:
-            return matching_movies.iloc[0]["tconst"]  # Nimmt den ersten Treffer
+        index = await title_index.open_title_index()
+        matches = index.find(title, title_type="movie") or index.find(title) or index.find_prefix(title, limit=1)
+        if matches:
+            return matches[0].tconst  # Nimmt den ersten Treffer
         return None
 
     except Exception as e:
-        logger.error(f"Ein Fehler ist aufgetreten: {e} by movie {title}")
\ No newline at end of file
+        logger.error(f"Ein Fehler ist aufgetreten: {e} by movie {title}")
@@ -0,0 +1,70 @@
+import os
+import sys
+from collections import defaultdict
+
+import aiohttp
+from dotenv import load_dotenv
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from logger import logger
+import API_call.request_scheduler as rs
+
+try:  # Brotli ist optional (aiohttp[speedups]); ohne wird nur gzip/deflate ausgehandelt
+    import brotli  # noqa: F401
+    HAS_BROTLI = True
+except ImportError:
+    try:
+        import brotlicffi  # noqa: F401
+        HAS_BROTLI = True
+    except ImportError:
+        HAS_BROTLI = False
+
+USER_AGENT = "KinderFilme_Series/1.0 (https://github.com/imenbarrak/KinderFilme_Series)"  # Wikimedia verlangt einen UA
+
+
+def pool_limits(limits=None):
+    """Verbindungslimits passend zum Request-Scheduler: gesamt = Summe aller Concurrency-Caps, pro Host = größter Host.
+
+    Upstreams mit gleichem Präfix (`wikipedia_rest`, `wikipedia_search`) teilen sich einen Host.
+    """
+    limits = limits or rs.scheduler.limits
+    per_host = defaultdict(int)
+    for name, config in limits.items():
+        per_host[name.split("_")[0]] += config["concurrency"]
+    return sum(per_host.values()), max(per_host.values())
+
+
+def client_timeout():
+    """Getrennte Timeouts statt einer Gesamtzeit: schneller Abbruch beim Verbindungsaufbau, Lese-Timeout pro Chunk."""
+    return aiohttp.ClientTimeout(
+        total=float(os.getenv('http_total_timeout', 30)),
+        connect=float(os.getenv('http_connect_timeout', 5)),
+        sock_connect=float(os.getenv('http_connect_timeout', 5)),
+        sock_read=float(os.getenv('http_read_timeout', 10)),
+    )
+
+
+def create_session(limit=None, limit_per_host=None, timeout=None, **kwargs):
+    """Gemeinsame aiohttp-Session für Crawler, Update und Worker.
+
+    Keep-Alive-Pool mit Limits aus `pool_limits`, DNS-Cache, Kompression und strukturierte Timeouts; alle Werte
+    lassen sich über die .env (`http_pool_size`, `http_pool_per_host`, `http_keepalive_seconds`, `http_dns_ttl`,
+    `http_*_timeout`) anpassen, damit ihr Einfluss auf den Durchsatz an einer Stelle gemessen werden kann.
+    """
+    load_dotenv()
+    total, per_host = pool_limits()
+    limit = limit if limit is not None else int(os.getenv('http_pool_size', total))
+    limit_per_host = limit_per_host if limit_per_host is not None else int(os.getenv('http_pool_per_host', per_host))
+    connector = aiohttp.TCPConnector(
+        limit=limit,
+        limit_per_host=limit_per_host,
+        keepalive_timeout=float(os.getenv('http_keepalive_seconds', 30)),
+        ttl_dns_cache=int(os.getenv('http_dns_ttl', 300)),
+    )
+    headers = {
+        "User-Agent": os.getenv('http_user_agent', USER_AGENT),
+        "Accept-Encoding": "gzip, deflate, br" if HAS_BROTLI else "gzip, deflate",
+        **kwargs.pop("headers", {}),
+    }
+    logger.debug("HTTP pool: limit=%s per_host=%s brotli=%s", limit, limit_per_host, HAS_BROTLI)
+    return aiohttp.ClientSession(connector=connector, timeout=timeout or client_timeout(), headers=headers, **kwargs)
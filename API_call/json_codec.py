@@ -0,0 +1,118 @@
+import json
+import os
+import sys
+from typing import Any, Optional, Union
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from logger import logger
+
+try:  # Optionale schnelle Decoder; ohne beide bleibt es beim json-Modul der Standardbibliothek
+    import orjson
+except ImportError:
+    orjson = None
+try:
+    import msgspec
+except ImportError:
+    msgspec = None
+
+# auto: orjson/msgspec, wenn installiert; orjson, msgspec oder json erzwingt einen Decoder (z. B. für Benchmarks)
+DECODER = os.getenv('json_decoder', 'auto').lower()
+USE_ORJSON = orjson is not None and DECODER in ('auto', 'orjson')
+USE_MSGSPEC = msgspec is not None and DECODER in ('auto', 'msgspec')
+
+
+class DecodeError(ValueError):
+    """Antwort ist kein gültiges JSON (z. B. eine HTML-Fehlerseite mit Status 200)."""
+
+
+def loads(data):
+    """Dekodiert JSON (bytes oder str) vollständig."""
+    try:
+        if USE_ORJSON:
+            return orjson.loads(data)
+        if USE_MSGSPEC:
+            return msgspec.json.decode(data)
+        return json.loads(data)
+    except (ValueError, TypeError) as e:
+        raise DecodeError(str(e)) from e
+    except Exception as e:  # msgspec.DecodeError ist kein ValueError
+        if msgspec is not None and isinstance(e, msgspec.MsgspecError):
+            raise DecodeError(str(e)) from e
+        raise
+
+
+def dumps(obj):
+    """Kompaktes JSON als bytes."""
+    if USE_ORJSON:
+        return orjson.dumps(obj)
+    if USE_MSGSPEC:
+        return msgspec.json.encode(obj)
+    return json.dumps(obj, separators=(",", ":")).encode("utf-8")
+
+# ------------------ Schemas: nur die Felder dekodieren, die ein Aufrufer braucht ------------------
+#
+# Ein Schema beschreibt die benötigten Felder als verschachteltes Dict:
+#   None            Wert unverändert übernehmen
+#   {"key": spec}   Objekt, nur die genannten Schlüssel (fehlende bleiben weg)
+#   {"*": spec}     Objekt mit beliebigen Schlüsseln (z. B. Wikidata-IDs), jeder Wert nach spec
+#   [spec]          Liste, jedes Element nach spec
+
+
+def project(value, spec):
+    """Reduziert bereits dekodiertes JSON auf `spec`; Werte mit unerwartetem Typ bleiben unverändert."""
+    if spec is None:
+        return value
+    if isinstance(spec, list):
+        return [project(item, spec[0]) for item in value] if isinstance(value, list) else value
+    if not isinstance(value, dict):
+        return value
+    if "*" in spec:
+        return {key: project(item, spec["*"]) for key, item in value.items()}
+    return {key: project(value[key], sub) for key, sub in spec.items() if key in value}
+
+
+def _msgspec_type(name, spec):
+    """Übersetzt eine Spec in msgspec-Typen; unbekannte Felder werden beim Dekodieren übersprungen statt angelegt."""
+    if spec is None:
+        return Any
+    if isinstance(spec, list):
+        return Optional[list[_msgspec_type(name, spec[0])]]
+    if "*" in spec:
+        return Optional[dict[str, _msgspec_type(name, spec["*"])]]
+    attributes = {f"f{i}": key for i, key in enumerate(spec)}
+    struct = msgspec.defstruct(
+        name,
+        [(attribute, Union[_msgspec_type(f"{name}_{i}", spec[key]), msgspec.UnsetType], msgspec.UNSET)
+         for i, (attribute, key) in enumerate(attributes.items())],
+        rename=attributes,
+    )
+    return Optional[struct]
+
+
+class Schema:
+    """Benannte Feldauswahl für eine API-Antwort (siehe `project`).
+
+    Mit msgspec wird direkt in passende Structs dekodiert, nicht benötigte Teile der Antwort werden dabei nur
+    überlesen. Sonst wird (mit orjson bzw. json) vollständig dekodiert und sofort reduziert, damit nur die
+    benötigten Felder im Speicher bleiben. Beides liefert dieselben Dicts und Listen.
+    """
+
+    def __init__(self, name, fields):
+        self.name = name
+        self.fields = fields
+        self.decoder = msgspec.json.Decoder(_msgspec_type(name, fields)) if USE_MSGSPEC else None
+
+    def decode(self, data):
+        if self.decoder is not None:
+            try:
+                return msgspec.to_builtins(self.decoder.decode(data))
+            except msgspec.ValidationError as e:  # Struktur weicht ab, z. B. Liste statt Objekt
+                logger.debug("Schema %s does not match response (%s), decoding generically", self.name, e)
+            except msgspec.DecodeError as e:
+                raise DecodeError(str(e)) from e
+        return project(loads(data), self.fields)
+
+
+def decode(data, schema=None):
+    """Dekodiert eine Antwort, mit `schema` nur die darin genannten Felder."""
+    return schema.decode(data) if schema is not None else loads(data)
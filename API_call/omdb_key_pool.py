@@ -0,0 +1,211 @@
+import asyncio
+import atexit
+import datetime
+import hashlib
+import json
+import os
+import re
+import sys
+import threading
+from collections import defaultdict
+from contextlib import contextmanager
+from functools import lru_cache
+
+from dotenv import load_dotenv
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from logger import logger
+
+try:
+    import fcntl
+except ImportError:  # Windows: ohne Dateisperre; das Zusammenführen in `save` verhindert trotzdem das Überschreiben
+    fcntl = None
+
+DEFAULT_USAGE_PATH = os.path.join(os.path.dirname(__file__), '..', '.omdb_key_usage.json')
+DEFAULT_DAILY_LIMIT = 1000  # Free-Tier von OMDb
+
+# Antworten von OMDb, nach denen ein Key für den Rest des Tages nicht mehr genutzt wird
+EXHAUSTED_ERRORS = {"Request limit reached!"}
+INVALID_ERRORS = {"Invalid API key!", "No API key provided."}
+
+
+def _fingerprint(key):
+    """Kurzer Hash, damit der API-Key selbst nicht in der Zähler-Datei landet."""
+    return hashlib.sha256(key.encode("utf-8")).hexdigest()[:12]
+
+
+def _today():
+    return datetime.datetime.now(datetime.timezone.utc).date().isoformat()
+
+
+@contextmanager
+def _file_lock(path):
+    """Exklusive Sperre über eine Lock-Datei neben `path`, damit Worker-Prozesse nacheinander speichern."""
+    if fcntl is None:
+        yield
+        return
+    with open(f"{path}.lock", "a") as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+class OmdbKeyPool:
+    """Verteilt OMDb-Requests auf alle konfigurierten Keys und zählt deren Tagesverbrauch (persistiert).
+
+    Mehrere Prozesse (Worker-Pool) teilen sich die Datei: jeder addiert beim Speichern nur seine seit dem letzten
+    Speichern gezählten Requests und übernimmt danach den gemeinsamen Stand. Innerhalb einer laufenden Event-Loop
+    wird im Hintergrund (Thread) gespeichert, damit Dateisperre und Dateizugriff die Loop nicht blockieren.
+    """
+
+    def __init__(self, keys, daily_limit=DEFAULT_DAILY_LIMIT, usage_path=DEFAULT_USAGE_PATH, save_every=20):
+        self.keys = list(dict.fromkeys(key for key in keys if key))
+        self.daily_limit = daily_limit
+        self.usage_path = usage_path
+        self.save_every = save_every
+        self.unsaved = 0
+        self.unsaved_requests = defaultdict(int)  # Fingerprint -> Requests dieses Prozesses seit dem letzten Speichern
+        self.dirty = False  # Key seit dem letzten Speichern als erschöpft markiert
+        self.save_task = None
+        self.day = _today()
+        self.usage = {}
+        self.load()
+
+    def _read(self, day=None):
+        """Stand der Datei für den Tag (Standard: aktueller Tag des Pools; Fingerprint -> Eintrag)."""
+        try:
+            with open(self.usage_path, encoding="utf-8") as usage_file:
+                state = json.load(usage_file)
+        except (FileNotFoundError, json.JSONDecodeError):
+            state = {}
+        return state.get("keys", {}) if state.get("day") == (day or self.day) else {}
+
+    def load(self):
+        self.usage = self._read()
+        for key in self.keys:
+            self.usage.setdefault(_fingerprint(key), {"requests": 0, "exhausted": False})
+
+    def _take_unsaved(self):
+        """Übernimmt die ungespeicherten Zähler als Snapshot (Tag, Requests, erschöpfte Keys) und setzt sie zurück."""
+        snapshot = (self.day, dict(self.unsaved_requests),
+                    {fingerprint for fingerprint, entry in self.usage.items() if entry["exhausted"]})
+        self.unsaved_requests.clear()
+        self.unsaved = 0
+        self.dirty = False
+        return snapshot
+
+    def _write(self, day, requests, exhausted):
+        """Addiert den Snapshot zum Stand in der Datei (statt ihn zu überschreiben); fasst den Pool selbst nicht an."""
+        with _file_lock(self.usage_path):
+            stored = self._read(day)
+            merged = {}
+            for fingerprint in set(stored) | set(requests) | exhausted | {_fingerprint(key) for key in self.keys}:
+                entry = stored.get(fingerprint, {"requests": 0, "exhausted": False})
+                merged[fingerprint] = {
+                    "requests": entry["requests"] + requests.get(fingerprint, 0),
+                    "exhausted": entry["exhausted"] or fingerprint in exhausted,
+                }
+            temporary = f"{self.usage_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(temporary, "w", encoding="utf-8") as usage_file:
+                json.dump({"day": day, "keys": merged}, usage_file, indent=2)
+            os.replace(temporary, self.usage_path)
+        return merged
+
+    def _apply(self, day, merged):
+        """Übernimmt den gemeinsamen Stand, plus allem, was seit dem Snapshot gezählt wurde."""
+        if day != self.day:  # Inzwischen ist ein neuer Tag angebrochen
+            return
+        for fingerprint, entry in merged.items():
+            entry["requests"] += self.unsaved_requests.get(fingerprint, 0)
+            entry["exhausted"] = entry["exhausted"] or self.usage.get(fingerprint, {}).get("exhausted", False)
+        self.usage = merged
+
+    def save(self):
+        """Speichert synchron (Prozessende, außerhalb einer Event-Loop)."""
+        snapshot = self._take_unsaved()
+        self._apply(snapshot[0], self._write(*snapshot))
+
+    async def save_async(self):
+        """Speichert im Thread; solange während des Speicherns neue Zähler anfallen, die ein Speichern auslösen, erneut."""
+        while True:
+            snapshot = self._take_unsaved()
+            self._apply(snapshot[0], await asyncio.to_thread(self._write, *snapshot))
+            if not self.dirty and self.unsaved < self.save_every:
+                return
+
+    def _schedule_save(self):
+        """Stößt das Speichern im Hintergrund der laufenden Event-Loop an (ohne Loop: synchron)."""
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            self.save()
+            return
+        if self.save_task is None or self.save_task.done():
+            self.save_task = loop.create_task(self.save_async())  # Referenz halten, sonst kann der Task verschwinden
+
+    def _roll_over(self):
+        """OMDb setzt die Kontingente täglich zurück."""
+        if self.day != _today():
+            self.day = _today()
+            self.usage = {_fingerprint(key): {"requests": 0, "exhausted": False} for key in self.keys}
+            self.unsaved_requests.clear()
+
+    def remaining(self, key):
+        entry = self.usage[_fingerprint(key)]
+        return 0 if entry["exhausted"] else max(0, self.daily_limit - entry["requests"])
+
+    def acquire(self):
+        """Key mit der meisten Restkapazität, oder None wenn alle Keys für heute erschöpft sind."""
+        self._roll_over()
+        available = [key for key in self.keys if self.remaining(key) > 0]
+        if not available:
+            return None
+        key = max(available, key=self.remaining)
+        self.usage[_fingerprint(key)]["requests"] += 1  # Sofort zählen, damit parallele Requests verteilt werden
+        self.unsaved_requests[_fingerprint(key)] += 1
+        self.unsaved += 1
+        if self.unsaved >= self.save_every:
+            self._schedule_save()
+        return key
+
+    def record(self, key, response):
+        """Wertet die OMDb-Antwort aus; gibt False zurück, wenn der Key erschöpft oder ungültig ist."""
+        error = response.get("Error") if isinstance(response, dict) else None
+        if error in EXHAUSTED_ERRORS or error in INVALID_ERRORS:
+            entry = self.usage[_fingerprint(key)]
+            entry["exhausted"] = True
+            logger.warning(f"OMDb key {_fingerprint(key)} disabled for today after {entry['requests']} requests: {error}")
+            self.dirty = True
+            self._schedule_save()
+            return False
+        return True
+
+    def summary(self):
+        return {fingerprint: dict(entry) for fingerprint, entry in self.usage.items()}
+
+
+def keys_from_env():
+    """Alle OMDb-Keys aus der .env: OMDB_API_KEY sowie OMDB_API_KEY1, OMDB_API_KEY2, ..."""
+    load_dotenv()
+    names = sorted((name for name in os.environ if re.fullmatch(r"OMDB_API_KEY\d*", name)),
+                   key=lambda name: int(name[len("OMDB_API_KEY"):] or 0))
+    return [os.environ[name] for name in names]
+
+
+def create_key_pool():
+    pool = OmdbKeyPool(
+        keys_from_env(),
+        daily_limit=int(os.getenv('omdb_daily_limit', DEFAULT_DAILY_LIMIT)),
+        usage_path=os.getenv('omdb_usage_path', DEFAULT_USAGE_PATH),
+    )
+    atexit.register(pool.save)
+    logger.info(f"OMDb key pool with {len(pool.keys)} keys, daily limit {pool.daily_limit} each")
+    return pool
+
+
+@lru_cache(maxsize=None)
+def get_key_pool():
+    """Gemeinsamer Pool des Prozesses, erst beim ersten OMDb-Request angelegt (nicht schon beim Import)."""
+    return create_key_pool()
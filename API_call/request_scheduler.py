@@ -0,0 +1,123 @@
+import asyncio
+import os
+import sys
+import time
+from contextlib import asynccontextmanager
+from email.utils import parsedate_to_datetime
+from urllib.parse import urlsplit
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from logger import logger
+
+# Erlaubte Requests pro Sekunde (Token-Bucket) und maximale gleichzeitige Requests je Upstream
+DEFAULT_LIMITS = {
+    "tmdb": {"rate": 40, "burst": 40, "concurrency": 20},
+    "omdb": {"rate": 10, "burst": 10, "concurrency": 5},
+    "wikipedia_rest": {"rate": 50, "burst": 50, "concurrency": 10},
+    "wikipedia_search": {"rate": 10, "burst": 10, "concurrency": 5},
+    "wikidata": {"rate": 10, "burst": 10, "concurrency": 5},
+    "default": {"rate": 5, "burst": 5, "concurrency": 5},
+}
+
+MIN_RATE_FACTOR = 0.1  # Untergrenze beim Drosseln nach 429
+MAX_BACKOFF = 60
+
+
+def upstream_for(url):
+    """Ordnet eine URL dem Upstream-Namen zu, unter dem sie gedrosselt wird."""
+    parts = urlsplit(url)
+    host, path = parts.hostname or "", parts.path
+    if host.endswith("themoviedb.org"):
+        return "tmdb"
+    if host.endswith("omdbapi.com"):
+        return "omdb"
+    if host.endswith("wikidata.org"):
+        return "wikidata"
+    if host.endswith("wikipedia.org"):
+        return "wikipedia_rest" if path.startswith("/api/rest_v1") else "wikipedia_search"
+    return "default"
+
+
+def parse_retry_after(value):
+    """`Retry-After` als Sekunden (Zahl oder HTTP-Datum), sonst None."""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+class HostLimiter:
+    """Token-Bucket plus Concurrency-Cap für einen Upstream, mit adaptivem Backoff."""
+
+    def __init__(self, name, rate, burst, concurrency):
+        self.name = name
+        self.base_rate = float(rate)
+        self.rate = float(rate)
+        self.burst = float(burst)
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0
+        self.failures = 0
+        self.semaphore = asyncio.Semaphore(concurrency)
+        self.lock = asyncio.Lock()
+
+    async def acquire(self):
+        async with self.lock:
+            while True:
+                now = time.monotonic()
+                if now < self.blocked_until:
+                    await asyncio.sleep(self.blocked_until - now)
+                    continue
+                self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+    def on_success(self):
+        self.failures = 0
+        if self.rate < self.base_rate:
+            self.rate = min(self.base_rate, self.rate + self.base_rate * 0.05)
+
+    def on_throttled(self, retry_after=None):
+        """Reagiert auf 429/503: Upstream pausieren und Rate halbieren."""
+        self.failures += 1
+        delay = retry_after if retry_after is not None else min(MAX_BACKOFF, 2 ** self.failures)
+        self.blocked_until = max(self.blocked_until, time.monotonic() + delay)
+        self.rate = max(self.base_rate * MIN_RATE_FACTOR, self.rate / 2)
+        self.tokens = 0.0
+        logger.warning(f"Upstream {self.name} throttled, pausing {delay:.1f}s and lowering rate to {self.rate:.1f} req/s")
+        return delay
+
+
+class RequestScheduler:
+    """Zentraler Scheduler, über den alle HTTP-Requests je Upstream gedrosselt werden."""
+
+    def __init__(self, limits=None):
+        self.limits = limits or DEFAULT_LIMITS
+        self.hosts = {}
+
+    def limiter(self, url):
+        name = upstream_for(url)
+        if name not in self.hosts:
+            config = self.limits.get(name, self.limits["default"])
+            self.hosts[name] = HostLimiter(name, **config)
+        return self.hosts[name]
+
+    @asynccontextmanager
+    async def slot(self, url):
+        """Wartet auf einen freien Slot und ein Token für den Upstream von `url`."""
+        limiter = self.limiter(url)
+        async with limiter.semaphore:
+            await limiter.acquire()
+            yield limiter
+
+
+scheduler = RequestScheduler()
@@ -0,0 +1,160 @@
+import asyncio
+import os
+import sqlite3
+import sys
+import time
+import zlib
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache, partial
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+from dotenv import load_dotenv
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from logger import logger
+import API_call.request_scheduler as rs
+import API_call.json_codec as json_codec
+
+DEFAULT_CACHE_PATH = os.path.join(os.path.dirname(__file__), '..', '.http_cache.sqlite')
+
+# Gültigkeitsdauer (Sekunden) einer gecachten Antwort je Upstream
+DEFAULT_TTLS = {
+    "tmdb": 24 * 3600,
+    "omdb": 7 * 24 * 3600,
+    "wikipedia_rest": 7 * 24 * 3600,
+    "wikipedia_search": 7 * 24 * 3600,
+    "wikidata": 7 * 24 * 3600,
+    "default": 3600,
+}
+
+# Query-Parameter, die nicht in den Cache-Key gehören (API-Keys)
+SECRET_PARAMS = {"api_key", "apikey"}
+
+CacheEntry = namedtuple("CacheEntry", ["data", "etag", "last_modified", "expires", "fresh"])
+
+
+def cache_key(url, params=None):
+    """Normalisierte URL ohne API-Key, Query-Parameter sortiert."""
+    parts = urlsplit(url)
+    query = parse_qsl(parts.query, keep_blank_values=True) + list((params or {}).items())
+    query = sorted((k, str(v)) for k, v in query if k.lower() not in SECRET_PARAMS)
+    return urlunsplit((parts.scheme.lower(), parts.netloc.lower(), parts.path, urlencode(query), ""))
+
+
+class ResponseCache:
+    """SQLite-basierter Cache für JSON-Antworten mit TTL je Upstream, LRU-Verdrängung und Revalidierung.
+
+    Async Code nutzt die `*_async`-Varianten: SQLite-Zugriff und (De-)Kompression laufen dann in einem eigenen
+    Thread, der zugleich alle Zugriffe auf die Verbindung serialisiert, statt die Event-Loop zu blockieren.
+    """
+
+    def __init__(self, path=DEFAULT_CACHE_PATH, max_bytes=512 * 1024 * 1024, ttls=None):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.ttls = ttls or DEFAULT_TTLS
+        self.connection = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA synchronous=NORMAL")
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            " key TEXT PRIMARY KEY, body BLOB NOT NULL, size INTEGER NOT NULL,"
+            " etag TEXT, last_modified TEXT, expires REAL NOT NULL, accessed REAL NOT NULL)"
+        )
+        self.connection.execute("CREATE INDEX IF NOT EXISTS responses_accessed ON responses (accessed)")
+        self.total_bytes = self.connection.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="http-cache")
+
+    async def _in_thread(self, method, *args, **kwargs):
+        return await asyncio.get_running_loop().run_in_executor(self.executor, partial(method, *args, **kwargs))
+
+    async def get_async(self, url, params=None):
+        return await self._in_thread(self.get, url, params)
+
+    async def put_async(self, url, data, headers=None, params=None, ttl=None):
+        return await self._in_thread(self.put, url, data, headers, params, ttl)
+
+    async def refresh_async(self, url, params=None):
+        return await self._in_thread(self.refresh, url, params)
+
+    async def delete_async(self, url, params=None):
+        return await self._in_thread(self.delete, url, params)
+
+    def get(self, url, params=None):
+        """Gecachter Eintrag (auch abgelaufen, für die Revalidierung) oder None."""
+        key = cache_key(url, params)
+        row = self.connection.execute(
+            "SELECT body, etag, last_modified, expires FROM responses WHERE key = ?", (key,)
+        ).fetchone()
+        if row is None:
+            return None
+        now = time.time()
+        self.connection.execute("UPDATE responses SET accessed = ? WHERE key = ?", (now, key))
+        body, etag, last_modified, expires = row
+        return CacheEntry(json_codec.loads(zlib.decompress(body)), etag, last_modified, expires, expires > now)
+
+    def put(self, url, data, headers=None, params=None, ttl=None):
+        """Speichert eine Antwort; `ttl` überschreibt die Gültigkeit des Upstreams (z. B. kurz für Negativ-Antworten)."""
+        key = cache_key(url, params)
+        headers = headers or {}
+        body = zlib.compress(json_codec.dumps(data))
+        now = time.time()
+        ttl = ttl if ttl is not None else self.ttls.get(rs.upstream_for(url), self.ttls["default"])
+        old = self.connection.execute("SELECT size FROM responses WHERE key = ?", (key,)).fetchone()
+        self.connection.execute(
+            "INSERT OR REPLACE INTO responses (key, body, size, etag, last_modified, expires, accessed)"
+            " VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (key, body, len(body), headers.get("ETag"), headers.get("Last-Modified"), now + ttl, now),
+        )
+        self.total_bytes += len(body) - (old[0] if old else 0)
+        if self.total_bytes > self.max_bytes:
+            self.evict()
+
+    def refresh(self, url, params=None):
+        """Nach `304 Not Modified`: Eintrag bleibt gültig, TTL beginnt neu."""
+        ttl = self.ttls.get(rs.upstream_for(url), self.ttls["default"])
+        now = time.time()
+        self.connection.execute(
+            "UPDATE responses SET expires = ?, accessed = ? WHERE key = ?", (now + ttl, now, cache_key(url, params))
+        )
+
+    def delete(self, url, params=None):
+        """Verwirft einen Eintrag, z. B. wenn der Upstream eine Änderung gemeldet hat."""
+        key = cache_key(url, params)
+        old = self.connection.execute("SELECT size FROM responses WHERE key = ?", (key,)).fetchone()
+        if old:
+            self.connection.execute("DELETE FROM responses WHERE key = ?", (key,))
+            self.total_bytes -= old[0]
+
+    def evict(self):
+        """Entfernt die am längsten nicht genutzten Einträge, bis der Cache 90 % von `max_bytes` belegt."""
+        target = self.max_bytes * 0.9
+        removed = 0
+        for key, size in self.connection.execute("SELECT key, size FROM responses ORDER BY accessed").fetchall():
+            if self.total_bytes <= target:
+                break
+            self.connection.execute("DELETE FROM responses WHERE key = ?", (key,))
+            self.total_bytes -= size
+            removed += 1
+        logger.info(f"HTTP cache evicted {removed} entries, {self.total_bytes / 1024 / 1024:.1f} MB in use")
+
+    @staticmethod
+    def validators(entry):
+        """Header für eine bedingte Anfrage an den Upstream."""
+        headers = {}
+        if entry and entry.etag:
+            headers["If-None-Match"] = entry.etag
+        if entry and entry.last_modified:
+            headers["If-Modified-Since"] = entry.last_modified
+        return headers
+
+
+@lru_cache(maxsize=None)
+def get_response_cache():
+    """Gemeinsamer Cache des Prozesses; mit `http_cache=off` in der .env abschaltbar."""
+    load_dotenv()
+    if os.getenv('http_cache', 'on').lower() in ('off', 'false', '0'):
+        return None
+    path = os.getenv('http_cache_path', DEFAULT_CACHE_PATH)
+    max_bytes = int(os.getenv('http_cache_max_mb', 512)) * 1024 * 1024
+    return ResponseCache(path, max_bytes)
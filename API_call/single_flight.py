@@ -0,0 +1,67 @@
+import asyncio
+import os
+import sys
+import time
+from collections import OrderedDict
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from logger import logger
+
+
+class SingleFlight:
+    """Bündelt gleichzeitige identische Anfragen auf einen einzigen laufenden Request.
+
+    Fertige Ergebnisse werden zusätzlich kurz (`ttl` Sekunden, höchstens `max_entries`) im Speicher gehalten,
+    damit spätere Stufen derselben Pipeline (z. B. die Wikidata-Entity) nicht erneut laden.
+    Die Ergebnisse werden geteilt und dürfen von den Aufrufern nicht verändert werden.
+    """
+
+    def __init__(self, ttl=120, max_entries=256):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.inflight = {}
+        self.recent = OrderedDict()
+        self.shared = 0
+
+    def _recent(self, key):
+        entry = self.recent.get(key)
+        if entry is None:
+            return None
+        stored_at, result = entry
+        if time.monotonic() - stored_at > self.ttl:
+            del self.recent[key]
+            return None
+        self.recent.move_to_end(key)
+        return result
+
+    def _remember(self, key, result):
+        self.recent[key] = (time.monotonic(), result)
+        self.recent.move_to_end(key)
+        while len(self.recent) > self.max_entries:
+            self.recent.popitem(last=False)
+
+    async def do(self, key, factory, remember=True):
+        """Führt `factory()` für `key` höchstens einmal gleichzeitig aus und gibt allen Wartenden dasselbe Ergebnis."""
+        if remember:
+            result = self._recent(key)
+            if result is not None:
+                self.shared += 1
+                return result
+
+        future = self.inflight.get(key)
+        if future is None:
+            future = asyncio.ensure_future(factory())
+            self.inflight[key] = future
+
+            def done(finished):
+                self.inflight.pop(key, None)
+                if remember and not finished.cancelled() and finished.exception() is None and finished.result():
+                    self._remember(key, finished.result())
+
+            future.add_done_callback(done)
+        else:
+            self.shared += 1
+            logger.debug(f"Joining in-flight request for {key}")
+
+        # shield: bricht ein Wartender ab, läuft der gemeinsame Request für die anderen weiter
+        return await asyncio.shield(future)
@@ -0,0 +1,64 @@
+import os
+import sys
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from logger import logger
+from API_call.batch_loader import BatchLoader
+import API_call.json_codec as json_codec
+
+WIKIDATA_API_URL = "https://www.wikidata.org/w/api.php"
+IMDB_PROPERTY = "P345"
+
+# Von den Claims einer Entity wird nur P345 dekodiert, nicht die übrigen Hunderte Aussagen
+WBGETENTITIES = json_codec.Schema("WbGetEntities", {
+    "entities": {"*": {
+        "missing": None,
+        "claims": {IMDB_PROPERTY: [{"mainsnak": {"datavalue": {"value": None}}}]},
+        "sitelinks": {"enwiki": {"title": None, "url": None}},
+    }},
+    "error": None,
+})
+
+
+def slim_entity(entity):
+    """Nur die Felder, die das Projekt braucht: IMDb-ID (P345) und der englische Wikipedia-Artikel."""
+    if not isinstance(entity, dict) or "missing" in entity:
+        return None
+    imdb_id = None
+    for claim in entity.get("claims", {}).get(IMDB_PROPERTY, []):
+        value = claim.get("mainsnak", {}).get("datavalue", {}).get("value")
+        if isinstance(value, str) and value.startswith("tt"):
+            imdb_id = value
+            break
+    enwiki = entity.get("sitelinks", {}).get("enwiki", {})
+    return {"imdb_id": imdb_id, "enwiki_title": enwiki.get("title"), "enwiki_url": enwiki.get("url")}
+
+
+class WikidataClient(BatchLoader):
+    """Lädt Wikidata-Entities gebündelt über `wbgetentities` statt einzeln über `Special:EntityData`.
+
+    Bis zu 50 IDs pro Request; abgefragt werden nur Claims und der enwiki-Sitelink, ohne die Labels und
+    Beschreibungen in allen Sprachen. `get` liefert eine schlanke Entity (`imdb_id`, `enwiki_title`,
+    `enwiki_url`) oder None, wenn es sie nicht gibt.
+    """
+
+    max_batch = 50  # Obergrenze von wbgetentities für normale Clients
+
+    def cache_url(self, wikidata_id):
+        return f"{WIKIDATA_API_URL}?action=wbgetentities&ids={wikidata_id}"
+
+    async def _load_batch(self, session, wikidata_ids):
+        params = {
+            "action": "wbgetentities",
+            "ids": "|".join(wikidata_ids),
+            "props": "claims|sitelinks/urls",
+            "sitefilter": "enwiki",
+            "format": "json",
+        }
+        # Gecacht wird je Entity (cache_url), nicht die Antwort des ganzen Batches
+        data = await self.fetch(session, WIKIDATA_API_URL, params=params, schema=WBGETENTITIES, use_cache=False)
+        entities = data.get("entities", {}) if isinstance(data, dict) else {}
+        if not entities:
+            logger.warning(f"No Wikidata entities received for {len(wikidata_ids)} ids: {data.get('error') if data else data}")
+            return None
+        return {wikidata_id: slim_entity(entities.get(wikidata_id)) for wikidata_id in wikidata_ids}
@@ -0,0 +1,69 @@
+import os
+import sys
+from urllib.parse import urlencode
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from logger import logger
+from API_call.batch_loader import BatchLoader
+import API_call.json_codec as json_codec
+
+WIKIPEDIA_API_URL = "https://en.wikipedia.org/w/api.php"
+
+EXTRACTS = json_codec.Schema("WikipediaExtracts", {
+    "query": {"normalized": None, "redirects": None,
+              "pages": [{"title": None, "extract": None, "fullurl": None, "missing": None, "invalid": None}]},
+    "error": None,
+})
+
+
+def resolve_titles(query):
+    """Ordnet jedem angefragten Titel die Seite zu, über Normalisierung und Weiterleitungen hinweg."""
+    steps = {entry["from"]: entry["to"] for entry in query.get("normalized", []) + query.get("redirects", [])}
+    pages = {page["title"]: page for page in query.get("pages", []) if "missing" not in page and "invalid" not in page}
+
+    def page_for(title):
+        seen = set()
+        while title not in pages and title in steps and title not in seen:
+            seen.add(title)
+            title = steps[title]
+        return pages.get(title)
+
+    return page_for
+
+
+class WikipediaClient(BatchLoader):
+    """Löst Wikipedia-Titel gebündelt über die MediaWiki-Action-API auf (`prop=extracts|info`, mit Redirects).
+
+    Mehrere Titel pro Request statt je eines REST-Summary-Aufrufs; Titel werden als Parameter übergeben und
+    dadurch korrekt URL-kodiert. `get` liefert `{"title", "extract", "url"}` oder None, wenn es die Seite nicht gibt.
+    """
+
+    max_batch = 20  # Höchstzahl Einleitungen, die `prop=extracts` pro Request liefert
+
+    def cache_url(self, title):
+        return f"{WIKIPEDIA_API_URL}?{urlencode({'action': 'query', 'prop': 'extracts', 'titles': title})}"
+
+    async def _load_batch(self, session, titles):
+        params = {
+            "action": "query",
+            "prop": "extracts|info",
+            "exintro": 1,
+            "explaintext": 1,
+            "exlimit": "max",
+            "inprop": "url",
+            "redirects": 1,
+            "titles": "|".join(titles),
+            "format": "json",
+            "formatversion": 2,
+        }
+        # Gecacht wird je Titel (cache_url), nicht die Antwort des ganzen Batches
+        data = await self.fetch(session, WIKIPEDIA_API_URL, params=params, schema=EXTRACTS, use_cache=False)
+        if not isinstance(data, dict) or "query" not in data:
+            logger.warning(f"No Wikipedia pages received for {len(titles)} titles: {data.get('error') if data else data}")
+            return None
+        page_for = resolve_titles(data["query"])
+        results = {}
+        for title in titles:
+            page = page_for(title)
+            results[title] = {"title": page["title"], "extract": page.get("extract", ""), "url": page.get("fullurl")} if page else None
+        return results
@@ -4,10 +4,12 @@ import os
 
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 from logger import logger
+import Data.indexes as indexes
 
 class MongoDBContext:
-    def __init__(self, uri):
+    def __init__(self, uri, ensure_indexes=True):
         self.uri = uri
+        self.ensure_indexes = ensure_indexes
         self.client = None
         self.db = None
 
@@ -15,6 +17,8 @@ class MongoDBContext:
         self.client = AsyncIOMotorClient(self.uri)
         self.db = self.client.get_default_database("movieDB")
         logger.info("Connected to MongoDB!")
+        if self.ensure_indexes:
+            await indexes.ensure_indexes(self.db)
         return self.client, self.db
 
     async def __aexit__(self, exc_type, exc_val, exc_tb):
@@ -0,0 +1,170 @@
+import asyncio
+import os
+import sys
+import time
+
+from dotenv import load_dotenv
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from logger import logger
+
+MOVIES_COLLECTION = "children_movies"
+
+RATINGS_BY_YEAR = "analytics_ratings_by_year"
+GENRE_COUNTS = "analytics_genre_counts"
+STUDIO_FINANCE = "analytics_studio_finance"
+COUNTRY_COUNTS = "analytics_country_counts"
+
+# ------------------ Gemeinsame Ausdrücke ------------------
+
+_YEAR = {"$convert": {"input": {"$substrBytes": [{"$ifNull": ["$release_date", ""]}, 0, 4]},
+                      "to": "int", "onError": None, "onNull": None}}
+_IMDB_RATING = {"$convert": {"input": "$omdb_details.imdbRating", "to": "double", "onError": None, "onNull": None}}
+_POSITIVE_BUDGET = {"$cond": [{"$gt": ["$budget", 0]}, "$budget", None]}
+_POSITIVE_REVENUE = {"$cond": [{"$gt": ["$revenue", 0]}, "$revenue", None]}
+
+
+def _merge_into(collection):
+    return {"$merge": {"into": collection, "on": "_id", "whenMatched": "replace", "whenNotMatched": "insert"}}
+
+# ------------------ Pipelines je Zusammenfassung ------------------
+# Jede Funktion bekommt optional die betroffenen Schlüssel, damit nur diese Gruppen neu berechnet werden.
+
+def ratings_by_year_pipeline(years=None):
+    pipeline = []
+    if years is not None:  # Verankerte Präfixe ("YYYY-MM-DD") nutzen den Index auf release_date
+        pipeline.append({"$match": {"$or": [{"release_date": {"$regex": f"^{year}"}} for year in years]}})
+    pipeline.append({"$addFields": {"year": _YEAR}})
+    pipeline.append({"$match": {"year": {"$in": list(years)}} if years is not None else {"year": {"$ne": None}}})
+    pipeline += [
+        {"$group": {"_id": "$year", "movies": {"$sum": 1},
+                    "avg_tmdb_rating": {"$avg": "$vote_average"}, "avg_imdb_rating": {"$avg": _IMDB_RATING},
+                    "avg_popularity": {"$avg": "$popularity"}}},
+        _merge_into(RATINGS_BY_YEAR),
+    ]
+    return pipeline
+
+
+def genre_counts_pipeline(genres=None):
+    match = {"genres.name": {"$in": list(genres)}} if genres is not None else {}
+    return [
+        {"$match": match},
+        {"$unwind": "$genres"},
+        {"$match": match},
+        {"$group": {"_id": "$genres.name", "movies": {"$sum": 1},
+                    "avg_tmdb_rating": {"$avg": "$vote_average"}, "avg_imdb_rating": {"$avg": _IMDB_RATING}}},
+        _merge_into(GENRE_COUNTS),
+    ]
+
+
+def studio_finance_pipeline(studios=None):
+    match = {"production_companies.name": {"$in": list(studios)}} if studios is not None else {}
+    return [
+        {"$match": match},
+        {"$unwind": "$production_companies"},
+        {"$match": match},
+        {"$group": {"_id": "$production_companies.name", "movies": {"$sum": 1},
+                    "total_budget": {"$sum": _POSITIVE_BUDGET}, "total_revenue": {"$sum": _POSITIVE_REVENUE},
+                    "avg_budget": {"$avg": _POSITIVE_BUDGET}, "avg_revenue": {"$avg": _POSITIVE_REVENUE}}},
+        _merge_into(STUDIO_FINANCE),
+    ]
+
+
+def country_counts_pipeline(countries=None):
+    match = {"production_countries.iso_3166_1": {"$in": list(countries)}} if countries is not None else {}
+    return [
+        {"$match": match},
+        {"$unwind": "$production_countries"},
+        {"$match": match},
+        {"$group": {"_id": "$production_countries.iso_3166_1", "name": {"$first": "$production_countries.name"},
+                    "movies": {"$sum": 1}, "avg_tmdb_rating": {"$avg": "$vote_average"}}},
+        _merge_into(COUNTRY_COUNTS),
+    ]
+
+# ------------------ Refresh ------------------
+
+async def _run(collection, pipeline):
+    await collection.aggregate(pipeline).to_list(length=None)  # $merge liefert keine Dokumente zurück
+
+
+async def refresh_all(db):
+    """Berechnet alle Zusammenfassungen komplett neu (z. B. nach Löschungen oder einmalig initial)."""
+    movies = db[MOVIES_COLLECTION]
+    for summary in (RATINGS_BY_YEAR, GENRE_COUNTS, STUDIO_FINANCE, COUNTRY_COUNTS):
+        await db[summary].delete_many({})
+    await asyncio.gather(
+        _run(movies, ratings_by_year_pipeline()),
+        _run(movies, genre_counts_pipeline()),
+        _run(movies, studio_finance_pipeline()),
+        _run(movies, country_counts_pipeline()),
+    )
+    logger.info("Analytics collections fully refreshed.")
+
+
+async def refresh_for_movies(db, movie_ids):
+    """Aktualisiert nur die Gruppen (Jahre, Genres, Studios, Länder), zu denen die geschriebenen Filme gehören.
+
+    Gruppen, die ein Film durch eine Änderung verlassen hat, korrigiert erst `refresh_all`.
+    """
+    if not movie_ids:
+        return
+    movies = db[MOVIES_COLLECTION]
+    keys = await movies.aggregate([
+        {"$match": {"id": {"$in": list(movie_ids)}}},
+        {"$group": {"_id": None, "years": {"$addToSet": _YEAR},
+                    "genres": {"$addToSet": "$genres.name"},
+                    "studios": {"$addToSet": "$production_companies.name"},
+                    "countries": {"$addToSet": "$production_countries.iso_3166_1"}}},
+    ]).to_list(length=1)
+    if not keys:
+        return
+
+    def flatten(nested):
+        return {value for values in nested for value in (values if isinstance(values, list) else [values]) if value}
+
+    affected = [
+        (ratings_by_year_pipeline, {year for year in keys[0]["years"] if year is not None}),
+        (genre_counts_pipeline, flatten(keys[0]["genres"])),
+        (studio_finance_pipeline, flatten(keys[0]["studios"])),
+        (country_counts_pipeline, flatten(keys[0]["countries"])),
+    ]
+    await asyncio.gather(*[_run(movies, pipeline(values)) for pipeline, values in affected if values])
+    logger.debug(f"Analytics refreshed for {len(movie_ids)} movies.")
+
+
+class DeferredRefresh:
+    """`after_write`-Hook, der die geschriebenen Filme sammelt und höchstens alle `interval` Sekunden aktualisiert.
+
+    Fast alle Kinderfilme teilen sich Genres (Familie, Animation) und Länder, ein Refresh pro Flush würde deshalb
+    jedes Mal nahezu die ganze Collection neu aggregieren. `flush()` am Ende des Laufs holt den Rest nach.
+    """
+
+    def __init__(self, db, interval=None):
+        self.db = db
+        self.interval = float(os.getenv('analytics_refresh_seconds', 60)) if interval is None else interval
+        self.movie_ids = set()
+        self.last_refresh = time.monotonic()
+
+    async def __call__(self, movie_ids):
+        self.movie_ids.update(movie_ids)
+        if time.monotonic() - self.last_refresh >= self.interval:
+            await self.flush()
+
+    async def flush(self):
+        if not self.movie_ids:
+            return
+        movie_ids, self.movie_ids = self.movie_ids, set()
+        self.last_refresh = time.monotonic()
+        await refresh_for_movies(self.db, movie_ids)
+
+
+async def main():
+    import MongoDBContext as MongoDBC
+
+    load_dotenv()
+    async with MongoDBC.MongoDBContext(os.getenv('mongo_uri')) as (client, db):
+        await refresh_all(db)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,96 @@
+import datetime
+import os
+import sys
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from logger import logger
+
+CHECKPOINT_COLLECTION = "crawl_checkpoints"
+
+# Stufen der Anreicherung eines Films, in Reihenfolge
+STAGE_DISCOVERED = "discovered"
+STAGE_TMDB_DETAILS = "tmdb_details"
+STAGE_OMDB_WIKI = "omdb_wiki"
+STAGE_STORED = "stored"
+
+
+class CrawlCheckpoint:
+    """Crawl-Zustand in MongoDB: erledigte Seiten, Anreicherungsstufe pro Film und letzter TMDb-Changes-Abgleich.
+
+    Erledigte Seiten sind eigene Dokumente (wie die Filmstände), damit das Crawl-Dokument nicht unbegrenzt wächst;
+    Seiten von Partitionen, die nicht mehr im Plan stehen, entfernt `prune_pages`.
+    """
+
+    def __init__(self, db, crawl="tmdb_discover"):
+        self.collection = db[CHECKPOINT_COLLECTION]
+        self.crawl = crawl
+        self.pages_completed = set()
+        self.last_changes_check = None
+
+    def _page_id(self, page):
+        return f"{self.crawl}:page:{page}"
+
+    async def load(self):
+        state = await self.collection.find_one({"_id": self.crawl}) or {}
+        if state.get("pages_completed"):  # Älteres Format: alle Seiten als Array im Crawl-Dokument
+            for page in state["pages_completed"]:
+                partition = page.rsplit(":", 1)[0] if isinstance(page, str) else None
+                await self.mark_page_done(page, partition)
+            await self.collection.update_one({"_id": self.crawl}, {"$unset": {"pages_completed": ""}})
+        cursor = self.collection.find({"crawl": self.crawl, "page": {"$exists": True}}, {"page": 1})
+        self.pages_completed = {doc["page"] async for doc in cursor}
+        self.last_changes_check = state.get("last_changes_check")
+        if self.last_changes_check and self.last_changes_check.tzinfo is None:  # BSON-Daten kommen ohne Zeitzone (UTC)
+            self.last_changes_check = self.last_changes_check.replace(tzinfo=datetime.timezone.utc)
+        logger.info(f"Checkpoint '{self.crawl}': {len(self.pages_completed)} pages already completed, "
+                    f"last changes check {self.last_changes_check}")
+        return self
+
+    async def reset(self):
+        """Vollständiger Neu-Crawl: Seiten- und Filmstände verwerfen, Changes-Zeitstempel behalten."""
+        await self.collection.delete_many({"crawl": self.crawl, "$or": [{"page": {"$exists": True}},
+                                                                          {"movie_id": {"$exists": True}}]})
+        self.pages_completed = set()
+
+    def is_page_done(self, page):
+        return page in self.pages_completed
+
+    async def mark_page_done(self, page, partition=None):
+        """Merkt eine erledigte Seite; `partition` ist der Schlüssel ihrer Partition (None im Modus `pages`)."""
+        self.pages_completed.add(page)
+        await self.collection.update_one(
+            {"_id": self._page_id(page)},
+            {"$set": {"crawl": self.crawl, "page": page, "partition": partition,
+                      "updated_at": datetime.datetime.now(datetime.timezone.utc)}},
+            upsert=True,
+        )
+
+    async def prune_pages(self, partitions):
+        """Entfernt erledigte Seiten von Partitionen, die nicht in `partitions` (dem aktuellen Plan) vorkommen."""
+        result = await self.collection.delete_many(
+            {"crawl": self.crawl, "page": {"$exists": True}, "partition": {"$ne": None, "$nin": list(partitions)}}
+        )
+        if result.deleted_count:
+            cursor = self.collection.find({"crawl": self.crawl, "page": {"$exists": True}}, {"page": 1})
+            self.pages_completed = {doc["page"] async for doc in cursor}
+            logger.info(f"Checkpoint '{self.crawl}': dropped {result.deleted_count} pages of partitions no longer planned")
+        return result.deleted_count
+
+    async def set_movie_stage(self, movie_id, stage):
+        await self.collection.update_one(
+            {"_id": f"{self.crawl}:movie:{movie_id}"},
+            {"$set": {"crawl": self.crawl, "movie_id": movie_id, "stage": stage,
+                      "updated_at": datetime.datetime.now(datetime.timezone.utc)}},
+            upsert=True,
+        )
+
+    async def stored_movie_ids(self, movie_ids):
+        """IDs aus `movie_ids`, die in diesem Crawl bereits vollständig gespeichert wurden."""
+        cursor = self.collection.find(
+            {"crawl": self.crawl, "movie_id": {"$in": list(movie_ids)}, "stage": STAGE_STORED}, {"movie_id": 1}
+        )
+        return {doc["movie_id"] async for doc in cursor}
+
+    async def set_last_changes_check(self, timestamp):
+        self.last_changes_check = timestamp
+        await self.collection.update_one({"_id": self.crawl}, {"$set": {"last_changes_check": timestamp}}, upsert=True)
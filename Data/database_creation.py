@@ -5,57 +5,59 @@ import aiohttp
 import asyncio
 import MongoDBContext  as MongoDBC
 import database_operation
+import crawl_checkpoint as cp
+import movie_writer as mw
+import analytics
+import datetime
+import multiprocessing
 import time
 
 # Füge den Elternordner zum Python-Pfad hinzu
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
 from logger import logger
+import metrics
 import API_call.get_Data_API_movie as api_movies
+import API_call.response_cache as rc
+import API_call.discovery_planner as planner
+import API_call.http_session as http_session
+from Data.movie_model import Movie
+import Data.indexes as indexes
+import Data.imdb_datasets as imdb_datasets
+from Data.job_queue import JobQueue, worker_name
 
-async def insert_movies_into_db(collection, movies, page):
-    """Speichert Filme in MongoDB mit batch insert und Deduplizierung."""
-    if not isinstance(movies, list) or not movies:  # Check if movies is a list and not empty
-        logger.info("No movies to save.")
-        return
-    try:
-        # Fetch existing IMDb IDs from the database
-        existing_movie_ids = await collection.distinct("id")
-        logger.info(f"Length Existing_imdb_ids:{len(existing_movie_ids)}")
-        # Filter out movies that already exist in the database
-        unique_movies = [movie for movie in movies if movie and movie.get("id") and movie["id"] not in existing_movie_ids]
-
-        # Insert only unique movies into the database
-        if unique_movies:
-            await collection.insert_many(unique_movies, ordered=False)
-            logger.info(f"{len(unique_movies)} movies have been saved to the database from page {page}")
-        else:
-            logger.info("No movies to insert.")
-    except Exception as e:
-        logger.error(f"Error inserting movies: {str(e)}")
+def page_key(page, partition=None):
+    """Schlüssel einer erledigten Seite im Checkpoint: Seitenzahl, bei Partitionen mit deren Namen."""
+    return f"{partition.key}:{page}" if partition else page
 
 
-async def store_data_mongo_local(session, collection, page, limit):
-    """Holt Filme von der API und speichert sie in MongoDB."""
-    logger.info(f"Processing batch: Page {page}, Limit {limit}")
+async def store_data_mongo_local(session, writer, page, limit, checkpoint=None, partition=None):
+    """Holt Filme von der API und übergibt sie dem gepufferten MongoDB-Writer."""
+    logger.info(f"Processing batch: Page {page}, Limit {limit}{f', Partition {partition.key}' if partition else ''}")
     try:
         # Fetch movies from the API
-        movies = await api_movies.get_kinder_movies_parallel(session, page, limit)
+        movies = await api_movies.get_kinder_movies_parallel(session, page, limit, checkpoint, partition)
 
         # Log the fetched movies
-        logger.debug(f"Movies received for page {page}: {movies}")
+        logger.debug("Movies received for page %s: %s", page, movies)
 
-        # Check if movies is None or not a list
-        if not isinstance(movies, list) or movies is None:
+        # None: Seite nicht geladen, also auch nicht als erledigt markieren (der nächste Lauf holt sie erneut)
+        if not isinstance(movies, list):
             logger.warning(f"No valid movies returned for page {page}, limit {limit}")
             return
 
-        # Insert movies into the database
-        await insert_movies_into_db(collection, movies, page)
-        #logger.info(f"{len(movies)} movies inserted into the database.")
+        async def mark_stored():
+            for movie in movies:
+                if isinstance(movie, Movie) and movie.id and not movie.error:
+                    await checkpoint.set_movie_stage(movie.id, cp.STAGE_STORED)
+            if any(isinstance(movie, Exception) for movie in movies):
+                logger.warning(f"Page {page}: some movies failed, page stays open for the next run")
+                return
+            await checkpoint.mark_page_done(page_key(page, partition), partition.key if partition else None)
 
-        # Optional: Add a delay to avoid overloading the API
-        await asyncio.sleep(5)
+        # Der Checkpoint wird erst fortgeschrieben, wenn die Filme wirklich in MongoDB stehen
+        buffered = await writer.add(movies, on_flushed=mark_stored if checkpoint else None)
+        logger.info(f"{buffered} movies from page {page} queued for writing.")
 
     except aiohttp.ClientError as e:
         logger.error(f'Network error in store_data_mongo_local: {e}')
@@ -63,27 +65,78 @@ async def store_data_mongo_local(session, collection, page, limit):
         logger.error(f'Error in store_data_mongo_local: {repr(e)}')
         
         
+async def sync_changed_movies(session, collection, writer, checkpoint, batch_size=200):
+    """Reichert nur die Filme neu an, die sich seit dem letzten Lauf auf TMDb geändert haben."""
+    end_date = datetime.datetime.now(datetime.timezone.utc)
+    # TMDb liefert Änderungen für höchstens 14 Tage
+    start_date = max(checkpoint.last_changes_check or end_date - datetime.timedelta(days=1),
+                     end_date - datetime.timedelta(days=14))
+
+    changed_ids = list(await api_movies.get_changed_movie_ids(session, start_date, end_date))
+    cache = rc.get_response_cache()
+    updated = 0
+    for i in range(0, len(changed_ids), batch_size):
+        documents = await collection.find({"id": {"$in": changed_ids[i:i + batch_size]}}, {"_id": 0}).to_list(length=None)
+        movies = [Movie.from_tmdb(document) for document in documents]
+        for movie in movies:
+            if cache:  # Geänderte Details nicht aus dem HTTP-Cache bedienen
+                await cache.delete_async(api_movies.tmdb_details_url(movie.id))
+        results = await asyncio.gather(
+            *[api_movies.get_movie_details(session, movie, task_id) for task_id, movie in enumerate(movies, start=i)],
+            return_exceptions=True,
+        )
+        updated += await writer.add([movie for movie in results if isinstance(movie, Movie) and not movie.error])
+
+    await checkpoint.set_last_changes_check(end_date)
+    logger.info(f"{updated} of {len(changed_ids)} changed TMDb movies were re-enriched.")
+
+
 async def main_creation():
     """Main function to fetch and store movies in batches."""
     load_dotenv()
     items_per_page = int(os.getenv('items_per_page_tmdb', 20))
     num_pages = int(os.getenv('num_pages_tmdb', 5))
-    timeout = aiohttp.ClientTimeout(total=15)
     mongo_uri = os.getenv('mongo_uri', 5)
+    crawl_mode = os.getenv('crawl_mode', 'incremental')
+    discovery = os.getenv('discovery_mode', 'partitioned')
+    batch_size = int(os.getenv('write_batch_size', 500))
+    flush_interval = float(os.getenv('write_flush_seconds', 5))
     
     start_time = time.time()  # Record start time
+    metrics_server = None
       
     try:
-        async with aiohttp.ClientSession(timeout=timeout) as session:
+        metrics_server = await metrics.serve()
+        async with http_session.create_session() as session:
             async with MongoDBC.MongoDBContext(mongo_uri) as (client, db):
                 if client is None or db is None:
                     logger.error("Failed to connect to MongoDB. Exiting...")
                     return
                 
                 collection = db["children_movies"]
-                tasks = [store_data_mongo_local(session, collection, page, items_per_page) for page in range(1, num_pages + 1)]
 
-                semaphore = asyncio.Semaphore(5)
+                # crawl_mode=full verwirft den Checkpoint, incremental setzt dort fort und gleicht TMDb-Änderungen ab
+                checkpoint = await cp.CrawlCheckpoint(db).load()
+                if crawl_mode == "full":
+                    await checkpoint.reset()
+                # partitioned: ganzer Katalog in Partitionen unter dem 500-Seiten-Limit, pages: die ersten num_pages Seiten
+                if discovery == "partitioned":
+                    start = datetime.date(int(os.getenv('discover_start_year', 1900)), 1, 1)
+                    plan = await planner.plan_partitions(session, start)
+                    await checkpoint.prune_pages(partition.key for partition, _ in plan)
+                    all_pages = [(page, partition) for partition, total_pages in plan for page in range(1, total_pages + 1)]
+                else:
+                    all_pages = [(page, None) for page in range(1, num_pages + 1)]
+                pages = [(page, partition) for page, partition in all_pages
+                         if not checkpoint.is_page_done(page_key(page, partition))]
+                logger.info(f"{len(pages)} of {len(all_pages)} pages left to crawl.")
+                refresh_analytics = analytics.DeferredRefresh(db)
+                writer = mw.MovieWriter(collection, batch_size, flush_interval, after_write=refresh_analytics)
+                tasks = [store_data_mongo_local(session, writer, page, items_per_page, checkpoint, partition)
+                         for page, partition in pages]
+
+                # Die Drosselung pro API übernimmt der Request-Scheduler, hier wird nur die Anzahl paralleler Seiten begrenzt
+                semaphore = asyncio.Semaphore(int(os.getenv('parallel_pages_tmdb', 5)))
 
                 async def limited_task(task_id, task):
                     async with semaphore:
@@ -93,20 +146,26 @@ async def main_creation():
                             logger.error(f"Error in task {task_id}: {e}")
                             return
 
-                batch_size = 5
-                for i in range(0, len(tasks), batch_size):
-                    batch = tasks[i:i + batch_size]
-                    
-                    await asyncio.gather(*[limited_task(i + j + 1, task) for j, task in enumerate(batch)])
-                    
-                    logger.info(f"Batch {i // batch_size + 1} completed. Sleeping before starting next batch...")
-                    await asyncio.sleep(2)
+                async with writer:
+                    await asyncio.gather(*[limited_task(task_id, task) for task_id, task in enumerate(tasks, start=1)])
+
+                    if crawl_mode == "incremental":
+                        await sync_changed_movies(session, collection, writer, checkpoint)
+                await refresh_analytics.flush()
+
+                # omdb_policy=gaps: Bewertungen der neuen Filme aus den IMDb-Datasets statt von OMDb
+                if api_movies.OMDB_POLICY == "gaps" and imdb_datasets.available():
+                    await imdb_datasets.enrich_from_imdb_datasets(collection)
                     
         elapsed_time = time.time() - start_time  # Calculate elapsed time
         logger.info(f"Data storage process completed. Time elapsed: {elapsed_time:.2f} seconds.")
 
     except Exception as e:
         logger.error(f'Error in main_creation: {e}')
+    finally:
+        metrics.log_summary()
+        if metrics_server:
+            await metrics_server.cleanup()
 
 
 async def main_update():
@@ -114,20 +173,158 @@ async def main_update():
     load_dotenv()
     mongo_uri = os.getenv('mongo_uri', 5)
     
-    async with aiohttp.ClientSession() as session:
-        async with MongoDBC.MongoDBContext(mongo_uri) as (client, db):
-            if client is None or db is None:
-                logger.error("Failed to get a valid MongoDB client or database")
-                return  # Beende die Funktion, um weitere Fehler zu vermeiden
-            else:
+    metrics_server = None
+    try:
+        metrics_server = await metrics.serve()
+        async with http_session.create_session() as session:
+            async with MongoDBC.MongoDBContext(mongo_uri) as (client, db):
+                if client is None or db is None:
+                    logger.error("Failed to get a valid MongoDB client or database")
+                    return  # Beende die Funktion, um weitere Fehler zu vermeiden
+                else:
+                    collection = db["children_movies"]
+                    # Erst der Bulk-Join mit den IMDb-Datasets (Bewertungen), danach OMDb für die übrigen Felder
+                    if imdb_datasets.available():
+                        await imdb_datasets.enrich_from_imdb_datasets(collection)
+                    await database_operation.update_movie_details_in_db(session, collection)
+    finally:
+        metrics.log_summary()
+        if metrics_server:
+            await metrics_server.cleanup()
+
+
+# ------------------ Worker-Pool-Modus ------------------
+
+async def enqueue_pending_movies(db, queue, chunk_size=50):
+    """Coordinator: legt für alle noch nicht angereicherten Filme Jobs in der Queue an."""
+    pending = indexes.pending_statuses()
+    cursor = db["children_movies"].find({"enrichment_status": {"$in": pending}}, {"_id": 0, "id": 1})
+    movie_ids = [movie["id"] async for movie in cursor]
+    return await queue.enqueue(movie_ids, chunk_size)
+
+
+async def process_job(session, collection, writer, queue, job):
+    """Reichert die Filme eines Jobs an; die Lease wird währenddessen regelmäßig verlängert."""
+    async def heartbeat():
+        while True:
+            await asyncio.sleep(queue.lease_seconds / 3)
+            if not await queue.extend(job):
+                logger.warning(f"Lost lease on job {job['_id']}")
+                return
+
+    keep_alive = asyncio.create_task(heartbeat())
+    try:
+        documents = await collection.find({"id": {"$in": job["movie_ids"]}}, {"_id": 0}).to_list(length=None)
+        results = await asyncio.gather(
+            *[api_movies.get_movie_details(session, Movie.from_tmdb(document), task_id)
+              for task_id, document in enumerate(documents)],
+            return_exceptions=True,
+        )
+        enriched = [movie for movie in results if isinstance(movie, Movie) and not movie.error]
+        # Fehlgeschlagen: Exception, Fehler beim Anreichern, oder OMDb nicht verfügbar (Film bleibt `pending_omdb`)
+        failed = [document["id"] for document, movie in zip(documents, results)
+                  if not isinstance(movie, Movie) or movie.error
+                  or (movie.tmdb.imdb_id and movie.omdb is None and api_movies.OMDB_POLICY != "gaps")]
+        write_errors = []
+
+        async def write_failed(error):
+            write_errors.append(error)
+
+        await writer.add(enriched, on_failed=write_failed)
+        await writer.flush()  # Erst nach dem Schreiben ist der Job erledigt; wirft MovieWriteError bei Fehlern
+        if write_errors:  # Auch ein automatischer Flush (voller Puffer) kann die Filme des Jobs verloren haben
+            raise write_errors[0]
+        if failed:  # Der nächste Versuch wiederholt nur die fehlgeschlagenen Filme
+            await queue.fail(job, f"{len(failed)} of {len(job['movie_ids'])} movies failed", movie_ids=failed)
+            return
+        await queue.complete(job, enriched=len(enriched))
+        logger.info(f"Job {job['_id']}: {len(enriched)} of {len(job['movie_ids'])} movies enriched")
+    except Exception as e:
+        await queue.fail(job, repr(e))
+    finally:
+        keep_alive.cancel()
+
+
+async def worker_main(worker_id, poll_interval=5):
+    """Ein Worker-Prozess: eigene aiohttp-Session und eigener Motor-Client, arbeitet Jobs ab, bis die Queue leer ist."""
+    load_dotenv()
+    name = worker_name(worker_id)
+    base_port = int(os.getenv('metrics_port', 0))  # Worker i exportiert auf metrics_port + 1 + i
+    metrics_server = None
+    try:
+        metrics_server = await metrics.serve(base_port + 1 + worker_id) if base_port else None
+        async with http_session.create_session() as session:
+            async with MongoDBC.MongoDBContext(os.getenv('mongo_uri'), ensure_indexes=False) as (client, db):
                 collection = db["children_movies"]
-                await database_operation.update_movie_details_in_db(session, collection)
-                await client.close()
+                queue = JobQueue(db, lease_seconds=int(os.getenv('job_lease_seconds', 300)))
+                refresh_analytics = analytics.DeferredRefresh(db)
+                writer = mw.MovieWriter(collection, int(os.getenv('write_batch_size', 500)), after_write=refresh_analytics)
+                jobs = 0
+                async with writer:
+                    while True:
+                        job = await queue.lease(name)
+                        if job is None:
+                            if not await queue.has_open_jobs():
+                                break
+                            await asyncio.sleep(poll_interval)  # Jobs anderer Worker laufen noch, ggf. läuft deren Lease ab
+                            continue
+                        await process_job(session, collection, writer, queue, job)
+                        jobs += 1
+                await refresh_analytics.flush()
+                logger.info(f"Worker {name} finished after {jobs} jobs.")
+    finally:
+        metrics.log_summary()  # Je Prozess; der Coordinator sieht die Metriken der Worker nicht
+        if metrics_server:
+            await metrics_server.cleanup()
+
+
+def run_worker(worker_id):
+    """Einstiegspunkt eines Worker-Prozesses."""
+    asyncio.run(worker_main(worker_id))
+
+
+async def enqueue_jobs():
+    load_dotenv()
+    async with MongoDBC.MongoDBContext(os.getenv('mongo_uri')) as (client, db):
+        queue = JobQueue(db)
+        await queue.ensure_indexes()
+        await enqueue_pending_movies(db, queue, int(os.getenv('job_chunk_size', 50)))
+        logger.info(f"Queue status: {await queue.stats()}")
+
+
+def main_workers(processes=None, enqueue=True):
+    """Worker-Pool-Modus: Coordinator füllt die Queue, danach arbeiten `processes` Prozesse sie parallel ab.
+
+    Weitere Hosts können mit `python database_creation.py work N` gegen dieselbe Datenbank mitarbeiten.
+    """
+    processes = processes or int(os.getenv('enrichment_processes', os.cpu_count() or 1))
+    start_time = time.time()
+    if enqueue:
+        asyncio.run(enqueue_jobs())
+    context = multiprocessing.get_context("spawn")  # Kein geerbter Event-Loop / Mongo-Client aus dem Elternprozess
+    workers = [context.Process(target=run_worker, args=(worker_id,), name=f"enrichment-worker-{worker_id}")
+               for worker_id in range(processes)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    logger.info(f"{processes} enrichment workers finished in {time.time() - start_time:.2f} seconds.")
 
 
 if __name__ == "__main__":
+    # python database_creation.py [update|crawl|pool N|enqueue|work N]
+    command = sys.argv[1] if len(sys.argv) > 1 else "update"
+    count = int(sys.argv[2]) if len(sys.argv) > 2 else None
     try: 
-        asyncio.run(main_update())
-        #asyncio.run(main_creation())
+        if command == "crawl":
+            asyncio.run(main_creation())
+        elif command == "pool":
+            main_workers(count)
+        elif command == "enqueue":
+            asyncio.run(enqueue_jobs())
+        elif command == "work":
+            main_workers(count, enqueue=False)
+        else:
+            asyncio.run(main_update())
     except Exception as e:
         logger.error(f"Unexpected error in main: {str(e)}")
\ No newline at end of file
@@ -10,14 +10,43 @@ import aiohttp
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 from logger import logger
 import API_call.get_Data_API_movie as api_movies
+import Data.indexes as indexes
+import Data.movie_writer as mw
+import Data.streaming as streaming
+import Data.analytics as analytics
+import Data.search_index as search_index
+from Data.movie_model import Movie, TmdbRecord
+
+
+async def get_movie_by_title(titel_film, db, limit=10, projection=None):
+    """Sucht Filme nach Titel (gerankt, Präfix und tippfehlertolerant) über den lokalen Suchindex.
+
+    Args:
+        titel_film (str): Suchbegriff, auch unvollständig oder mit Tippfehlern
+        db : database
+        limit (int): maximale Anzahl Treffer
+
+    Returns:
+        list: passende Filme, bester Treffer zuerst
+    """
+    collection = db["children_movies"]
+    index = await search_index.get_search_index(collection)
+    ranked = [movie_id for movie_id, _ in index.search(titel_film, limit)]
+    if not ranked:
+        # Noch nicht im Index (z. B. gerade erst gespeichert): Volltextsuche in MongoDB
+        return await search_index.text_search(collection, titel_film, projection, limit)
+
+    movies = await collection.find({"id": {"$in": ranked}}, projection or {"_id": 0}).to_list(length=limit)
+    position = {movie_id: rank for rank, movie_id in enumerate(ranked)}
+    movies.sort(key=lambda movie: position.get(movie.get("id"), limit))
+    logger.info(f"{len(movies)} movies found for '{titel_film}'")
+    return movies
 
 
-def get_movie_by_title(titel_film,db):
-    pass
-    
 
 async def get_info_by_id(collection, id):
     movie =await collection.find_one({"imdb_id": id}, {"title": 1, "wikidata_id": 1, "_id": 0})
+    title, wikidata_id = None, None
 
     if movie:
         title = movie.get("title")
@@ -28,94 +57,98 @@ async def get_info_by_id(collection, id):
         
     return title, wikidata_id
 
-def get_all_film_released_after(db, release_Date):
-    """get all films released after the given Date
-       (can add  parameter Before as a boolean to make it possible getting before 
-       or after)
+async def get_all_film_released_after(db, after=None, before=None, projection=None, batch_size=500):
+    """Filme, die nach `after` und/oder vor `before` erschienen sind (beide Grenzen exklusiv).
+
+    Die Abfrage läuft als Bereichsabfrage über den Index auf `released_at`; zurückgegeben wird ein Cursor,
+    über den die Treffer mit `async for` gestreamt werden, statt alle Dokumente auf einmal zu laden.
+
     Args:
         db : database
-        release_Date (str): date_to_filter
+        after (str | date): untere Grenze, z. B. "2010-01-01" oder "01 Jan 2010"
+        before (str | date): obere Grenze; mit `after` zusammen ein Zeitraum
+        projection (dict): optionale Projektion
+        batch_size (int): Dokumente pro Batch des Cursors
 
     Returns:
-        list: all films released after the given release_date
+        AsyncIOMotorCursor: Filme nach Erscheinungsdatum aufsteigend sortiert
     """
-    collection = db["children_movies"]
-
-    # Convert the input release date (string) to a datetime object
-    release_date = datetime.strptime(release_Date, "%d %b %Y")
-
-    # Fetch all movies where `omdb_details.released` exists
-    movies = collection.find({"omdb_details.released": {"$exists": True}})
-
-    # Manually filter by converting `released` from string to datetime
-    filtered_movies = []
-    for movie in movies:
-        try:
-            movie_date = datetime.strptime(movie["omdb_details"]["released"], "%d %b %Y")
-            if movie_date > release_date:
-                filtered_movies.append(movie)
-        except ValueError:
-            logger.error(f"Skipping movie {movie.get('title', 'Unknown')} due to invalid date format: {movie['omdb_details']['released']}")
-    logger.info(f"filtered films extracted from the db after release_date:{release_Date} ")
-    return filtered_movies
-        
-async def update_movie_details_in_db(session, collection):
-    """Update movie details in MongoDB for movies missing OMDb details."""
+    bounds = {}
+    for operator, value in (("$gt", after), ("$lt", before)):
+        if value is None:
+            continue
+        parsed = indexes.parse_release_date(value)
+        if parsed is None:
+            raise ValueError(f"Invalid release date: {value!r}")
+        bounds[operator] = parsed
+    if not bounds:
+        raise ValueError("At least one of 'after' or 'before' is required")
+
+    logger.info(f"Streaming films released {' and '.join(f'{op[1:]} {date.date()}' for op, date in bounds.items())}")
+    return (db["children_movies"].find({"released_at": bounds}, projection, batch_size=batch_size)
+            .sort("released_at", 1))
+
+async def update_movie_details_in_db(session, collection, workers=None, batch_size=None):
+    """Update movie details in MongoDB for movies missing OMDb details.
+
+    Die offenen Filme werden per Cursor gestreamt und von `workers` Koroutinen parallel geprüft und angereichert,
+    die Ergebnisse gehen gebündelt über den MovieWriter in die Datenbank.
+    """
+    workers = workers or int(os.getenv('update_workers', 10))
+    batch_size = batch_size or int(os.getenv('write_batch_size', 500))
     try:
-        # Find movies where `omdb_details` is missing or empty
-        movies = await collection.find({"$or": [{"omdb_details": None}, {"omdb_details": {}}]}).to_list(length=None)
-        if not movies:
+        # Find movies where `omdb_details` is missing or empty (indexed via `enrichment_status`)
+        pending = indexes.pending_statuses()
+        projection = {"_id": 0, "id": 1, "imdb_id": 1, "title": 1, "wikidata_id": 1, "omdb_details": 1}
+        cursor = collection.find({"enrichment_status": {"$in": pending}}, projection, batch_size=batch_size)
+
+        refresh_analytics = analytics.DeferredRefresh(collection.database)
+        async with mw.MovieWriter(collection, batch_size, after_write=refresh_analytics) as writer:
+            async def process(movie, worker_id):
+                themoviedb_id = movie.get("id")
+                result = await api_movies.get_more_informations(session, themoviedb_id)
+                if not result:
+                    logger.info(f"this is not a film or not yet released {movie.get('title')}")
+                    await writer.remove([themoviedb_id])
+                    logger.info(f"this item  {movie.get('title')} is deleted from the database.")
+                    return
+
+                if not movie.get("imdb_id"):
+                    logger.warning(f"[Worker {worker_id}] Movie {themoviedb_id} has no IMDb ID. Skipping.")
+                    return
+
+                await update_single_movie(session, writer, movie, worker_id)
+
+            processed = await streaming.run_workers(cursor, process, workers)
+        await refresh_analytics.flush()
+
+        if not processed:
             logger.info("No movies found that need updating.")
             return
-
-        logger.info(f"Found {len(movies)} movies to update.")
-
-        # Create tasks for fetching and updating movie details
-        tasks = []
-        for task_id, movie in enumerate(movies, start=1):  # Assign a task_id starting from 1
-            themoviedb_id = movie.get("id")
-            result = await api_movies.get_more_informations(session, themoviedb_id)
-            if not result:
-                logger.info(f"this is not a film or not yet released {movie.get("title")}")
-                collection.delete_one({"id": themoviedb_id})
-                logger.info(f"this item  {movie.get("title")} is deleted from the database.")
-            else:
-                imdb_id = movie.get("imdb_id")
-                if not imdb_id:
-                    logger.warning(f"[Task {task_id}] Movie {movie['_id']} has no IMDb ID. Skipping.")
-                    continue
-
-                # Create a task with a unique task_id
-                task = update_single_movie(session, collection, imdb_id, task_id)
-                tasks.append(task)
-
-        # Run all tasks in parallel
-        await asyncio.gather(*tasks)
-        logger.info("All movies have been processed.")
+        logger.info(f"All {processed} movies have been processed.")
 
     except Exception as e:
         logger.error(f"Error during update: {e}")
 
 
 
-async def update_single_movie(session, collection, imdb_id, task_id):
+async def update_single_movie(session, writer, movie, task_id):
     """Fetch and update details for a single movie."""
+    imdb_id = movie.get("imdb_id")
     try:
-        title, wikidata_id = await get_info_by_id(collection, imdb_id)
-        movie_data = await api_movies.fetch_movie_omdb_wiki(session, title, imdb_id, wikidata_id, task_id)
+        omdb, wikipedia = await api_movies.fetch_movie_omdb_wiki(session, movie.get("title"), imdb_id, movie.get("wikidata_id"), task_id)
         
-        if not movie_data:
-            logger.warning(f"[Task {task_id}] No data found for IMDb ID {imdb_id}. Skipping.")
+        if omdb is None:  # OMDb nicht verfügbar (z. B. alle Keys erschöpft): nichts schreiben, der Status bleibt offen
+            logger.warning(f"[Task {task_id}] No OMDb data for IMDb ID {imdb_id}. Skipping.")
             return
+        if omdb.fallback_title is not None and movie.get("omdb_details"):
+            # "Movie not found!" ersetzt vorhandene Werte (z. B. aus den IMDb-Datasets) nicht, sondern ergänzt sie
+            omdb.extra = {**movie["omdb_details"], **(omdb.extra or {})}
 
-        # Update MongoDB mit neuen Daten
-        await collection.update_one(
-            {"imdb_id": imdb_id},
-            {"$set": {"omdb_details": movie_data}}
-        )
+        # Update MongoDB mit neuen Daten (gebündelt, der Status wird dabei auf "complete" gesetzt)
+        await writer.add([Movie(TmdbRecord(id=movie["id"], imdb_id=imdb_id), omdb, wikipedia)])
         
         logger.info(f"[Task {task_id}] Updated movie with IMDb ID {imdb_id}.")
-        await asyncio.sleep(1)  # Rate-Limit
 
     except aiohttp.ClientError as e:
         logger.error(f"[Task {task_id}] Network error while updating IMDb ID {imdb_id}: {e}")
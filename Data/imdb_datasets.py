@@ -0,0 +1,191 @@
+import asyncio
+import csv
+import datetime
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+from dotenv import load_dotenv
+from pymongo import UpdateOne
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from logger import logger
+import metrics
+import Data.analytics as analytics
+import Data.indexes as indexes
+import Data.streaming as streaming
+import Data.imdb_title_index as title_index
+
+# IMDb-Datasets (https://datasets.imdbws.com/), neben title.basics.tsv.gz abgelegt
+DEFAULT_RATINGS_PATH = os.path.join(os.path.dirname(__file__), "title.ratings.tsv.gz")
+
+# Spalte im Join -> Schlüssel in `omdb_details` (gleiche Schlüssel wie die OMDb-Antwort, damit Analytics, API und
+# Parquet-Export unverändert bleiben; siehe auch indexes.IMDB_DATASET_KEYS)
+DATASET_FIELDS = {"imdbRating": "imdbRating", "imdbVotes": "imdbVotes", "runtimeMinutes": "Runtime", "startYear": "Year"}
+# Typen wie nach dem Parsen der OMDb-Antwort (OmdbRecord): Bewertung float, Stimmen und Minuten int, Jahr Text
+DATASET_TYPES = {"imdbRating": float, "imdbVotes": int, "Runtime": int, "Year": str}
+
+
+def ratings_path():
+    return os.getenv('imdb_ratings_path', DEFAULT_RATINGS_PATH)
+
+
+def available(path=None):
+    """Ob die Ratings-Datei vorliegt; ohne sie läuft die Anreicherung wie bisher nur über OMDb."""
+    return os.path.exists(path or ratings_path())
+
+
+def tconst_numbers(values):
+    """IMDb-IDs ("tt0114709") als Zahlen, damit der Join über Integer-Arrays statt über Strings läuft."""
+    return pd.to_numeric(pd.Series(values, dtype=str).str[2:], errors="coerce").fillna(0).astype(np.uint32).to_numpy()
+
+
+def read_dataset(file_path, usecols, wanted, chunksize=500000):
+    """Liest eine IMDb-TSV chunkweise und behält nur die Zeilen, deren tconst in `wanted` (sortiert) vorkommt."""
+    frames = []
+    for chunk in pd.read_csv(file_path, sep="\t", dtype=str, encoding="utf-8", usecols=usecols,
+                             chunksize=chunksize, na_values="\\N", quoting=csv.QUOTE_NONE):
+        numbers = tconst_numbers(chunk["tconst"])
+        hits = np.isin(numbers, wanted)
+        if hits.any():
+            frames.append(chunk[hits].assign(tconst=numbers[hits]))
+    if not frames:
+        return pd.DataFrame(columns=usecols).astype({"tconst": np.uint32})
+    return pd.concat(frames, ignore_index=True)
+
+
+def join_datasets(movies, ratings_file, basics_file=None, chunksize=500000):
+    """Verknüpft die Filme (`id` und `imdb_id` oder schon `tconst`) in einem Durchlauf mit title.ratings und optional
+    title.basics.
+
+    Gibt je gefundenem Film `id` und die Spalten aus DATASET_FIELDS zurück (fehlende Werte als NaN).
+    """
+    if "tconst" not in movies:
+        movies = movies.assign(tconst=tconst_numbers(movies["imdb_id"]))
+    wanted = np.unique(movies["tconst"].to_numpy())
+    with metrics.timer("stage_seconds", stage="imdb_ratings_read"):
+        ratings = read_dataset(ratings_file, ["tconst", "averageRating", "numVotes"], wanted, chunksize)
+    joined = movies.merge(ratings, on="tconst", how="inner")
+    joined["imdbRating"] = pd.to_numeric(joined["averageRating"], errors="coerce")
+    joined["imdbVotes"] = pd.to_numeric(joined["numVotes"], errors="coerce")
+
+    if basics_file and os.path.exists(basics_file):
+        with metrics.timer("stage_seconds", stage="imdb_basics_read"):
+            basics = read_dataset(basics_file, ["tconst", "startYear", "runtimeMinutes"],
+                                  np.unique(joined["tconst"].to_numpy()), chunksize)
+        joined = joined.merge(basics, on="tconst", how="left")
+        joined["runtimeMinutes"] = pd.to_numeric(joined["runtimeMinutes"], errors="coerce")
+    else:
+        joined["runtimeMinutes"] = np.nan
+        joined["startYear"] = None
+    return joined[["id", *DATASET_FIELDS]]
+
+
+def _value(value, type_):
+    """Wert aus dem Join als BSON-taugliches `type_` (float, int oder str); NaN/None wird None."""
+    if value is None or (isinstance(value, float) and np.isnan(value)):
+        return None
+    return type_(value)
+
+
+async def _refresh_analytics(collection, refresh):
+    try:
+        with metrics.timer("db_after_write_seconds", collection=collection.name):
+            await refresh
+    except Exception as e:
+        logger.error(f"Error refreshing analytics after IMDb dataset enrichment: {repr(e)}")
+
+
+async def enrich_from_imdb_datasets(collection, ratings_file=None, basics_file=title_index.DEFAULT_TSV_PATH,
+                                    batch_size=1000, chunksize=500000):
+    """Setzt IMDb-Bewertung, Stimmen, Laufzeit und Jahr aller Filme mit IMDb-ID aus den IMDb-Datasets.
+
+    Ein vektorisierter Join statt eines OMDb-Requests pro Film; geschrieben wird nur, was sich geändert hat, per
+    `bulk_write`. Filme ohne OMDb-Antwort stehen danach auf `pending_omdb_extras`: Bewertungen sind sofort in den
+    Analytics, und der OMDb-Durchlauf lässt sie aus; die übrigen Felder (Rated, Awards, BoxOffice, Director, Actors)
+    holt `update_movie_details_in_db` nur mit `omdb_fetch_extras=on`.
+    """
+    ratings_file = ratings_file or ratings_path()
+    if not available(ratings_file):
+        logger.warning(f"IMDb ratings dataset not found at {ratings_file}, skipping bulk enrichment.")
+        return 0
+
+    # `omdb_details: null` (OMDb kannte den Film nicht) lässt sich nicht per Punkt-Notation ergänzen
+    query = {"imdb_id": {"$type": "string", "$gt": ""},
+             "$or": [{"omdb_details": {"$exists": False}}, {"omdb_details": {"$type": "object"}}]}
+    # 1. Durchlauf: nur TMDb- und IMDb-ID, chunkweise in kompakte Arrays, für einen einzigen Join über die Datasets
+    id_chunks, tconst_chunks = [], []
+    cursor = collection.find(query, {"_id": 0, "id": 1, "imdb_id": 1}, batch_size=batch_size)
+    async for chunk in streaming.chunked(cursor, batch_size):
+        id_chunks.append(np.array([movie["id"] for movie in chunk], dtype=np.int64))
+        tconst_chunks.append(tconst_numbers([movie["imdb_id"] for movie in chunk]))
+    if not id_chunks:
+        logger.info("No movies with an IMDb ID to enrich from the IMDb datasets.")
+        return 0
+    movies = pd.DataFrame({"id": np.concatenate(id_chunks), "tconst": np.concatenate(tconst_chunks)})
+    del id_chunks, tconst_chunks
+
+    with metrics.timer("stage_seconds", stage="imdb_datasets_join"):
+        joined = await asyncio.to_thread(join_datasets, movies, ratings_file, basics_file, chunksize)
+    joined = joined.sort_values("id", ignore_index=True)
+    joined_ids = joined["id"].to_numpy()
+
+    # 2. Durchlauf: ganz `omdb_details` (ob schon eine OMDb-Antwort gespeichert ist, zeigen die übrigen Schlüssel),
+    # chunkweise verglichen und geschrieben, damit nie alle Filme gleichzeitig im Speicher liegen
+    updated = 0
+    refresh_analytics = analytics.DeferredRefresh(collection.database)
+    projection = {"_id": 0, "id": 1, "imdb_id": 1, "omdb_details": 1}
+    cursor = collection.find(query, projection, batch_size=batch_size)
+    async for chunk in streaming.chunked(cursor, batch_size):
+        ids = np.array([movie["id"] for movie in chunk], dtype=np.int64)
+        positions = np.minimum(np.searchsorted(joined_ids, ids), max(len(joined_ids) - 1, 0))
+        found = joined_ids[positions] == ids if len(joined_ids) else np.zeros(len(ids), dtype=bool)
+        rows = joined.iloc[positions[found]]
+        operations, movie_ids = [], []
+        for movie, row in zip((movie for movie, hit in zip(chunk, found) if hit), rows.itertuples(index=False)):
+            values = {key: _value(getattr(row, column), DATASET_TYPES[key]) for column, key in DATASET_FIELDS.items()}
+            current = movie.get("omdb_details") or {}
+            changed = {key: value for key, value in values.items() if value is not None and current.get(key) != value}
+            if not changed:
+                continue
+            status = indexes.enrichment_status({"imdb_id": movie["imdb_id"], "omdb_details": {**current, **changed}})
+            operations.append(UpdateOne(
+                {"id": movie["id"]},
+                {"$set": {**{f"omdb_details.{key}": value for key, value in changed.items()},
+                          "enrichment_status": status,
+                          "imdb_dataset_at": datetime.datetime.now(datetime.timezone.utc)},
+                 "$currentDate": {"updated_at": True}},
+            ))
+            movie_ids.append(movie["id"])
+        if not operations:
+            continue
+
+        with metrics.timer("db_write_seconds", collection=collection.name):
+            result = await collection.bulk_write(operations, ordered=False)
+        updated += result.modified_count
+        # Die Zusammenfassungen aggregieren `omdb_details.imdbRating`, wie nach jedem MovieWriter-Flush
+        await _refresh_analytics(collection, refresh_analytics(movie_ids))
+    await _refresh_analytics(collection, refresh_analytics.flush())
+    metrics.registry.inc("imdb_dataset_movies_total", len(joined), result="matched")
+    metrics.registry.inc("imdb_dataset_movies_total", len(movies) - len(joined), result="missing")
+    logger.info(f"IMDb datasets: {len(joined)} of {len(movies)} movies matched, {updated} updated.")
+    return updated
+
+
+async def main():
+    import MongoDBContext as MongoDBC  # Nur für die CLI, Data/ liegt dann im Suchpfad
+
+    load_dotenv()
+    async with MongoDBC.MongoDBContext(os.getenv('mongo_uri')) as (client, db):
+        if client is None or db is None:
+            logger.error("Failed to get a valid MongoDB client or database")
+            return
+        await enrich_from_imdb_datasets(db[indexes.MOVIES_COLLECTION],
+                                        sys.argv[1] if len(sys.argv) > 1 else None,
+                                        sys.argv[2] if len(sys.argv) > 2 else title_index.DEFAULT_TSV_PATH)
+    metrics.log_summary()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,239 @@
+import asyncio
+import csv
+import json
+import os
+import shutil
+import sys
+import threading
+from bisect import bisect_left
+from collections import namedtuple
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from logger import logger
+import utils as u
+
+DEFAULT_TSV_PATH = os.path.join(os.path.dirname(__file__), "title.basics.tsv.gz")
+INDEX_VERSION = 1
+
+TitleRecord = namedtuple("TitleRecord", ["tconst", "primary_title", "title_type", "start_year"])
+
+# ------------------ Index Build (einmalig) ------------------
+
+def index_dir_for(file_path):
+    """Leitet das Index-Verzeichnis aus dem Pfad der IMDb-TSV ab (title.basics.tsv.gz -> title.basics.idx)."""
+    base = os.path.basename(file_path)
+    for suffix in (".gz", ".tsv"):
+        if base.endswith(suffix):
+            base = base[:-len(suffix)]
+    return os.path.join(os.path.dirname(file_path), f"{base}.idx")
+
+
+def source_stamp(file_path):
+    """Größe und Änderungszeit der TSV; stehen in meta.json, damit ein neuer Dump den Index neu bauen lässt."""
+    stat = os.stat(file_path)
+    return {"source_size": stat.st_size, "source_mtime_ns": stat.st_mtime_ns}
+
+
+def _write_blob(path, values):
+    """Schreibt Strings hintereinander als UTF-8 und gibt die Offsets zurück."""
+    offsets = np.zeros(len(values) + 1, dtype=np.int64)
+    with open(path, "wb") as blob:
+        position = 0
+        for i, value in enumerate(values):
+            blob.write(value)
+            position += len(value)
+            offsets[i + 1] = position
+    return offsets
+
+
+def build_title_index(file_path=DEFAULT_TSV_PATH, index_dir=None, chunksize=500000):
+    """Wandelt title.basics.tsv.gz einmalig in einen kompakten, memory-mapped Index um."""
+    index_dir = index_dir or index_dir_for(file_path)
+    os.makedirs(index_dir, exist_ok=True)
+    logger.info(f"Building IMDb title index from {file_path} into {index_dir}")
+
+    usecols = ["tconst", "titleType", "primaryTitle", "startYear"]
+    keys, titles, tconsts, years, types = [], [], [], [], []
+    for chunk in pd.read_csv(file_path, sep="\t", dtype=str, encoding="utf-8", usecols=usecols,
+                             chunksize=chunksize, na_values="\\N", quoting=csv.QUOTE_NONE):
+        chunk = chunk.dropna(subset=["tconst", "primaryTitle"])
+        keys.extend(u.normalize_title(title).encode("utf-8") for title in chunk["primaryTitle"])
+        titles.extend(title.encode("utf-8") for title in chunk["primaryTitle"])
+        tconsts.append(chunk["tconst"].str[2:].astype(np.uint32).to_numpy())
+        years.append(pd.to_numeric(chunk["startYear"], errors="coerce").fillna(0).astype(np.int16).to_numpy())
+        types.append(chunk["titleType"].fillna("").to_numpy())
+
+    # Sortierung nach normalisiertem Titel (Byte-Reihenfolge), damit Lookups per Binärsuche laufen
+    order = sorted(range(len(keys)), key=keys.__getitem__)
+    title_types = np.concatenate(types) if types else np.array([], dtype=object)
+    type_names = sorted(set(title_types))
+    type_codes = {name: code for code, name in enumerate(type_names)}
+
+    np.save(os.path.join(index_dir, "key_offsets.npy"), _write_blob(os.path.join(index_dir, "keys.bin"), [keys[i] for i in order]))
+    np.save(os.path.join(index_dir, "title_offsets.npy"), _write_blob(os.path.join(index_dir, "titles.bin"), [titles[i] for i in order]))
+    np.save(os.path.join(index_dir, "tconst.npy"), np.concatenate(tconsts)[order] if tconsts else np.array([], dtype=np.uint32))
+    np.save(os.path.join(index_dir, "start_year.npy"), np.concatenate(years)[order] if years else np.array([], dtype=np.int16))
+    np.save(os.path.join(index_dir, "title_type.npy"), np.array([type_codes[t] for t in title_types[order]], dtype=np.uint8))
+
+    with open(os.path.join(index_dir, "meta.json"), "w", encoding="utf-8") as meta:
+        json.dump({"version": INDEX_VERSION, "source": os.path.abspath(file_path), **source_stamp(file_path),
+                   "rows": len(order), "title_types": type_names}, meta)
+
+    logger.info(f"IMDb title index with {len(order)} titles written to {index_dir}")
+    return index_dir
+
+# ------------------ Lookups ------------------
+
+class _KeyView:
+    """Sequenz-Sicht auf die sortierten Schlüssel, damit `bisect` direkt auf der memory-map arbeitet."""
+
+    def __init__(self, blob, offsets):
+        self.blob = blob
+        self.offsets = offsets
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, i):
+        return self.blob[self.offsets[i]:self.offsets[i + 1]].tobytes()
+
+
+class TitleIndex:
+    """Memory-mapped Lookup-Struktur über title.basics (normalisierter Titel, titleType, startYear, tconst)."""
+
+    def __init__(self, index_dir):
+        with open(os.path.join(index_dir, "meta.json"), encoding="utf-8") as meta:
+            self.meta = json.load(meta)
+        if self.meta.get("version") != INDEX_VERSION:
+            raise ValueError(f"Unsupported IMDb title index version in {index_dir}: {self.meta.get('version')}")
+
+        def load(name):
+            return np.load(os.path.join(index_dir, name), mmap_mode="r")
+
+        def blob(name):
+            path = os.path.join(index_dir, name)
+            return np.memmap(path, dtype=np.uint8, mode="r") if os.path.getsize(path) else np.zeros(0, dtype=np.uint8)
+
+        self.keys = _KeyView(blob("keys.bin"), load("key_offsets.npy"))
+        self.titles = _KeyView(blob("titles.bin"), load("title_offsets.npy"))
+        self.tconst = load("tconst.npy")
+        self.start_year = load("start_year.npy")
+        self.title_type = load("title_type.npy")
+        self.title_types = self.meta["title_types"]
+
+    def __len__(self):
+        return len(self.keys)
+
+    def record(self, position):
+        year = int(self.start_year[position])
+        return TitleRecord(
+            tconst=f"tt{int(self.tconst[position]):07d}",
+            primary_title=self.titles[position].decode("utf-8"),
+            title_type=self.title_types[self.title_type[position]],
+            start_year=year or None,
+        )
+
+    def _range(self, key, prefix=False):
+        start = bisect_left(self.keys, key)
+        # 0xff kommt in UTF-8 nie vor und ist damit obere Schranke für alle Schlüssel mit diesem Präfix
+        end = bisect_left(self.keys, key + (b"\xff" if prefix else b"\x00"), lo=start)
+        return start, end
+
+    def _filter(self, positions, title_type, limit=None):
+        results = []
+        for position in positions:
+            record = self.record(position)
+            if title_type and record.title_type != title_type:
+                continue
+            results.append(record)
+            if limit and len(results) >= limit:
+                break
+        return results
+
+    def select(self, title_types=None, min_year=None, max_year=None):
+        """Positionen aller Einträge mit passendem titleType und startYear (vektorisiert über die memory-map)."""
+        mask = np.ones(len(self), dtype=bool)
+        if title_types:
+            codes = [code for code, name in enumerate(self.title_types) if name in title_types]
+            mask &= np.isin(self.title_type, codes)
+        if min_year is not None:
+            mask &= self.start_year >= min_year
+        if max_year is not None:
+            mask &= self.start_year <= max_year
+        return np.flatnonzero(mask)
+
+    def find(self, title, title_type=None):
+        """Case-insensitiver Lookup über den normalisierten Titel."""
+        key = u.normalize_title(title).encode("utf-8")
+        if not key:
+            return []
+        return self._filter(range(*self._range(key)), title_type)
+
+    def find_exact(self, title, title_type=None):
+        """Exakter Lookup: der primaryTitle muss zeichengenau übereinstimmen."""
+        return [record for record in self.find(title, title_type) if record.primary_title == title]
+
+    def find_prefix(self, prefix, title_type=None, limit=20):
+        """Alle Titel, deren normalisierter Titel mit `prefix` beginnt."""
+        key = u.normalize_title(prefix).encode("utf-8")
+        if not key:
+            return []
+        return self._filter(range(*self._range(key, prefix=True)), title_type, limit)
+
+
+_build_lock = threading.Lock()  # Gleichzeitige erste Aufrufe (Threads) bauen den Index nur einmal
+
+
+def _index_is_current(index_dir, file_path):
+    """Ob der Index existiert und aus genau dieser TSV (Größe, Änderungszeit) gebaut wurde."""
+    try:
+        with open(os.path.join(index_dir, "meta.json"), encoding="utf-8") as meta_file:
+            meta = json.load(meta_file)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return False
+    if not os.path.exists(file_path):  # Ohne TSV bleibt nur der vorhandene Index
+        return True
+    return meta.get("version") == INDEX_VERSION and all(meta.get(key) == value
+                                                        for key, value in source_stamp(file_path).items())
+
+
+def _rebuild(file_path, index_dir):
+    """Baut in ein Nachbarverzeichnis und tauscht dann aus; noch gemappte Dateien des alten Index bleiben gültig."""
+    building = f"{index_dir}.{os.getpid()}.tmp"
+    shutil.rmtree(building, ignore_errors=True)
+    build_title_index(file_path, building)
+    if os.path.exists(index_dir):
+        retired = f"{index_dir}.{os.getpid()}.old"
+        os.replace(index_dir, retired)
+        shutil.rmtree(retired, ignore_errors=True)  # Unlink, kein Überschreiben: bestehende mmaps lesen weiter
+    os.replace(building, index_dir)
+
+
+@lru_cache(maxsize=None)
+def _load_title_index(index_dir, meta_mtime_ns):
+    return TitleIndex(index_dir)
+
+
+def get_title_index(file_path=DEFAULT_TSV_PATH):
+    """Öffnet den Index zu `file_path` (einmal pro Prozess und Stand) und baut ihn, wenn er fehlt oder nicht mehr
+    zur TSV passt (z. B. nach dem Herunterladen eines neuen Dumps)."""
+    index_dir = index_dir_for(file_path)
+    with _build_lock:
+        if not _index_is_current(index_dir, file_path):
+            if os.path.exists(index_dir):
+                logger.info(f"IMDb title index {index_dir} is out of date with {file_path}, rebuilding")
+            _rebuild(file_path, index_dir)
+        return _load_title_index(index_dir, os.stat(os.path.join(index_dir, "meta.json")).st_mtime_ns)
+
+
+async def open_title_index(file_path=DEFAULT_TSV_PATH):
+    """`get_title_index` für async Code: Bau bzw. Laden läuft in einem Thread und blockiert die Event-Loop nicht."""
+    return await asyncio.to_thread(get_title_index, file_path)
+
+
+if __name__ == "__main__":
+    build_title_index(sys.argv[1] if len(sys.argv) > 1 else DEFAULT_TSV_PATH)
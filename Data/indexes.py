@@ -0,0 +1,262 @@
+import asyncio
+import datetime
+import json
+import os
+import sys
+
+from dotenv import load_dotenv
+from pymongo import ASCENDING, TEXT, IndexModel
+from pymongo.errors import OperationFailure
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from logger import logger
+
+MOVIES_COLLECTION = "children_movies"
+MIGRATIONS_COLLECTION = "migrations"
+
+# ------------------ Enrichment Status ------------------
+
+# Welche Anreicherung einem Film noch fehlt; indiziert, damit offene Arbeit kein Collection-Scan ist
+STATUS_PENDING_IMDB = "pending_imdb"
+STATUS_PENDING_OMDB = "pending_omdb"
+# Bewertung, Stimmen, Laufzeit und Jahr aus den IMDb-Datasets (imdb_datasets.py), die übrigen OMDb-Felder fehlen noch
+STATUS_PENDING_OMDB_EXTRAS = "pending_omdb_extras"
+STATUS_COMPLETE = "complete"
+# Schlüssel in `omdb_details`, die auch die IMDb-Datasets liefern
+IMDB_DATASET_KEYS = {"imdbRating", "imdbVotes", "Runtime", "Year"}
+# Filme, für die update_movie_details_in_db bzw. die Worker noch OMDb abfragen. `pending_omdb_extras` gehört nicht
+# dazu: die Bewertungen stehen schon da, sonst würde der Dataset-Join kein OMDb-Kontingent sparen
+PENDING_STATUSES = [STATUS_PENDING_IMDB, STATUS_PENDING_OMDB]
+
+
+def pending_statuses():
+    """Status für den OMDb-Durchlauf; mit `omdb_fetch_extras=on` auch die restlichen OMDb-Felder der Dataset-Filme."""
+    if os.getenv('omdb_fetch_extras', 'off').lower() in ('on', 'true', '1'):
+        return PENDING_STATUSES + [STATUS_PENDING_OMDB_EXTRAS]
+    return PENDING_STATUSES
+
+
+def enrichment_status(movie):
+    """Leitet den `enrichment_status` aus den vorhandenen Feldern eines Films ab."""
+    if not movie.get("imdb_id"):
+        return STATUS_PENDING_IMDB
+    if not movie.get("omdb_details"):
+        return STATUS_PENDING_OMDB
+    if set(movie["omdb_details"]) <= IMDB_DATASET_KEYS:  # Nur Werte aus den Datasets, OMDb wurde noch nicht gefragt
+        return STATUS_PENDING_OMDB_EXTRAS
+    return STATUS_COMPLETE
+
+# ------------------ Erscheinungsdatum ------------------
+
+RELEASE_DATE_FORMATS = ("%Y-%m-%d", "%d %b %Y")  # TMDb `release_date`, OMDb `Released`
+
+
+def parse_release_date(value):
+    """Datum als timezone-aware UTC-datetime (für BSON), oder None wenn nicht lesbar."""
+    if isinstance(value, datetime.datetime):
+        return value if value.tzinfo else value.replace(tzinfo=datetime.timezone.utc)
+    if isinstance(value, datetime.date):
+        return datetime.datetime(value.year, value.month, value.day, tzinfo=datetime.timezone.utc)
+    for date_format in RELEASE_DATE_FORMATS:
+        try:
+            return datetime.datetime.strptime(str(value), date_format).replace(tzinfo=datetime.timezone.utc)
+        except ValueError:
+            continue
+    return None
+
+
+def released_at(movie):
+    """`released_at` als BSON-Datum aus dem TMDb-`release_date`, damit Datumsbereiche über den Index laufen."""
+    return parse_release_date(movie.get("release_date")) if movie.get("release_date") else None
+
+# ------------------ Indexes ------------------
+
+MOVIE_INDEXES = [
+    IndexModel([("id", ASCENDING)], unique=True, name="uniq_tmdb_id"),
+    # Eindeutig nur für gesetzte IMDb-IDs, Filme ohne ID dürfen mehrfach vorkommen
+    IndexModel([("imdb_id", ASCENDING)], unique=True, name="uniq_imdb_id",
+               partialFilterExpression={"imdb_id": {"$type": "string", "$gt": ""}}),
+    # Deckt get_info_by_id komplett aus dem Index ab (covered query)
+    IndexModel([("imdb_id", ASCENDING), ("title", ASCENDING), ("wikidata_id", ASCENDING)], name="imdb_id_title_wikidata"),
+    IndexModel([("enrichment_status", ASCENDING), ("id", ASCENDING)], name="enrichment_status_id"),
+    # Gruppenschlüssel der inkrementellen Analytics-Pipelines (analytics.py)
+    IndexModel([("release_date", ASCENDING)], name="release_date"),
+    IndexModel([("released_at", ASCENDING)], name="released_at"),
+    IndexModel([("genres.name", ASCENDING)], name="genres_name"),
+    IndexModel([("production_companies.name", ASCENDING)], name="production_companies_name"),
+    IndexModel([("production_countries.iso_3166_1", ASCENDING)], name="production_countries_iso"),
+    # Wasserzeichen des inkrementellen Parquet-Exports (parquet_export.py)
+    IndexModel([("updated_at", ASCENDING), ("_id", ASCENDING)], name="updated_at_id"),
+    # Volltextsuche (search_index.text_search); Gewichte wie im lokalen Suchindex
+    IndexModel([("title", TEXT), ("original_title", TEXT), ("overview", TEXT), ("wikipedia_Description", TEXT)],
+               name="text_title_description", default_language="english", language_override="text_language",
+               weights={"title": 10, "original_title": 8, "overview": 2, "wikipedia_Description": 1}),
+]
+
+# Abfragen des Projekts, für die `explain` den Plan ausgibt
+PROJECT_QUERIES = {
+    "update_movie_details_in_db": ({"enrichment_status": {"$in": PENDING_STATUSES}}, None),
+    "get_missed_imdb_ids": ({"enrichment_status": STATUS_PENDING_IMDB}, {"title": 1, "original_title": 1, "release_date": 1}),
+    "get_info_by_id": ({"imdb_id": "tt0114709"}, {"title": 1, "wikidata_id": 1, "_id": 0}),
+    "movie_by_tmdb_id": ({"id": 862}, None),
+    "released_between": ({"released_at": {"$gt": datetime.datetime(2010, 1, 1), "$lt": datetime.datetime(2015, 1, 1)}},
+                         {"_id": 0, "id": 1, "title": 1, "released_at": 1}),
+    "text_search": ({"$text": {"$search": "toy story"}}, {"_id": 0, "id": 1, "title": 1}),
+}
+
+
+async def backfill_enrichment_status(collection):
+    """Setzt `enrichment_status` für Dokumente, die vor Einführung des Feldes gespeichert wurden."""
+    missing = {"enrichment_status": {"$exists": False}}
+    no_imdb = {"$or": [{"imdb_id": None}, {"imdb_id": ""}]}
+    no_omdb = {"$or": [{"omdb_details": None}, {"omdb_details": {}}]}
+    touched = {"$currentDate": {"updated_at": True}}  # Migrationen ändern exportierte Felder (parquet_export.py)
+    results = [
+        await collection.update_many({**missing, **no_imdb}, {"$set": {"enrichment_status": STATUS_PENDING_IMDB}, **touched}),
+        await collection.update_many({**missing, **no_omdb}, {"$set": {"enrichment_status": STATUS_PENDING_OMDB}, **touched}),
+        await collection.update_many(missing, {"$set": {"enrichment_status": STATUS_COMPLETE}, **touched}),
+    ]
+    logger.info(f"Backfilled enrichment_status on {sum(result.modified_count for result in results)} movies")
+
+
+async def backfill_released_at(collection):
+    """Setzt `released_at` serverseitig aus dem `release_date`-String für bereits gespeicherte Filme."""
+    result = await collection.update_many(
+        {"released_at": {"$exists": False}},
+        [{"$set": {"released_at": {"$dateFromString": {"dateString": "$release_date", "format": "%Y-%m-%d",
+                                                       "onError": None, "onNull": None}},
+                   "updated_at": "$$NOW"}}],
+    )
+    logger.info(f"Backfilled released_at on {result.modified_count} movies")
+
+
+async def hoist_wikipedia_fields(collection):
+    """Verschiebt `wikipedia_Description`/`wiki_page` aus `omdb_details` auf die oberste Ebene (wie im Movie-Modell)."""
+    result = await collection.update_many(
+        {"omdb_details.wikipedia_Description": {"$exists": True}},
+        [{"$set": {"wikipedia_Description": "$omdb_details.wikipedia_Description", "wiki_page": "$omdb_details.wiki_page",
+                   "updated_at": "$$NOW"}},
+         {"$unset": ["omdb_details.wikipedia_Description", "omdb_details.wiki_page"]}],
+    )
+    logger.info(f"Moved Wikipedia fields to the top level on {result.modified_count} movies")
+
+
+# Welcher von mehreren doppelten Einträgen bleibt: der am weitesten angereicherte
+STATUS_RANK = {STATUS_COMPLETE: 0, STATUS_PENDING_OMDB_EXTRAS: 1, STATUS_PENDING_OMDB: 2, STATUS_PENDING_IMDB: 3}
+
+
+async def _duplicate_groups(collection, field, match):
+    """Gruppen von Dokumenten mit gleichem `field` (mehr als eines), je mit `_id` und Status der Dokumente."""
+    pipeline = [
+        {"$match": match},
+        {"$group": {"_id": f"${field}", "count": {"$sum": 1},
+                    "docs": {"$push": {"_id": "$_id", "status": "$enrichment_status"}}}},
+        {"$match": {"count": {"$gt": 1}}},
+    ]
+    return await collection.aggregate(pipeline, allowDiskUse=True).to_list(length=None)
+
+
+def _ranked(docs):
+    """Bester Eintrag zuerst: höchster Anreicherungsstand, bei Gleichstand der neueste (`_id`)."""
+    newest_first = sorted(docs, key=lambda doc: doc["_id"], reverse=True)
+    return sorted(newest_first, key=lambda doc: STATUS_RANK.get(doc.get("status"), len(STATUS_RANK)))
+
+
+async def deduplicate_movies(collection):
+    """Bereinigt Duplikate aus der Zeit vor den eindeutigen Indizes (`distinct()` + `insert_many` war nicht atomar).
+
+    Gleiche TMDb-`id`: nur der beste Eintrag bleibt. Gleiche `imdb_id` bei verschiedenen Filmen: nur der beste behält
+    sie, die übrigen gehen zurück auf `pending_imdb` und werden neu abgeglichen.
+    """
+    groups = await _duplicate_groups(collection, "id", {"id": {"$exists": True}})
+    removed = [doc["_id"] for group in groups for doc in _ranked(group["docs"])[1:]]
+    if removed:
+        await collection.delete_many({"_id": {"$in": removed}})
+        logger.warning(f"Removed {len(removed)} duplicate documents of TMDb ids {[group['_id'] for group in groups][:20]}")
+
+    groups = await _duplicate_groups(collection, "imdb_id", {"imdb_id": {"$type": "string", "$gt": ""}})
+    reset = [doc["_id"] for group in groups for doc in _ranked(group["docs"])[1:]]
+    if reset:
+        await collection.update_many(
+            {"_id": {"$in": reset}},
+            {"$unset": {"imdb_id": ""}, "$set": {"enrichment_status": STATUS_PENDING_IMDB},
+             "$currentDate": {"updated_at": True}},
+        )
+        logger.warning(f"Reset {len(reset)} movies sharing IMDb ids {[group['_id'] for group in groups][:20]} "
+                       f"to {STATUS_PENDING_IMDB}")
+
+
+async def run_migration_once(db, name, migration):
+    """Führt eine Migration genau einmal pro Datenbank aus (Marker in der `migrations`-Collection)."""
+    migrations = db[MIGRATIONS_COLLECTION]
+    if await migrations.find_one({"_id": name}):
+        return False
+    await migration()
+    await migrations.insert_one({"_id": name, "applied_at": datetime.datetime.now(datetime.timezone.utc)})
+    logger.info(f"Migration '{name}' applied")
+    return True
+
+
+async def ensure_indexes(db):
+    """Legt alle Indizes an (idempotent) und zieht fehlende Felder einmalig nach. Wird von MongoDBContext aufgerufen."""
+    collection = db[MOVIES_COLLECTION]
+    await run_migration_once(db, "enrichment_status_v1", lambda: backfill_enrichment_status(collection))
+    await run_migration_once(db, "released_at_v1", lambda: backfill_released_at(collection))
+    await run_migration_once(db, "wikipedia_fields_v1", lambda: hoist_wikipedia_fields(collection))
+    await run_migration_once(db, "deduplicate_movies_v1", lambda: deduplicate_movies(collection))
+    try:
+        names = await collection.create_indexes(MOVIE_INDEXES)
+    except OperationFailure as e:
+        # z. B. neue Duplikate seit der Migration: die übrigen Indizes trotzdem anlegen, statt beim Verbinden abzubrechen
+        logger.error(f"Creating indexes on {MOVIES_COLLECTION} failed ({e}), retrying one by one")
+        names = []
+        for index in MOVIE_INDEXES:
+            try:
+                names.extend(await collection.create_indexes([index]))
+            except OperationFailure as index_error:
+                logger.error(f"Index {index.document['name']} not created: {index_error.details or index_error}")
+    logger.info(f"Indexes ensured on {MOVIES_COLLECTION}: {', '.join(names)}")
+
+# ------------------ Explain CLI ------------------
+
+def summarize_plan(plan):
+    """Kurzform eines Query-Plans: Stages von außen nach innen, mit Indexnamen."""
+    stages = []
+    while plan:
+        stage = plan.get("stage", "?")
+        if plan.get("indexName"):
+            stage += f"({plan['indexName']})"
+        stages.append(stage)
+        plan = plan.get("inputStage") or (plan.get("inputStages") or [None])[0]
+    return " <- ".join(stages)
+
+
+async def explain_queries(db):
+    collection = db[MOVIES_COLLECTION]
+    for name, (query, projection) in PROJECT_QUERIES.items():
+        explanation = await collection.find(query, projection).explain()
+        planner = explanation.get("queryPlanner", {})
+        stats = explanation.get("executionStats", {})
+        print(f"{name}: {json.dumps(query, default=str)}")
+        print(f"    plan: {summarize_plan(planner.get('winningPlan', {}).get('queryPlan', planner.get('winningPlan', {})))}")
+        if stats:
+            print(f"    docs examined: {stats.get('totalDocsExamined')}, keys examined: {stats.get('totalKeysExamined')}, "
+                  f"returned: {stats.get('nReturned')}, {stats.get('executionTimeMillis')} ms")
+
+
+async def main(command):
+    import MongoDBContext as MongoDBC  # Hier importiert, da MongoDBContext selbst dieses Modul nutzt
+
+    load_dotenv()
+    async with MongoDBC.MongoDBContext(os.getenv('mongo_uri')) as (client, db):
+        if command == "explain":
+            await explain_queries(db)
+        # "ensure" ist bereits beim Verbinden passiert
+
+
+if __name__ == "__main__":
+    command = sys.argv[1] if len(sys.argv) > 1 else "explain"
+    if command not in ("explain", "ensure"):
+        print("Usage: python Data/indexes.py [explain|ensure]")
+        sys.exit(1)
+    asyncio.run(main(command))
@@ -0,0 +1,133 @@
+import datetime
+import os
+import socket
+import sys
+
+from pymongo import ASCENDING, ReturnDocument
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from logger import logger
+
+JOBS_COLLECTION = "enrichment_jobs"
+
+STATUS_PENDING = "pending"
+STATUS_LEASED = "leased"
+STATUS_DONE = "done"
+STATUS_FAILED = "failed"
+
+
+def _now():
+    return datetime.datetime.now(datetime.timezone.utc)
+
+
+def worker_name(worker_id):
+    """Eindeutiger Name eines Workers über Hosts hinweg, z. B. für `leased_by`."""
+    return f"{socket.gethostname()}:{os.getpid()}:{worker_id}"
+
+
+class JobQueue:
+    """Job-Queue in MongoDB: jeder Job ist ein Paket TMDb-IDs, das ein Worker für `lease_seconds` exklusiv bearbeitet.
+
+    Läuft eine Lease ab (Worker abgestürzt oder hängt), wird der Job erneut vergeben; nach `max_attempts`
+    Versuchen bleibt er als `failed` liegen, auch wenn die letzte Lease abläuft. Mehrere Prozesse und Hosts können sich dieselbe Queue teilen.
+    """
+
+    def __init__(self, db, queue="enrichment", lease_seconds=300, max_attempts=3, retry_delay=30):
+        self.collection = db[JOBS_COLLECTION]
+        self.queue = queue
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self.retry_delay = retry_delay
+
+    async def ensure_indexes(self):
+        await self.collection.create_index(
+            [("queue", ASCENDING), ("status", ASCENDING), ("available_at", ASCENDING)], name="queue_status_available")
+
+    async def expire_leases(self):
+        """Setzt Jobs, deren Lease im letzten Versuch abgelaufen ist (Worker abgestürzt), auf `failed`.
+
+        Ohne diesen Schritt blieben sie für immer `leased`, und ihre Filme ließen sich nie wieder einplanen.
+        """
+        result = await self.collection.update_many(
+            {"queue": self.queue, "status": STATUS_LEASED, "available_at": {"$lte": _now()},
+             "attempts": {"$gte": self.max_attempts}},
+            {"$set": {"status": STATUS_FAILED, "error": "lease expired on the last attempt"}},
+        )
+        if result.modified_count:
+            logger.warning(f"Queue '{self.queue}': {result.modified_count} jobs failed after their last lease expired")
+        return result.modified_count
+
+    async def open_movie_ids(self):
+        """TMDb-IDs, die bereits in einem offenen (nicht erledigten) Job stecken."""
+        await self.expire_leases()
+        cursor = self.collection.find({"queue": self.queue, "status": {"$in": [STATUS_PENDING, STATUS_LEASED]}},
+                                      {"movie_ids": 1})
+        return {movie_id async for job in cursor for movie_id in job["movie_ids"]}
+
+    async def enqueue(self, movie_ids, chunk_size=50):
+        """Teilt die IDs in Jobs zu je `chunk_size` Filmen auf; bereits eingeplante IDs werden übersprungen."""
+        queued = await self.open_movie_ids()
+        movie_ids = [movie_id for movie_id in dict.fromkeys(movie_ids) if movie_id not in queued]
+        now = _now()
+        jobs = [{"queue": self.queue, "movie_ids": movie_ids[i:i + chunk_size], "status": STATUS_PENDING,
+                 "attempts": 0, "available_at": now, "created_at": now}
+                for i in range(0, len(movie_ids), chunk_size)]
+        if jobs:
+            await self.collection.insert_many(jobs)
+        logger.info(f"Queue '{self.queue}': {len(jobs)} jobs with {len(movie_ids)} movies enqueued "
+                    f"({len(queued)} movies already queued)")
+        return len(jobs)
+
+    async def lease(self, worker):
+        """Nächster verfügbarer Job (offen oder mit abgelaufener Lease), atomar für `worker` reserviert; sonst None."""
+        await self.expire_leases()
+        now = _now()
+        return await self.collection.find_one_and_update(
+            {"queue": self.queue, "status": {"$in": [STATUS_PENDING, STATUS_LEASED]},
+             "available_at": {"$lte": now}, "attempts": {"$lt": self.max_attempts}},
+            {"$set": {"status": STATUS_LEASED, "leased_by": worker,
+                      "available_at": now + datetime.timedelta(seconds=self.lease_seconds)},
+             "$inc": {"attempts": 1}},
+            sort=[("available_at", ASCENDING)],
+            return_document=ReturnDocument.AFTER,
+        )
+
+    async def extend(self, job):
+        """Verlängert die Lease eines laufenden Jobs (Heartbeat); False, wenn ihn inzwischen ein anderer hat."""
+        result = await self.collection.update_one(
+            {"_id": job["_id"], "status": STATUS_LEASED, "leased_by": job["leased_by"]},
+            {"$set": {"available_at": _now() + datetime.timedelta(seconds=self.lease_seconds)}},
+        )
+        return result.modified_count == 1
+
+    async def complete(self, job, **result):
+        await self.collection.update_one(
+            {"_id": job["_id"], "leased_by": job["leased_by"]},
+            {"$set": {"status": STATUS_DONE, "finished_at": _now(), **result}},
+        )
+
+    async def fail(self, job, error, movie_ids=None):
+        """Gibt den Job nach `retry_delay` Sekunden erneut frei, nach dem letzten Versuch endgültig als `failed`.
+
+        Mit `movie_ids` enthält der nächste Versuch nur noch diese (die fehlgeschlagenen) Filme.
+        """
+        final = job["attempts"] >= self.max_attempts
+        update = {"status": STATUS_FAILED if final else STATUS_PENDING, "error": str(error),
+                  "available_at": _now() + datetime.timedelta(seconds=self.retry_delay)}
+        if movie_ids is not None:
+            update["movie_ids"] = list(movie_ids)
+        await self.collection.update_one({"_id": job["_id"], "leased_by": job["leased_by"]}, {"$set": update})
+        logger.warning(f"Job {job['_id']} failed (attempt {job['attempts']}/{self.max_attempts}): {error}")
+
+    async def has_open_jobs(self):
+        """Noch offene oder geleaste Jobs, die erneut vergeben werden könnten."""
+        return await self.collection.count_documents(
+            {"queue": self.queue, "status": {"$in": [STATUS_PENDING, STATUS_LEASED]},
+             "attempts": {"$lt": self.max_attempts}}, limit=1) > 0
+
+    async def stats(self):
+        counts = await self.collection.aggregate([
+            {"$match": {"queue": self.queue}},
+            {"$group": {"_id": "$status", "jobs": {"$sum": 1}}},
+        ]).to_list(length=None)
+        return {entry["_id"]: entry["jobs"] for entry in counts}
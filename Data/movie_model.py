@@ -0,0 +1,180 @@
+import re
+from dataclasses import dataclass, fields
+
+# ------------------ Zahlen aus OMDb-Strings ------------------
+
+_NUMBER = re.compile(r"-?\d+(?:\.\d+)?")
+
+
+def parse_number(value):
+    """Zahl aus OMDb-Strings wie "$12,345,678", "1,234", "95 min" oder "7.8"; "N/A" und Leeres ergeben None."""
+    if isinstance(value, (int, float)):
+        return value
+    match = _NUMBER.search(str(value or "").replace(",", ""))
+    if not match:
+        return None
+    number = float(match.group())
+    return int(number) if number.is_integer() and "." not in match.group() else number
+
+
+def parse_rating(value):
+    """Bewertung auf einer Skala von 0 bis 100: "92%", "75/100" oder "7.8/10"."""
+    text = str(value or "")
+    if "/" in text:
+        score, scale = (parse_number(part) for part in text.split("/", 1))
+        return round(100 * score / scale, 1) if score is not None and scale else None
+    return parse_number(text)
+
+# ------------------ Teil-Datensätze ------------------
+
+@dataclass(slots=True)
+class TmdbRecord:
+    """Felder aus TMDb Discover und Details (Schlüssel wie in der TMDb-API)."""
+    id: int = None
+    title: str = None
+    original_title: str = None
+    original_language: str = None
+    overview: str = None
+    release_date: str = None
+    popularity: float = None
+    vote_average: float = None
+    vote_count: int = None
+    poster_path: str = None
+    backdrop_path: str = None
+    # Aus den Details (get_more_informations)
+    genres: list = None
+    budget: int = None
+    revenue: int = None
+    imdb_id: str = None
+    wikidata_id: str = None
+    homepage: str = None
+    tagline: str = None
+    status: str = None
+    origin_country: list = None
+    production_companies: list = None
+    production_countries: list = None
+    spoken_languages: list = None
+
+    @classmethod
+    def from_api(cls, data):
+        """Übernimmt nur die bekannten Felder; `genre_ids`, `video`, `adult` usw. werden verworfen."""
+        return cls(**{name: data[name] for name in _TMDB_FIELDS if name in data})
+
+    def update_details(self, details):
+        for name in _TMDB_DETAIL_FIELDS:
+            setattr(self, name, details.get(name))
+
+
+_TMDB_FIELDS = [f.name for f in fields(TmdbRecord)]
+_TMDB_DETAIL_FIELDS = ["genres", "budget", "imdb_id", "homepage", "tagline", "status", "origin_country", "revenue",
+                       "production_companies", "production_countries", "spoken_languages"]
+
+
+@dataclass(slots=True)
+class OmdbRecord:
+    """OMDb-Antwort mit numerisch geparsten Bewertungen, Stimmen, Laufzeit und Einspielergebnis."""
+    rated: str = None
+    year: str = None
+    runtime: int = None  # Minuten
+    director: str = None
+    writer: str = None
+    actors: str = None
+    awards: str = None
+    poster: str = None
+    type: str = None
+    metascore: int = None
+    imdb_rating: float = None
+    imdb_votes: int = None
+    box_office: int = None  # US-Dollar
+    ratings: list = None  # [{"Source", "Value", "Score" (0-100)}]
+    fallback_title: str = None
+    extra: dict = None  # Weitere OMDb-Felder unverändert
+
+    @classmethod
+    def from_api(cls, data):
+        known = {name: data.get(key) for name, key in _OMDB_TEXT_FIELDS.items()}
+        record = cls(
+            **{name: None if value == "N/A" else value for name, value in known.items()},
+            runtime=parse_number(data.get("Runtime")),
+            metascore=parse_number(data.get("Metascore")),
+            imdb_rating=parse_number(data.get("imdbRating")),
+            imdb_votes=parse_number(data.get("imdbVotes")),
+            box_office=parse_number(data.get("BoxOffice")),
+            ratings=[{**rating, "Score": parse_rating(rating.get("Value"))} for rating in data.get("Ratings", [])],
+        )
+        record.extra = {key: value for key, value in data.items()
+                        if key not in _OMDB_CONSUMED and key not in OMDB_DROPPED_KEYS} or None
+        return record
+
+    def to_document(self):
+        """OMDb-Schlüssel wie bisher, die Zahlenfelder aber als Zahlen."""
+        document = dict(self.extra or {})
+        for name, key in _OMDB_KEYS.items():
+            value = getattr(self, name)
+            if value is not None:
+                document[key] = value
+        return document
+
+
+# Feldname im Modell -> Schlüssel im Mongo-Dokument (= OMDb-Schlüssel)
+_OMDB_KEYS = {"rated": "Rated", "year": "Year", "runtime": "Runtime", "director": "Director", "writer": "Writer",
+              "actors": "Actors", "awards": "Awards", "poster": "Poster", "type": "Type", "metascore": "Metascore",
+              "imdb_rating": "imdbRating", "imdb_votes": "imdbVotes", "box_office": "BoxOffice", "ratings": "Ratings",
+              "fallback_title": "fallback_title"}
+_OMDB_TEXT_FIELDS = {name: key for name, key in _OMDB_KEYS.items()
+                     if name in ("rated", "year", "director", "writer", "actors", "awards", "poster", "type")}
+_OMDB_CONSUMED = set(_OMDB_KEYS.values())
+# Felder, die TMDb/Wikipedia schon liefern und deshalb nicht gespeichert werden
+OMDB_DROPPED_KEYS = {"Title", "Released", "Genre", "Plot", "Language", "Country",
+                     "imdbID", "DVD", "Production", "Website", "Response"}
+
+
+# ------------------ Benötigte Felder der API-Antworten ------------------
+# Feldauswahl für API_call/json_codec.Schema: alles andere wird beim Dekodieren verworfen
+
+TMDB_MOVIE_FIELDS = {name: None for name in _TMDB_FIELDS}
+TMDB_DISCOVER_FIELDS = {"page": None, "total_pages": None, "total_results": None, "results": [TMDB_MOVIE_FIELDS]}
+# get_more_informations prüft zusätzlich `status`/`media_type`, update_movie_data liest die `external_ids`
+TMDB_DETAILS_FIELDS = {**TMDB_MOVIE_FIELDS, "media_type": None, "external_ids": {"imdb_id": None, "wikidata_id": None}}
+# Alles außer OMDB_DROPPED_KEYS, dazu `Response`/`Error` für Cache und Key-Pool
+OMDB_FIELDS = {key: None for key in _OMDB_CONSUMED if key != "fallback_title"} | {"Response": None, "Error": None}
+
+
+@dataclass(slots=True)
+class WikipediaRecord:
+    description: str = None
+    page: str = None
+
+
+@dataclass(slots=True)
+class Movie:
+    """Ein Film mit seinen Teil-Datensätzen aus TMDb, OMDb und Wikipedia; wird einmal in ein Mongo-Dokument übersetzt."""
+    tmdb: TmdbRecord
+    omdb: OmdbRecord = None
+    wikipedia: WikipediaRecord = None
+    error: str = None
+
+    @property
+    def id(self):
+        return self.tmdb.id
+
+    @property
+    def title(self):
+        return self.tmdb.title
+
+    @classmethod
+    def from_tmdb(cls, data):
+        """Film aus einem TMDb-Ergebnis oder einem gespeicherten Mongo-Dokument (nur die TMDb-Felder)."""
+        return cls(TmdbRecord.from_api(data))
+
+    def to_document(self):
+        """Mongo-Dokument für `$set`: nur gesetzte Felder, damit Teil-Updates nichts überschreiben."""
+        document = {name: value for name in _TMDB_FIELDS if (value := getattr(self.tmdb, name)) is not None}
+        if self.omdb is not None:
+            document["omdb_details"] = self.omdb.to_document()
+        if self.wikipedia is not None:
+            if self.wikipedia.description is not None:
+                document["wikipedia_Description"] = self.wikipedia.description
+            if self.wikipedia.page is not None:
+                document["wiki_page"] = self.wikipedia.page
+        return document
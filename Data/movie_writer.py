@@ -0,0 +1,161 @@
+import asyncio
+import os
+import sys
+
+from pymongo import DeleteMany, UpdateOne
+from pymongo.errors import BulkWriteError
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from logger import logger
+import metrics
+import Data.indexes as indexes
+from Data.movie_model import Movie
+
+
+class MovieWriteError(Exception):
+    """Ein Flush konnte nicht alle Filme schreiben; `movie_ids` sind die TMDb-IDs, die nicht in MongoDB stehen."""
+
+    def __init__(self, message, movie_ids):
+        super().__init__(message)
+        self.movie_ids = movie_ids
+
+
+class MovieWriter:
+    """Puffert angereicherte Filme seitenübergreifend und schreibt sie per `bulk_write`-Upsert.
+
+    Die Deduplizierung beruht auf den eindeutigen Indizes aus `indexes.py`. Geschrieben wird, sobald
+    `batch_size` Filme gepuffert sind oder spätestens nach `flush_interval` Sekunden.
+
+    Schlägt das Schreiben für einen Teil der Filme fehl, laufen die Callbacks nur für Aufrufe von `add`, deren Filme
+    vollständig geschrieben wurden; die übrigen erhalten `on_failed`. Ein expliziter `flush()` wirft dann
+    `MovieWriteError`, die automatischen Flushes (Timer, volle Puffer) protokollieren nur.
+    """
+
+    def __init__(self, collection, batch_size=500, flush_interval=5.0, after_write=None):
+        self.collection = collection
+        self.after_write = after_write  # async callable(movie_ids), z. B. Refresh der Analytics-Collections
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.buffer = []
+        self.deletes = []
+        self.callbacks = []
+        self.lock = asyncio.Lock()
+        self.timer = None
+        self.written = 0
+        self.failed = 0
+
+    async def __aenter__(self):
+        self.timer = asyncio.create_task(self._flush_periodically())
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        if self.timer:
+            self.timer.cancel()
+        await self._flush_logged()
+        logger.info(f"MovieWriter finished, {self.written} movies written, {self.failed} not saved.")
+
+    async def _flush_periodically(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            await self._flush_logged()
+
+    async def _flush_logged(self):
+        """Flush ohne Exception: Fehler sind bereits protokolliert und über `on_failed` gemeldet."""
+        try:
+            await self.flush()
+        except MovieWriteError:
+            pass
+
+    async def add(self, movies, on_flushed=None, on_failed=None):
+        """Puffert Filme (`Movie` oder Dokument-Dicts).
+
+        `on_flushed()` wird erst aufgerufen, wenn alle diese Filme in MongoDB stehen, sonst `on_failed(error)`.
+        """
+        documents = [movie.to_document() if isinstance(movie, Movie) else movie for movie in movies]
+        valid = [movie for movie in documents if isinstance(movie, dict) and movie.get("id")]
+        self.buffer.extend(valid)
+        if on_flushed or on_failed:
+            self.callbacks.append(({movie["id"] for movie in valid}, on_flushed, on_failed))
+        if len(self.buffer) >= self.batch_size:
+            await self._flush_logged()
+        return len(valid)
+
+    async def remove(self, movie_ids):
+        """Puffert das Löschen von Filmen (TMDb-IDs), geschrieben zusammen mit dem nächsten Batch."""
+        self.deletes.extend(movie_ids)
+        if len(self.buffer) + len(self.deletes) >= self.batch_size:
+            await self._flush_logged()
+
+    @staticmethod
+    def _fields(movie):
+        fields = {k: v for k, v in movie.items() if k not in ("_id", "updated_at")}
+        fields["enrichment_status"] = indexes.enrichment_status(movie)
+        if "release_date" in movie:  # Teil-Updates ohne Datum lassen `released_at` unverändert
+            fields["released_at"] = indexes.released_at(movie)
+        return fields
+
+    async def flush(self):
+        async with self.lock:
+            if not self.buffer and not self.deletes and not self.callbacks:
+                return
+            movies, self.buffer = self.buffer, []
+            deletes, self.deletes = self.deletes, []
+            callbacks, self.callbacks = self.callbacks, []
+
+            # Letzter Stand gewinnt, falls ein Film mehrfach im Puffer liegt
+            latest = {movie["id"]: movie for movie in movies}
+            # `updated_at` setzt der Server (einheitliche Uhr für alle Worker), Wasserzeichen des Parquet-Exports
+            operations = [UpdateOne({"id": movie_id}, {"$set": self._fields(movie), "$currentDate": {"updated_at": True}},
+                                    upsert=True)
+                          for movie_id, movie in latest.items()]
+            if deletes:
+                operations.append(DeleteMany({"id": {"$in": deletes}}))
+            failed, error = set(), None
+            try:
+                if operations:
+                    with metrics.timer("db_write_seconds", collection=self.collection.name):
+                        result = await self.collection.bulk_write(operations, ordered=False)
+                    metrics.registry.inc("db_documents_written_total", result.upserted_count + result.modified_count,
+                                         collection=self.collection.name)
+                    self.written += result.upserted_count + result.modified_count
+                    logger.info(f"Bulk write: {result.upserted_count} inserted, {result.modified_count} updated, "
+                                f"{result.deleted_count} deleted")
+            except BulkWriteError as e:
+                errors = e.details.get("writeErrors", [])
+                self.written += e.details.get("nUpserted", 0) + e.details.get("nModified", 0)
+                # `index` ist die Position in `operations`: erst die Upserts in der Reihenfolge von `latest`, zuletzt
+                # das DeleteMany
+                upserted_ids = list(latest)
+                for write_error in errors:
+                    index = write_error.get("index", -1)
+                    failed.update([upserted_ids[index]] if 0 <= index < len(upserted_ids) else deletes)
+                error = e
+                logger.error(f"Bulk write finished with {len(errors)} errors, first: {errors[0].get('errmsg') if errors else None}")
+            except Exception as e:
+                failed, error = set(latest) | set(deletes), e
+                logger.error(f"Bulk write failed, {len(operations)} movies not saved: {repr(e)}")
+
+            written = [movie_id for movie_id in list(latest) + deletes if movie_id not in failed]
+            if self.after_write and written:
+                try:
+                    with metrics.timer("db_after_write_seconds", collection=self.collection.name):
+                        await self.after_write(written)
+                except Exception as e:
+                    logger.error(f"Error in after_write hook: {repr(e)}")
+
+            # Callbacks nur für vollständig geschriebene Aufrufe, sonst würde z. B. der Checkpoint eine Seite als
+            # erledigt markieren, deren Filme fehlen
+            for movie_ids, on_flushed, on_failed in callbacks:
+                try:
+                    if movie_ids & failed:
+                        if on_failed:
+                            await on_failed(error)
+                    elif on_flushed:
+                        await on_flushed()
+                except Exception as e:
+                    logger.error(f"Error in flush callback: {repr(e)}")
+
+            if failed:
+                self.failed += len(failed)
+                metrics.registry.inc("db_documents_failed_total", len(failed), collection=self.collection.name)
+                raise MovieWriteError(f"{len(failed)} movies not saved: {repr(error)}", failed)
@@ -0,0 +1,398 @@
+import asyncio
+import datetime
+import json
+import os
+import shutil
+import sys
+import time
+from collections import defaultdict
+
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+from bson import ObjectId
+from dotenv import load_dotenv
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from logger import logger
+import metrics
+import Data.indexes as indexes
+from Data.movie_model import parse_number, parse_rating
+
+DEFAULT_EXPORT_PATH = os.path.join(os.path.dirname(__file__), "export", "children_movies")
+STATE_FILE = "_export_state.json"  # Beginnt mit "_", wird von pyarrow.dataset beim Lesen ignoriert
+EXPORT_VERSION = 1
+NULL_PARTITION = "__HIVE_DEFAULT_PARTITION__"  # Filme ohne Erscheinungsjahr
+PART_FILE = "part-0.parquet"
+# Überlappung des updated_at-Wasserzeichens, damit gleichzeitig laufende Schreibvorgänge nicht verloren gehen
+WATERMARK_LAG = datetime.timedelta(seconds=60)
+
+# ------------------ Flaches, typisiertes Schema ------------------
+
+# OMDb-Feld im Mongo-Dokument -> (Spalte, Typ); Zahlen werden wie im Movie-Modell geparst
+OMDB_COLUMNS = {
+    "Rated": ("omdb_rated", pa.string()),
+    "Year": ("omdb_year", pa.string()),
+    "Runtime": ("omdb_runtime", pa.int32()),
+    "Director": ("omdb_director", pa.string()),
+    "Writer": ("omdb_writer", pa.string()),
+    "Actors": ("omdb_actors", pa.string()),
+    "Awards": ("omdb_awards", pa.string()),
+    "Type": ("omdb_type", pa.string()),
+    "Metascore": ("omdb_metascore", pa.float32()),
+    "imdbRating": ("omdb_imdb_rating", pa.float32()),
+    "imdbVotes": ("omdb_imdb_votes", pa.int64()),
+    "BoxOffice": ("omdb_box_office", pa.int64()),
+}
+# Quelle in `Ratings` -> Spalte mit dem Score (0-100)
+RATING_COLUMNS = {
+    "Internet Movie Database": "rating_imdb",
+    "Rotten Tomatoes": "rating_rotten_tomatoes",
+    "Metacritic": "rating_metacritic",
+}
+# Listen von Objekten -> Liste des genannten Schlüssels
+LIST_COLUMNS = {
+    "genres": "name",
+    "production_companies": "name",
+    "production_countries": "iso_3166_1",
+    "spoken_languages": "iso_639_1",
+}
+
+SCHEMA = pa.schema([
+    ("mongo_id", pa.string()),
+    ("id", pa.int64()),
+    ("imdb_id", pa.string()),
+    ("wikidata_id", pa.string()),
+    ("title", pa.string()),
+    ("original_title", pa.string()),
+    ("original_language", pa.string()),
+    ("overview", pa.string()),
+    ("release_date", pa.string()),
+    ("released_at", pa.timestamp("ms", tz="UTC")),
+    ("popularity", pa.float64()),
+    ("vote_average", pa.float32()),
+    ("vote_count", pa.int32()),
+    ("budget", pa.int64()),
+    ("revenue", pa.int64()),
+    ("status", pa.string()),
+    ("tagline", pa.string()),
+    ("homepage", pa.string()),
+    ("poster_path", pa.string()),
+    ("backdrop_path", pa.string()),
+    ("origin_country", pa.list_(pa.string())),
+    *[(column, pa.list_(pa.string())) for column in LIST_COLUMNS],
+    *[(column, type_) for column, type_ in OMDB_COLUMNS.values()],
+    *[(column, pa.float32()) for column in RATING_COLUMNS.values()],
+    ("wikipedia_description", pa.string()),
+    ("wiki_page", pa.string()),
+    ("imdb_match_confidence", pa.float32()),
+    ("enrichment_status", pa.string()),
+    ("updated_at", pa.timestamp("ms", tz="UTC")),
+])
+PARTITIONING = ds.partitioning(pa.schema([("release_year", pa.int16())]), flavor="hive")
+
+_INT_TYPES = {pa.int32(), pa.int64()}
+_FLOAT_TYPES = {pa.float32(), pa.float64()}
+
+
+def _number(value, type_):
+    number = parse_number(value) if value is not None else None
+    if number is None:
+        return None
+    if type_ in _INT_TYPES:
+        return int(number)
+    return float(number)
+
+
+def _text(value):
+    return None if value in (None, "", "N/A") else str(value)
+
+
+def flatten_movie(movie):
+    """Ein Mongo-Dokument als flache Zeile passend zu SCHEMA (fehlende oder unlesbare Werte werden None)."""
+    omdb = movie.get("omdb_details") or {}
+    row = {
+        "mongo_id": str(movie["_id"]) if movie.get("_id") is not None else None,
+        "released_at": indexes.released_at(movie),
+        "origin_country": [str(country) for country in movie.get("origin_country") or []],
+        "wikipedia_description": _text(movie.get("wikipedia_Description")),
+        "wiki_page": _text(movie.get("wiki_page")),
+        "updated_at": movie.get("updated_at"),
+    }
+    for field in ("id", "popularity", "vote_average", "vote_count", "budget", "revenue", "imdb_match_confidence"):
+        row[field] = _number(movie.get(field), SCHEMA.field(field).type)
+    for field in ("imdb_id", "wikidata_id", "title", "original_title", "original_language", "overview",
+                  "release_date", "status", "tagline", "homepage", "poster_path", "backdrop_path", "enrichment_status"):
+        row[field] = _text(movie.get(field))
+    for column, key in LIST_COLUMNS.items():
+        row[column] = [str(item[key]) for item in movie.get(column) or [] if isinstance(item, dict) and item.get(key)]
+    for key, (column, type_) in OMDB_COLUMNS.items():
+        row[column] = _number(omdb.get(key), type_) if type_ in _INT_TYPES | _FLOAT_TYPES else _text(omdb.get(key))
+    scores = {rating.get("Source"): rating for rating in omdb.get("Ratings") or [] if isinstance(rating, dict)}
+    for source, column in RATING_COLUMNS.items():
+        rating = scores.get(source) or {}
+        # `Score` gibt es erst seit dem Movie-Modell, ältere Dokumente haben nur den OMDb-Text (`Value`)
+        score = rating.get("Score") if rating.get("Score") is not None else parse_rating(rating.get("Value"))
+        row[column] = _number(score, pa.float32())
+    return row
+
+
+def release_year(row):
+    released = row["released_at"]
+    return released.year if released else None
+
+
+def partition_dir(root, year):
+    return os.path.join(root, f"release_year={NULL_PARTITION if year is None else year}")
+
+# ------------------ Wasserzeichen ------------------
+
+def load_state(root):
+    try:
+        with open(os.path.join(root, STATE_FILE), encoding="utf-8") as state_file:
+            state = json.load(state_file)
+    except FileNotFoundError:
+        return None
+    return state if state.get("version") == EXPORT_VERSION else None
+
+
+def save_state(root, updated_at, last_id, rows, mode):
+    state = {
+        "version": EXPORT_VERSION,
+        "mode": mode,
+        "exported_at": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+        "rows": rows,
+        "updated_at_watermark": updated_at.isoformat() if updated_at else None,
+        "id_watermark": str(last_id) if last_id else None,
+    }
+    temporary = os.path.join(root, f"{STATE_FILE}.tmp")
+    with open(temporary, "w", encoding="utf-8") as state_file:
+        json.dump(state, state_file, indent=2)
+    os.replace(temporary, os.path.join(root, STATE_FILE))
+
+
+class Watermark:
+    """Höchster gesehener Stand: `updated_at` (vom MovieWriter gesetzt) und `_id` der Dokumente ohne `updated_at`."""
+
+    def __init__(self, started):
+        self.started = started
+        self.updated_at = None
+        self.last_id = None
+
+    def observe(self, movie):
+        updated_at = movie.get("updated_at")
+        if updated_at is not None:
+            if updated_at.tzinfo is None:  # BSON-Daten kommen ohne Zeitzone (UTC)
+                updated_at = updated_at.replace(tzinfo=datetime.timezone.utc)
+            self.updated_at = max(self.updated_at or updated_at, updated_at)
+        elif isinstance(movie.get("_id"), ObjectId):
+            self.last_id = max(self.last_id or movie["_id"], movie["_id"])
+
+    def final(self, previous=None):
+        """Wasserzeichen für den nächsten Lauf; `updated_at` nie später als Exportbeginn minus WATERMARK_LAG."""
+        updated_at = self.updated_at
+        if updated_at is not None:
+            updated_at = min(updated_at, self.started - WATERMARK_LAG)
+        if previous:
+            updated_at = max(filter(None, [updated_at, _parse_time(previous.get("updated_at_watermark"))]), default=None)
+            last_id = max(filter(None, [self.last_id, _parse_id(previous.get("id_watermark"))]), default=None)
+        else:
+            last_id = self.last_id
+        return updated_at, last_id
+
+
+def _parse_time(value):
+    return datetime.datetime.fromisoformat(value) if value else None
+
+
+def _parse_id(value):
+    return ObjectId(value) if value else None
+
+
+def changed_query(state):
+    """Filme, die seit dem letzten Export geschrieben wurden; ältere Dokumente ohne `updated_at` über ihre `_id`."""
+    clauses = []
+    updated_at = _parse_time(state.get("updated_at_watermark"))
+    if updated_at:
+        clauses.append({"updated_at": {"$gte": updated_at}})
+    else:
+        clauses.append({"updated_at": {"$exists": True}})
+    last_id = _parse_id(state.get("id_watermark"))
+    clauses.append({"updated_at": {"$exists": False}, **({"_id": {"$gt": last_id}} if last_id else {})})
+    return {"$or": clauses}
+
+# ------------------ Export ------------------
+
+async def _row_batches(cursor, batch_size, watermark):
+    """Liest den Cursor in Batches und liefert je Batch die flachen Zeilen nach Erscheinungsjahr gruppiert."""
+    batch = []
+    async for movie in cursor:
+        watermark.observe(movie)
+        batch.append(movie)
+        if len(batch) >= batch_size:
+            yield _group_rows(batch)
+            batch = []
+    if batch:
+        yield _group_rows(batch)
+
+
+def _group_rows(movies):
+    with metrics.timer("stage_seconds", stage="export_flatten"):
+        groups = defaultdict(list)
+        for movie in movies:
+            row = flatten_movie(movie)
+            groups[release_year(row)].append(row)
+        return {year: pa.Table.from_pylist(rows, schema=SCHEMA) for year, rows in groups.items()}
+
+
+async def export_full(collection, root, batch_size=5000, row_group_size=None):
+    """Schreibt die ganze Collection als neuen Snapshot (`release_year=YYYY/part-0.parquet`) und tauscht ihn atomar aus.
+
+    Gelesen wird in `_id`-Reihenfolge und batchweise; je Partition bleibt nur ein offener ParquetWriter. Zeilen
+    werden je Partition gesammelt, bis `row_group_size` (`export_row_group_size`) erreicht ist: ein Batch verteilt
+    sich auf viele Jahre, eine Row Group je Batch und Jahr hätte nur wenige Dutzend Zeilen.
+    """
+    row_group_size = row_group_size or int(os.getenv('export_row_group_size', 50000))
+    watermark = Watermark(datetime.datetime.now(datetime.timezone.utc))
+    staging = f"{root}.staging-{int(time.time())}"
+    writers = {}
+    pending = defaultdict(list)
+    rows = 0
+
+    def write(year):
+        table = pa.concat_tables(pending.pop(year))
+        writer = writers.get(year)
+        if writer is None:
+            os.makedirs(partition_dir(staging, year), exist_ok=True)
+            writer = writers[year] = pq.ParquetWriter(os.path.join(partition_dir(staging, year), PART_FILE),
+                                                      SCHEMA, compression="zstd")
+        with metrics.timer("stage_seconds", stage="export_write"):
+            writer.write_table(table, row_group_size=row_group_size)
+
+    try:
+        cursor = collection.find({}, batch_size=batch_size).sort("_id", 1)
+        async for groups in _row_batches(cursor, batch_size, watermark):
+            for year, table in groups.items():
+                pending[year].append(table)
+                rows += table.num_rows
+                if sum(buffered.num_rows for buffered in pending[year]) >= row_group_size:
+                    write(year)
+        for year in list(pending):
+            write(year)
+    except BaseException:
+        for writer in writers.values():
+            writer.close()
+        shutil.rmtree(staging, ignore_errors=True)
+        raise
+    for writer in writers.values():
+        writer.close()
+
+    os.makedirs(staging, exist_ok=True)
+    save_state(staging, *watermark.final(), rows, "full")
+    previous = f"{root}.previous"
+    shutil.rmtree(previous, ignore_errors=True)
+    if os.path.exists(root):
+        os.replace(root, previous)
+    os.replace(staging, root)
+    shutil.rmtree(previous, ignore_errors=True)
+    metrics.registry.inc("export_rows_total", rows, mode="full")
+    logger.info(f"Exported {rows} movies in {len(writers)} partitions to {root}")
+    return rows
+
+
+def _write_partition(root, year, table):
+    directory = partition_dir(root, year)
+    os.makedirs(directory, exist_ok=True)
+    temporary = os.path.join(directory, f"{PART_FILE}.tmp")
+    pq.write_table(table, temporary, compression="zstd")
+    os.replace(temporary, os.path.join(directory, PART_FILE))
+
+
+def _partition_years(root):
+    for name in os.listdir(root):
+        if name.startswith("release_year="):
+            value = name.split("=", 1)[1]
+            yield None if value == NULL_PARTITION else int(value)
+
+
+async def export_incremental(collection, root, batch_size=5000):
+    """Aktualisiert einen bestehenden Snapshot: nur seit dem Wasserzeichen geänderte Filme werden gelesen.
+
+    Von jeder Partition wird nur die Spalte `id` gelesen; vollständig gelesen und neu geschrieben werden nur
+    Partitionen mit geänderten bzw. gelöschten Filmen: alte Zeilen raus, neue Zeilen rein. Ohne bestehenden
+    Snapshot wird ein vollständiger Export gemacht.
+    """
+    state = load_state(root)
+    if state is None:
+        logger.info(f"No export state in {root}, running a full export")
+        return await export_full(collection, root, batch_size)
+
+    watermark = Watermark(datetime.datetime.now(datetime.timezone.utc))
+    cursor = collection.find(changed_query(state), batch_size=batch_size).sort([("updated_at", 1), ("_id", 1)])
+    changed = defaultdict(list)
+    async for groups in _row_batches(cursor, batch_size, watermark):
+        for year, table in groups.items():
+            changed[year].append(table)
+    changed_ids = {movie_id for tables in changed.values() for table in tables for movie_id in table["id"].to_pylist()}
+    # Gelöschte Filme erkennt nur der Abgleich mit allen IDs (über den Index uniq_tmdb_id)
+    current_ids = {movie["id"] async for movie in collection.find({}, {"_id": 0, "id": 1}, batch_size=batch_size)}
+
+    rewritten = 0
+    for year in set(_partition_years(root)) | set(changed):
+        path = os.path.join(partition_dir(root, year), PART_FILE)
+        exists = os.path.exists(path)
+        ids = set(pq.read_table(path, columns=["id"])["id"].to_pylist()) if exists else set()
+        stale = (ids & changed_ids) | (ids - current_ids)
+        if not stale and year not in changed:
+            continue
+        existing = pq.read_table(path, schema=SCHEMA) if exists else SCHEMA.empty_table()
+        keep = existing.filter(pc.invert(pc.is_in(existing["id"], value_set=pa.array(list(stale), pa.int64()))))
+        table = pa.concat_tables([keep, *changed.get(year, [])])
+        with metrics.timer("stage_seconds", stage="export_write"):
+            if table.num_rows:
+                _write_partition(root, year, table)
+            else:
+                shutil.rmtree(partition_dir(root, year), ignore_errors=True)
+        rewritten += 1
+
+    save_state(root, *watermark.final(state), len(current_ids), "incremental")
+    metrics.registry.inc("export_rows_total", len(changed_ids), mode="incremental")
+    logger.info(f"Incremental export: {len(changed_ids)} changed movies, {rewritten} partitions rewritten in {root}")
+    return len(changed_ids)
+
+# ------------------ Lesen ------------------
+
+def load_snapshot(root=DEFAULT_EXPORT_PATH, columns=None, filter=None):
+    """Snapshot als pyarrow-Table (memory-mapped); z. B. `load_snapshot(filter=ds.field("release_year") >= 2000)`.
+
+    Für pandas: `load_snapshot(...).to_pandas()`.
+    """
+    dataset = ds.dataset(root, format="parquet", partitioning=PARTITIONING)
+    return dataset.to_table(columns=columns, filter=filter)
+
+# ------------------ CLI ------------------
+
+async def main(mode, root):
+    import MongoDBContext as MongoDBC  # Nur für die CLI, Data/ liegt dann im Suchpfad
+
+    load_dotenv()
+    async with MongoDBC.MongoDBContext(os.getenv('mongo_uri')) as (client, db):
+        if client is None or db is None:
+            logger.error("Failed to get a valid MongoDB client or database")
+            return
+        collection = db[indexes.MOVIES_COLLECTION]
+        batch_size = int(os.getenv('export_batch_size', 5000))
+        if mode == "full":
+            await export_full(collection, root, batch_size)
+        else:
+            await export_incremental(collection, root, batch_size)
+    metrics.log_summary()
+
+
+if __name__ == "__main__":
+    mode = sys.argv[1] if len(sys.argv) > 1 else "incremental"
+    if mode not in ("full", "incremental"):
+        print("Usage: python Data/parquet_export.py [full|incremental] [path]")
+        sys.exit(1)
+    asyncio.run(main(mode, sys.argv[2] if len(sys.argv) > 2 else os.getenv('export_path', DEFAULT_EXPORT_PATH)))
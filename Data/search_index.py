@@ -0,0 +1,202 @@
+import asyncio
+import math
+import os
+import sys
+import time
+from bisect import bisect_left
+from collections import defaultdict
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from logger import logger
+import utils as u
+from Data.title_matching import trigrams
+
+# Gewichtung der durchsuchten Felder (gleiche Gewichte wie im MongoDB-Textindex, siehe indexes.py)
+FIELD_WEIGHTS = {"title": 10, "original_title": 8, "overview": 2, "wikipedia_Description": 1}
+SEARCH_PROJECTION = {"_id": 0, "id": 1, "popularity": 1, **{field: 1 for field in FIELD_WEIGHTS}}
+
+MAX_PREFIX_EXPANSIONS = 50
+MIN_FUZZY_LENGTH = 4
+MIN_FUZZY_SIMILARITY = 0.5
+PREFIX_FACTOR = 0.8
+FUZZY_FACTOR = 0.7
+SATURATION = 1.2  # BM25-artige Sättigung der Termgewichte
+
+
+def tokenize(text):
+    return u.normalize_title(text).split() if text else []
+
+
+class SearchIndex:
+    """Invertierter Index über Titel und Beschreibungen der Filme (im Speicher).
+
+    Unterstützt gerankte Suche, Präfix-/Autocomplete-Suche auf dem letzten Suchwort und Tippfehler-Toleranz
+    über die Trigram-Ähnlichkeit der Suchwörter zum Vokabular.
+    """
+
+    def __init__(self):
+        self.postings = defaultdict(dict)  # Term -> {TMDb-ID: gewichtete Häufigkeit}
+        self.titles = {}
+        self.popularity = {}
+        self.built_at = time.monotonic()
+        self._vocabulary = None
+        self._gram_postings = None
+
+    def __len__(self):
+        return len(self.titles)
+
+    def add(self, movie):
+        movie_id = movie.get("id")
+        if movie_id is None:
+            return
+        self.titles[movie_id] = movie.get("title") or movie.get("original_title")
+        self.popularity[movie_id] = movie.get("popularity") or 0
+        for field, weight in FIELD_WEIGHTS.items():
+            for term in tokenize(movie.get(field)):
+                entry = self.postings[term]
+                entry[movie_id] = entry.get(movie_id, 0) + weight
+        self._vocabulary = self._gram_postings = None
+
+    @property
+    def vocabulary(self):
+        if self._vocabulary is None:
+            self._vocabulary = sorted(self.postings)
+        return self._vocabulary
+
+    def _prefix_terms(self, prefix):
+        vocabulary = self.vocabulary
+        start = bisect_left(vocabulary, prefix)
+        terms = []
+        for term in vocabulary[start:start + MAX_PREFIX_EXPANSIONS]:
+            if not term.startswith(prefix):
+                break
+            terms.append(term)
+        return terms
+
+    def _fuzzy_terms(self, token):
+        """Vokabular-Terme mit ausreichender Trigram-Ähnlichkeit (Dice) zum Suchwort."""
+        if self._gram_postings is None:
+            self._gram_postings = defaultdict(list)
+            for position, term in enumerate(self.vocabulary):
+                for gram in trigrams(term):
+                    self._gram_postings[gram].append(position)
+        grams = trigrams(token)
+        overlap = defaultdict(int)
+        for gram in grams:
+            for position in self._gram_postings.get(gram, ()):
+                overlap[position] += 1
+        matches = []
+        for position, shared in overlap.items():
+            term = self.vocabulary[position]
+            similarity = 2.0 * shared / (len(grams) + len(trigrams(term)))
+            if similarity >= MIN_FUZZY_SIMILARITY:
+                matches.append((term, similarity))
+        return sorted(matches, key=lambda match: -match[1])[:MAX_PREFIX_EXPANSIONS]
+
+    def _expand(self, token, prefix, fuzzy):
+        """Terme, über die ein Suchwort trifft, mit Faktor: exakt 1.0, Präfix bzw. Tippfehler geringer."""
+        expansions = {token: 1.0} if token in self.postings else {}
+        if prefix:
+            for term in self._prefix_terms(token):
+                expansions.setdefault(term, PREFIX_FACTOR)
+        if fuzzy and not expansions and len(token) >= MIN_FUZZY_LENGTH:
+            for term, similarity in self._fuzzy_terms(token):
+                expansions.setdefault(term, FUZZY_FACTOR * similarity)
+        return expansions
+
+    def search(self, query, limit=20, prefix=True, fuzzy=True):
+        """Gerankte Treffer als Liste `(TMDb-ID, Score)`.
+
+        Das letzte Suchwort wird als Präfix behandelt (Autocomplete); Suchwörter ohne exakten oder Präfix-Treffer
+        werden tippfehlertolerant über ähnliche Terme gesucht. Filme, die alle Suchwörter enthalten, stehen vorn.
+        """
+        tokens = tokenize(query)
+        if not tokens or not self.titles:
+            return []
+        total = len(self.titles)
+        scores = defaultdict(float)
+        matched = defaultdict(int)
+        for index, token in enumerate(tokens):
+            expansions = self._expand(token, prefix and index == len(tokens) - 1, fuzzy)
+            token_scores = {}
+            for term, factor in expansions.items():
+                documents = self.postings[term]
+                idf = math.log(1 + (total - len(documents) + 0.5) / (len(documents) + 0.5))
+                for movie_id, weight in documents.items():
+                    score = factor * idf * weight / (weight + SATURATION)
+                    token_scores[movie_id] = max(token_scores.get(movie_id, 0.0), score)
+            for movie_id, score in token_scores.items():
+                scores[movie_id] += score
+                matched[movie_id] += 1
+
+        ranked = sorted(scores, key=lambda movie_id: (-matched[movie_id], -scores[movie_id], -self.popularity[movie_id]))
+        return [(movie_id, round(scores[movie_id], 4)) for movie_id in ranked[:limit]]
+
+    def suggest(self, prefix, limit=10):
+        """Autocomplete: Titelvorschläge `(TMDb-ID, Titel)` für eine angefangene Eingabe."""
+        return [(movie_id, self.titles[movie_id]) for movie_id, _ in self.search(prefix, limit, prefix=True, fuzzy=False)]
+
+
+def _add_all(index, movies):
+    for movie in movies:
+        index.add(movie)
+
+
+async def build_search_index(collection, batch_size=1000):
+    """Baut den Index aus allen Filmen der Collection (gestreamt, nur die benötigten Felder).
+
+    Tokenisieren und Einfügen laufen je Batch in einem Thread, damit die Event-Loop der API währenddessen antwortet.
+    """
+    started = time.perf_counter()
+    index = SearchIndex()
+    batch = []
+    async for movie in collection.find({}, SEARCH_PROJECTION, batch_size=batch_size):
+        batch.append(movie)
+        if len(batch) >= batch_size:
+            await asyncio.to_thread(_add_all, index, batch)
+            batch = []
+    await asyncio.to_thread(_add_all, index, batch)
+    logger.info(f"Search index built over {len(index)} movies ({len(index.postings)} terms) "
+                f"in {time.perf_counter() - started:.2f}s")
+    return index
+
+
+_indexes = {}
+_builds = {}  # Laufender Aufbau je Collection (asyncio.Task)
+
+
+async def _rebuild(key, collection):
+    try:
+        index = _indexes[key] = await build_search_index(collection)
+        return index
+    except Exception as e:
+        if key not in _indexes:
+            raise
+        logger.error(f"Rebuilding the search index failed, keeping the previous one: {repr(e)}")
+        return _indexes[key]
+    finally:
+        _builds.pop(key, None)
+
+
+async def get_search_index(collection, max_age=None):
+    """Gemeinsamer Index je Collection; nach `max_age` Sekunden (`search_index_ttl`) wird er im Hintergrund neu gebaut.
+
+    Bis der neue Index fertig ist, beantwortet der bisherige die Anfragen; nur der allererste Aufruf wartet.
+    """
+    max_age = max_age if max_age is not None else float(os.getenv('search_index_ttl', 600))
+    key = (collection.database.name, collection.name)
+    index = _indexes.get(key)
+    if index is not None and time.monotonic() - index.built_at <= max_age:
+        return index
+    if key not in _builds:
+        _builds[key] = asyncio.create_task(_rebuild(key, collection))
+    if index is None:
+        return await asyncio.shield(_builds[key])  # Abbruch eines Requests bricht den Aufbau nicht ab
+    return index
+
+
+async def text_search(collection, query, projection=None, limit=20):
+    """Gerankte Volltextsuche über den MongoDB-Textindex (ganze Wörter, mit Stemming)."""
+    projection = {**(projection or {"_id": 0}), "score": {"$meta": "textScore"}}
+    cursor = collection.find({"$text": {"$search": query}}, projection).sort([("score", {"$meta": "textScore"})]).limit(limit)
+    return await cursor.to_list(length=limit)
@@ -0,0 +1,53 @@
+import asyncio
+import os
+import sys
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from logger import logger
+
+_DONE = object()
+
+
+async def run_workers(source, worker, workers=8, queue_size=None):
+    """Verteilt die Elemente eines async-Iterators (z. B. Motor-Cursor) über eine begrenzte Queue an `workers` Koroutinen.
+
+    Der Cursor wird nur so schnell gelesen, wie die Worker abarbeiten, der Speicherbedarf bleibt damit konstant.
+    Gibt die Anzahl der verarbeiteten Elemente zurück.
+    """
+    queue = asyncio.Queue(maxsize=queue_size or workers * 2)
+
+    async def consume(worker_id):
+        while True:
+            item = await queue.get()
+            try:
+                if item is _DONE:
+                    return
+                await worker(item, worker_id)
+            except Exception as e:
+                logger.error(f"[Worker {worker_id}] Error while processing item: {repr(e)}")
+            finally:
+                queue.task_done()
+
+    consumers = [asyncio.create_task(consume(worker_id)) for worker_id in range(1, workers + 1)]
+    count = 0
+    try:
+        async for item in source:
+            await queue.put(item)
+            count += 1
+    finally:
+        for _ in consumers:
+            await queue.put(_DONE)
+        await asyncio.gather(*consumers)
+    return count
+
+
+async def chunked(source, size):
+    """Fasst die Elemente eines async-Iterators zu Listen mit höchstens `size` Elementen zusammen."""
+    chunk = []
+    async for item in source:
+        chunk.append(item)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
@@ -0,0 +1,193 @@
+import os
+import re
+import sys
+
+import numpy as np
+import pandas as pd
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from logger import logger
+import utils as u
+
+CANDIDATE_TITLE_TYPES = ("movie", "tvMovie", "video")
+YEAR_TOLERANCE = 1
+MIN_CONFIDENCE = 0.8
+
+_SUBTITLE_SEPARATOR = re.compile(r"\s*(?::|\s-\s|\s–\s)\s*")
+_ARTICLES = ("the ", "a ", "an ")
+
+# ------------------ Titel-Normalisierung ------------------
+
+def title_variants(title):
+    """Normalisierte Varianten eines Titels: vollständig, ohne Artikel und ohne Untertitel."""
+    if not title:
+        return set()
+    full = u.normalize_title(title)
+    variants = {full, u.normalize_title(_SUBTITLE_SEPARATOR.split(str(title), maxsplit=1)[0])}
+    for variant in list(variants):
+        for article in _ARTICLES:
+            if variant.startswith(article):
+                variants.add(variant[len(article):])
+    variants.discard("")
+    return variants
+
+
+def trigrams(normalized_title):
+    padded = f"  {normalized_title} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def release_year(release_date):
+    """Jahr aus dem TMDb `release_date` (YYYY-MM-DD), sonst None."""
+    try:
+        return int(str(release_date)[:4])
+    except (TypeError, ValueError):
+        return None
+
+# ------------------ Trigram-Index über die IMDb-Kandidaten ------------------
+
+def _gram_code(gram):
+    """Trigram als eine Zahl (drei Unicode-Codepoints à 21 Bit), damit die Posting-Listen reine Integer-Arrays sind."""
+    return (ord(gram[0]) << 42) | (ord(gram[1]) << 21) | ord(gram[2])
+
+
+def _row_grams(variants):
+    """(Trigram-Code, Zeile) aller Titelvarianten, vektorisiert über die aneinandergehängten Codepoints.
+
+    Entspricht `trigrams(variant)` je Zeile (gleiche Polsterung, Duplikate innerhalb einer Zeile entfernt).
+    """
+    padded = [f"  {variant} " for variant in variants]
+    lengths = np.fromiter(map(len, padded), dtype=np.int64, count=len(padded))
+    codepoints = np.frombuffer("".join(padded).encode("utf-32-le"), dtype=np.uint32).astype(np.int64)
+    if len(codepoints) < 3:
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int32)
+    codes = (codepoints[:-2] << 42) | (codepoints[1:-1] << 21) | codepoints[2:]
+    rows = np.repeat(np.arange(len(padded), dtype=np.int32), lengths)[:-2]
+    offset = np.arange(len(codes)) - np.repeat(np.cumsum(lengths) - lengths, lengths)[:-2]
+    valid = offset <= np.repeat(lengths, lengths)[:-2] - 3  # Kein Trigram über die Grenze zweier Titel
+    codes, rows = codes[valid], rows[valid]
+    order = np.lexsort((codes, rows))
+    codes, rows = codes[order], rows[order]
+    first = np.ones(len(codes), dtype=bool)
+    first[1:] = (codes[1:] != codes[:-1]) | (rows[1:] != rows[:-1])
+    return codes[first], rows[first]
+
+
+class TrigramIndex:
+    """Invertierter Trigram-Index über die Titelvarianten der IMDb-Kandidaten.
+
+    Die Posting-Listen liegen als CSR-Arrays vor (sortierte Trigram-Codes, Offsets, Zeilennummern als int32) und
+    werden chunkweise vektorisiert aufgebaut, statt pro Titel Python-Sets und -Listen anzulegen.
+    """
+
+    def __init__(self, title_index, positions, chunk_size=200000):
+        self.title_index = title_index
+        self.positions = np.asarray(positions)
+
+        candidates, code_chunks, row_chunks, rows = [], [], [], 0
+        for start in range(0, len(self.positions), chunk_size):
+            variants = []
+            for candidate in range(start, min(start + chunk_size, len(self.positions))):
+                for variant in title_variants(title_index.titles[self.positions[candidate]].decode("utf-8")):
+                    variants.append(variant)
+                    candidates.append(candidate)
+            codes, chunk_rows = _row_grams(variants)
+            code_chunks.append(codes)
+            row_chunks.append(chunk_rows + rows)
+            rows += len(variants)
+
+        codes = np.concatenate(code_chunks) if code_chunks else np.zeros(0, dtype=np.int64)
+        posting_rows = np.concatenate(row_chunks) if row_chunks else np.zeros(0, dtype=np.int32)
+        del code_chunks, row_chunks
+        order = np.argsort(codes, kind="stable")
+        codes, self.posting_rows = codes[order], posting_rows[order]
+        del order, posting_rows
+        self.gram_codes, self.gram_starts = np.unique(codes, return_index=True)
+        self.gram_ends = np.append(self.gram_starts[1:], len(codes))
+        del codes
+
+        self.row_candidate = np.array(candidates, dtype=np.int32)
+        self.row_size = np.bincount(self.posting_rows, minlength=rows).astype(np.int32)
+        logger.info(f"Trigram index built over {len(self.positions)} IMDb candidates ({rows} title variants)")
+
+    def similarity(self, normalized_title):
+        """Dice-Ähnlichkeit des Titels zu allen Kandidaten (maximal über deren Varianten)."""
+        grams = trigrams(normalized_title)
+        scores = np.zeros(len(self.positions))
+        codes = np.array([_gram_code(gram) for gram in grams], dtype=np.int64)
+        found = np.searchsorted(self.gram_codes, codes)
+        present = found < len(self.gram_codes)
+        present[present] = self.gram_codes[found[present]] == codes[present]
+        found = found[present]
+        if not len(found):
+            return scores
+        hits = np.concatenate([self.posting_rows[self.gram_starts[i]:self.gram_ends[i]] for i in found])
+        overlap = np.bincount(hits, minlength=len(self.row_candidate))
+        matched = np.flatnonzero(overlap)
+        dice = 2.0 * overlap[matched] / (len(grams) + self.row_size[matched])
+        np.maximum.at(scores, self.row_candidate[matched], dice)
+        return scores
+
+# ------------------ Batch-Abgleich ------------------
+
+def _year_scores(candidate_years, year):
+    if year is None:
+        return np.full(len(candidate_years), 0.5)
+    distance = np.abs(candidate_years.astype(np.int64) - year)
+    return np.where(distance == 0, 1.0, np.where(distance <= YEAR_TOLERANCE, 0.6, 0.0))
+
+
+class TitleReconciler:
+    """Gleicht TMDb-Filme gegen die IMDb-Kandidaten eines Jahresbereichs ab; der Trigram-Index wird einmal gebaut."""
+
+    def __init__(self, title_index, min_year=None, max_year=None, min_confidence=MIN_CONFIDENCE):
+        self.title_index = title_index
+        self.min_confidence = min_confidence
+        self.positions = title_index.select(
+            CANDIDATE_TITLE_TYPES,
+            min_year - YEAR_TOLERANCE if min_year else None,
+            max_year + YEAR_TOLERANCE if max_year else None,
+        )
+        self.trigram_index = TrigramIndex(title_index, self.positions) if len(self.positions) else None
+        self.candidate_years = np.asarray(title_index.start_year[self.positions])
+
+    def match(self, movies):
+        """DataFrame `_id`, `imdb_id`, `matched_title`, `confidence` für alle Filme mit ausreichend sicherem Treffer."""
+        columns = ["_id", "imdb_id", "matched_title", "confidence"]
+        if self.trigram_index is None:
+            logger.warning("No IMDb candidates found for the requested release years.")
+            return pd.DataFrame(columns=columns)
+
+        matches = []
+        for movie in movies:
+            variants = title_variants(movie.get("title")) | title_variants(movie.get("original_title"))
+            if not variants:
+                continue
+            similarity = np.max([self.trigram_index.similarity(variant) for variant in variants], axis=0)
+            confidence = 0.8 * similarity + 0.2 * _year_scores(self.candidate_years, release_year(movie.get("release_date")))
+            best = int(np.argmax(confidence))
+            if confidence[best] >= self.min_confidence:
+                record = self.title_index.record(self.positions[best])
+                matches.append((movie["_id"], record.tconst, record.primary_title, round(float(confidence[best]), 3)))
+
+        logger.info(f"Reconciled {len(matches)} of {len(movies)} movies against IMDb titles")
+        return pd.DataFrame(matches, columns=columns)
+
+
+def reconcile_titles(movies, title_index, min_confidence=MIN_CONFIDENCE):
+    """Ordnet vielen TMDb-Filmen in einem Durchlauf IMDb-IDs zu.
+
+    Args:
+        movies (list): Dokumente mit `_id`, `title`, optional `original_title` und `release_date`
+        title_index: geöffneter `imdb_title_index.TitleIndex`
+        min_confidence (float): Mindest-Konfidenz, unterhalb derer kein Treffer zurückgegeben wird
+
+    Returns:
+        DataFrame: `_id`, `imdb_id`, `matched_title`, `confidence` für alle Filme mit Treffer
+    """
+    if not movies:
+        return pd.DataFrame(columns=["_id", "imdb_id", "matched_title", "confidence"])
+
+    years = [year for year in (release_year(movie.get("release_date")) for movie in movies) if year]
+    reconciler = TitleReconciler(title_index, min(years, default=None), max(years, default=None), min_confidence)
+    return reconciler.match(movies)
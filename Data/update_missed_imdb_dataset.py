@@ -2,84 +2,86 @@ import asyncio
 import os
 import sys
 import aiohttp
-import pandas as pd
 from dotenv import load_dotenv
 import MongoDBContext as MongoDBC
+import imdb_title_index as title_index
+import title_matching
+import indexes
+import streaming
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
 from logger import logger
+import metrics
 
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
-# ------------------ Optimized IMDb Data Loading ------------------
-
-def load_filtered_imdb_data(file_path, title_list):
-    """Lädt IMDb-Daten effizient und filtert nur relevante Filme."""
-    filtered_movies = []
-
-    # Nur benötigte Spalten laden
-    usecols = ["tconst", "primaryTitle", "titleType"]
-    chunksize = 100000  # Verarbeitung in Chunks, um Speicher zu sparen
-
-    for chunk in pd.read_csv(file_path, sep="\t", dtype=str,encoding='utf-8', usecols=usecols, chunksize=chunksize, na_values="\\N"):
-        # Filtere nur Filme (kein TV oder Kurzfilm)
-        chunk = chunk[chunk["titleType"] == "movie"]
-
-        # Filtere nach Titeln, die in title_list sind
-        chunk_filtered = chunk[chunk["primaryTitle"].isin(title_list)]
-        
-        if not chunk_filtered.empty:
-            filtered_movies.append(chunk_filtered)
-
-    # Alle gefilterten Chunks zusammenfügen
-    return pd.concat(filtered_movies, ignore_index=True) if filtered_movies else pd.DataFrame()
-
 # ------------------ Async Functions for Parallel Processing ------------------
 
-async def fetch_imdb_id(movie, df):
-    """Sucht die IMDb-ID für einen Film anhand des Titels."""
-    try:
-        matching_movies = df[df["primaryTitle"].str.lower() == movie.get("title").lower()]
-        if not matching_movies.empty:
-            return movie["_id"], matching_movies.iloc[0]["tconst"]  # (MongoDB-ID, IMDb-ID)
-        return movie["_id"], None
-    except Exception as e:
-        logger.error(f"Fehler beim Abrufen der IMDb-ID für {movie['title']}: {e}")
-        return movie["_id"], None
-
-async def get_missed_imdb_ids(collection, file_path):
-    """Lädt IMDb-Daten, sucht parallele IMDb-IDs und speichert sie."""
+async def get_missed_imdb_ids(collection, file_path, chunk_size=1000):
+    """Streamt alle Filme ohne IMDb-ID, gleicht sie chunkweise mit dem IMDb-Index ab und speichert die Treffer."""
     try:
-        # Lade alle Filme, die noch keine IMDb-ID haben
-        movies_missed_imdb = await collection.find({"$or": [{"imdb_id": None}, {"imdb_id": ""}]}).to_list(length=None)
-        if not movies_missed_imdb:
+        query = {"enrichment_status": indexes.STATUS_PENDING_IMDB}
+
+        # Jahresbereich vorab per Aggregation bestimmen, damit der Trigram-Index nur einmal gebaut wird
+        year_range = await collection.aggregate([
+            {"$match": query},
+            {"$group": {"_id": None, "count": {"$sum": 1},
+                        "min_date": {"$min": "$release_date"}, "max_date": {"$max": "$release_date"}}},
+        ]).to_list(length=1)
+        if not year_range:
             logger.info("Keine Filme ohne IMDb-ID gefunden.")
             return
 
-        logger.info(f"{len(movies_missed_imdb)} Filme ohne IMDb-ID gefunden. Starte parallele Suche...")
-
-        # Liste aller zu suchenden Titel
-        title_list = [movie["title"] for movie in movies_missed_imdb]
-
-        # IMDb-Daten filtern (Speicher-Optimierung!)
-        df = load_filtered_imdb_data(file_path, title_list)
-
-        # Parallel IMDb-IDs suchen
-        tasks = [fetch_imdb_id(movie, df) for movie in movies_missed_imdb]
-        results = await asyncio.gather(*tasks)
-
-        # Filtere nur erfolgreiche IMDb-IDs
-        updates = [(movie_id, imdb_id) for movie_id, imdb_id in results if imdb_id]
-
-        if not updates:
+        logger.info(f"{year_range[0]['count']} Filme ohne IMDb-ID gefunden. Starte Abgleich...")
+
+        index = await title_index.open_title_index(file_path)
+        reconciler = title_matching.TitleReconciler(
+            index,
+            title_matching.release_year(year_range[0]["min_date"]),
+            title_matching.release_year(year_range[0]["max_date"]),
+        )
+
+        projection = {"title": 1, "original_title": 1, "release_date": 1}
+        cursor = collection.find(query, projection, batch_size=chunk_size)
+        updated = 0
+        async for movies in streaming.chunked(cursor, chunk_size):
+            with metrics.timer("stage_seconds", stage="imdb_reconcile"):
+                matches = reconciler.match(movies)
+            if matches.empty:
+                continue
+
+            # `imdb_id` ist eindeutig (uniq_imdb_id): je tconst nur der sicherste Treffer des Chunks, und keine IDs,
+            # die schon ein anderer Film hat
+            matches = matches.sort_values("confidence", ascending=False).drop_duplicates("imdb_id")
+            taken = set(await collection.distinct("imdb_id", {"imdb_id": {"$in": matches["imdb_id"].tolist()}}))
+            matches = matches[~matches["imdb_id"].isin(taken)]
+            if taken:
+                logger.info(f"{len(taken)} IMDb-IDs gehören bereits anderen Filmen und werden übersprungen.")
+            if matches.empty:
+                continue
+
+            # Treffer eines Chunks gebündelt schreiben
+            operations = [
+                UpdateOne({"_id": movie_id}, {"$set": {"imdb_id": imdb_id, "imdb_match_confidence": confidence,
+                                                       "enrichment_status": indexes.STATUS_PENDING_OMDB},
+                                           "$currentDate": {"updated_at": True}})
+                for movie_id, imdb_id, confidence in zip(matches["_id"], matches["imdb_id"], matches["confidence"])
+            ]
+            try:
+                with metrics.timer("db_write_seconds", collection=collection.name):
+                    result = await collection.bulk_write(operations, ordered=False)
+                updated += result.modified_count
+            except BulkWriteError as e:  # z. B. parallel vergebene IMDb-ID; die übrigen Chunks laufen weiter
+                errors = e.details.get("writeErrors", [])
+                updated += e.details.get("nModified", 0)
+                logger.error(f"{len(errors)} IMDb-IDs konnten nicht gespeichert werden, "
+                             f"erster Fehler: {errors[0].get('errmsg') if errors else None}")
+
+        if not updated:
             logger.warning("Keine IMDb-IDs konnten aktualisiert werden.")
             return
 
-        logger.info(f"{len(updates)} Filme werden in der Datenbank aktualisiert...")
-
-        # MongoDB-Updates parallel durchführen
-        update_tasks = [collection.update_one({"_id": movie_id}, {"$set": {"imdb_id": imdb_id}}) for movie_id, imdb_id in updates]
-        await asyncio.gather(*update_tasks)
-
-        logger.info("Alle IMDb-IDs wurden erfolgreich gespeichert.")
+        logger.info(f"Alle {updated} IMDb-IDs wurden erfolgreich gespeichert.")
 
     except Exception as e:
         logger.error(f"Ein Fehler ist aufgetreten: {e}")
@@ -96,10 +98,9 @@ async def main():
             return
 
         collection = db["children_movies"]
-        file_path = "Data\\title.basics.tsv.gz"  # IMDb-Daten
+        file_path = title_index.DEFAULT_TSV_PATH  # IMDb-Daten
 
         await get_missed_imdb_ids(collection, file_path)
-        await client.close()
 
 # ------------------ Script Execution ------------------
 
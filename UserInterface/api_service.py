@@ -0,0 +1,204 @@
+import asyncio
+import datetime
+import os
+import sys
+import time
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from functools import wraps
+
+from dotenv import load_dotenv
+from fastapi import FastAPI, HTTPException, Query, Request
+from fastapi.responses import PlainTextResponse
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from logger import logger
+import metrics
+from Data.MongoDBContext import MongoDBContext
+import Data.search_index as search_index
+
+MOVIES_COLLECTION = "children_movies"
+
+DEFAULT_FIELDS = ["id", "title", "release_date", "vote_average", "genres", "imdb_id", "poster_path"]
+ALLOWED_FIELDS = set(DEFAULT_FIELDS) | {
+    "original_title", "overview", "popularity", "vote_count", "budget", "revenue", "tagline", "homepage",
+    "production_companies", "production_countries", "spoken_languages", "origin_country", "wikidata_id",
+    "omdb_details", "wikipedia_Description", "wiki_page",
+}
+SORT_FIELDS = {"popularity": "popularity", "rating": "vote_average", "release_date": "release_date", "title": "title"}
+MAX_PAGE_SIZE = 100
+
+# ------------------ In-Process Response Cache ------------------
+
+class TTLCache:
+    """Kleiner LRU-Cache mit Ablaufzeit für fertige API-Antworten."""
+
+    def __init__(self, maxsize=1024, ttl=60):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        entry = self.entries.get(key)
+        if entry is None or entry[0] < time.monotonic():
+            self.entries.pop(key, None)
+            self.misses += 1
+            return None
+        self.entries.move_to_end(key)
+        self.hits += 1
+        return entry[1]
+
+    def put(self, key, value):
+        self.entries[key] = (time.monotonic() + self.ttl, value)
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.maxsize:
+            self.entries.popitem(last=False)
+
+
+load_dotenv()
+response_cache = TTLCache(int(os.getenv('api_cache_size', 1024)), float(os.getenv('api_cache_ttl', 60)))
+
+
+def cached(handler):
+    """Cacht die Antwort eines Endpoints anhand seiner Argumente; gleichzeitige Misses teilen sich eine Abfrage."""
+    pending = {}
+
+    @wraps(handler)
+    async def wrapper(**kwargs):
+        key = (handler.__name__, tuple(sorted(kwargs.items())))
+        result = response_cache.get(key)
+        if result is not None:
+            return result
+        if key not in pending:
+            pending[key] = asyncio.ensure_future(handler(**kwargs))
+        try:
+            result = await asyncio.shield(pending[key])
+        finally:
+            if pending.get(key) is not None and pending[key].done():
+                pending.pop(key, None)
+        response_cache.put(key, result)
+        return result
+
+    return wrapper
+
+# ------------------ App ------------------
+
+@asynccontextmanager
+async def lifespan(app):
+    # Ein Motor-Client (mit Connection-Pool) für die gesamte Laufzeit der App
+    async with MongoDBContext(os.getenv('mongo_uri')) as (client, db):
+        app.state.movies = db[MOVIES_COLLECTION]
+        await search_index.get_search_index(app.state.movies)  # Suchindex vorab bauen, nicht beim ersten Request
+        yield
+    logger.info("FastAPI query service stopped.")
+
+
+app = FastAPI(title="KinderFilme API", lifespan=lifespan)
+
+
+@app.middleware("http")
+async def record_latency(request: Request, call_next):
+    started = time.perf_counter()
+    response = await call_next(request)
+    route = request.scope.get("route")
+    metrics.registry.observe("api_request_seconds", time.perf_counter() - started,
+                             path=getattr(route, "path", "unmatched"), status=response.status_code)
+    return response
+
+
+def projection_for(fields):
+    """Projektion aus einer kommagetrennten Feldliste; nur erlaubte Felder, `_id` nie."""
+    requested = [field.strip() for field in fields.split(",")] if fields else DEFAULT_FIELDS
+    unknown = [field for field in requested if field not in ALLOWED_FIELDS]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(unknown)}")
+    return {"_id": 0, **{field: 1 for field in requested}}
+
+
+async def find_page(query, fields, page, page_size, sort):
+    """Eine Seite Ergebnisse; `has_more` über einen zusätzlichen Treffer statt teurem count."""
+    cursor = (app.state.movies.find(query, projection_for(fields))
+              .sort(SORT_FIELDS[sort], -1 if sort in ("popularity", "rating", "release_date") else 1)
+              .skip((page - 1) * page_size)
+              .limit(page_size + 1))
+    items = await cursor.to_list(length=page_size + 1)
+    return {"page": page, "page_size": page_size, "has_more": len(items) > page_size, "items": items[:page_size]}
+
+
+@app.get("/movies")
+@cached
+async def list_movies(page: int = Query(1, ge=1), page_size: int = Query(20, ge=1, le=MAX_PAGE_SIZE),
+                      min_rating: float = None, max_rating: float = None, year: int = Query(None, ge=1870, le=2100),
+                      genre: str = None,
+                      fields: str = None, sort: str = Query("popularity", pattern="^(popularity|rating|release_date|title)$")):
+    """Filme gefiltert nach Bewertung (TMDb), Erscheinungsjahr und Genre."""
+    query = {}
+    if min_rating is not None or max_rating is not None:
+        query["vote_average"] = {key: value for key, value in (("$gte", min_rating), ("$lte", max_rating)) if value is not None}
+    if year is not None:
+        query["released_at"] = {"$gte": datetime.datetime(year, 1, 1), "$lt": datetime.datetime(year + 1, 1, 1)}
+    if genre:
+        query["genres.name"] = genre
+    return await find_page(query, fields, page, page_size, sort)
+
+
+@app.get("/movies/search")
+@cached
+async def search_movies(q: str = Query(..., min_length=1), page: int = Query(1, ge=1),
+                        page_size: int = Query(20, ge=1, le=MAX_PAGE_SIZE), fields: str = None):
+    """Gerankte Suche in Titeln und Beschreibungen (Präfix auf dem letzten Wort, tippfehlertolerant)."""
+    projection = projection_for(fields)
+    index = await search_index.get_search_index(app.state.movies)
+    ranked = index.search(q, limit=page * page_size + 1)
+    page_ids = [movie_id for movie_id, _ in ranked[(page - 1) * page_size:page * page_size]]
+    movies = await app.state.movies.find({"id": {"$in": page_ids}}, {**projection, "id": 1}).to_list(length=page_size)
+    by_id = {movie["id"]: movie for movie in movies}
+    items = [by_id[movie_id] for movie_id in page_ids if movie_id in by_id]
+    if "id" not in projection:
+        for movie in items:
+            movie.pop("id")
+    return {"page": page, "page_size": page_size, "has_more": len(ranked) > page * page_size, "items": items}
+
+
+@app.get("/movies/suggest")
+@cached
+async def suggest_titles(q: str = Query(..., min_length=1), limit: int = Query(10, ge=1, le=MAX_PAGE_SIZE)):
+    """Autocomplete: Titelvorschläge für eine angefangene Eingabe."""
+    index = await search_index.get_search_index(app.state.movies)
+    return [{"id": movie_id, "title": title} for movie_id, title in index.suggest(q, limit)]
+
+
+@app.get("/movies/{tmdb_id}")
+@cached
+async def get_movie(tmdb_id: int, fields: str = None):
+    movie = await app.state.movies.find_one({"id": tmdb_id}, projection_for(fields))
+    if not movie:
+        raise HTTPException(status_code=404, detail=f"Movie {tmdb_id} not found")
+    return movie
+
+
+@app.get("/movie/{movie_name}")
+async def read_movie(movie_name: str):
+    """Kompatibilität zur bisherigen Route."""
+    result = await search_movies(q=movie_name, page=1, page_size=20, fields=None)
+    return {"movie": result["items"]}
+
+
+@app.get("/cache/stats")
+async def cache_stats():
+    return {"entries": len(response_cache.entries), "hits": response_cache.hits, "misses": response_cache.misses}
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def prometheus_metrics():
+    """Prometheus-Endpoint: Latenzen der API und Zählerstände des Antwort-Caches."""
+    metrics.registry.counters["api_cache_hits_total"][()] = response_cache.hits
+    metrics.registry.counters["api_cache_misses_total"][()] = response_cache.misses
+    return metrics.registry.prometheus_text()
+
+
+if __name__ == "__main__":
+    import uvicorn
+    uvicorn.run(app, host="127.0.0.1", port=8000)
@@ -2,47 +2,52 @@ from flask import Flask, render_template
 from dash import Dash, dcc, html
 import plotly.express as px
 import pandas as pd
-from fastapi import FastAPI
 from threading import Thread
 from pymongo import MongoClient
-import Data.database_creation as do
+from dotenv import load_dotenv
+import os
+import Data.analytics as analytics
+from UserInterface.api_service import app as fastapi_app
 
 # Create a Flask app
 flask_app = Flask(__name__)
 
-# Create a FastAPI app (we'll run this in a thread later)
-fastapi_app = FastAPI()
-
-# Sample Data for Visualization
-df = pd.DataFrame({
-    'Movie': ['Toy Story', 'Finding Nemo', 'Shrek', 'Frozen', 'The Lion King'],
-    'Rating': [8.3, 8.1, 7.9, 7.5, 8.5],
-    'Year': [1995, 2003, 2001, 2013, 1994]
-})
-db = do.get_db()
-collection = db["children_movies"]
+# The async FastAPI query service (UserInterface/api_service.py) runs in a thread later
+load_dotenv()
+db = MongoClient(os.getenv('mongo_uri')).get_default_database("movieDB")
 # Dash App setup
 dash_app = Dash(__name__, server=flask_app, url_base_pathname='/dash/')
 
-# Create a simple plot in Dash
-fig = px.bar(df, x='Movie', y='Rating', title='Movie Ratings')
+def read_summary(name, sort_field):
+    """Liest eine vorberechnete Analytics-Collection (wenige kleine Dokumente) als DataFrame."""
+    return pd.DataFrame(list(db[name].find().sort(sort_field, 1)))
 
-dash_app.layout = html.Div([
-    html.H1("Children's Movies Ratings"),
-    dcc.Graph(figure=fig)
-])
+def serve_layout():
+    # Wird bei jedem Seitenaufruf ausgeführt und liest nur die Zusammenfassungen, nicht children_movies
+    ratings = read_summary(analytics.RATINGS_BY_YEAR, "_id")
+    genres = read_summary(analytics.GENRE_COUNTS, "movies")
+    studios = read_summary(analytics.STUDIO_FINANCE, "movies")
+    countries = read_summary(analytics.COUNTRY_COUNTS, "movies")
+    graphs = []
+    if not ratings.empty:
+        graphs.append(dcc.Graph(figure=px.line(ratings, x='_id', y=['avg_tmdb_rating', 'avg_imdb_rating'],
+                                               labels={'_id': 'Year'}, title='Ratings by Year')))
+    if not genres.empty:
+        graphs.append(dcc.Graph(figure=px.bar(genres, x='_id', y='movies', labels={'_id': 'Genre'}, title='Movies per Genre')))
+    if not studios.empty:
+        graphs.append(dcc.Graph(figure=px.scatter(studios.tail(30), x='total_budget', y='total_revenue', size='movies',
+                                                  hover_name='_id', title='Budget vs. Revenue per Studio')))
+    if not countries.empty:
+        graphs.append(dcc.Graph(figure=px.bar(countries.tail(20), x='name', y='movies', title='Production Countries')))
+    return html.Div([html.H1("Children's Movies Ratings")] + graphs)
+
+dash_app.layout = serve_layout
 
 # Route for Flask
 @flask_app.route('/')
 def home():
     return "<h1>Welcome to the Children's Movie App</h1><p>Visit the <a href='/dash/'>Dashboard</a> for movie ratings!</p>"
 
-# FastAPI route for additional API functionality
-@fastapi_app.get("/movie/{movie_name}")
-def read_movie(movie_name: str):
-    movie = df[df['Movie'].str.contains(movie_name, case=False)]
-    return {"movie": movie.to_dict(orient="records")}
-
 # Run the Flask app and FastAPI in separate threads
 def run_flask():
     flask_app.run(debug=True, use_reloader=False, port=5000)
@@ -0,0 +1,189 @@
+import asyncio
+import datetime
+import random
+import time
+from dataclasses import dataclass
+from urllib.parse import urlsplit
+
+from aiohttp import web
+
+# Stand-in für TMDb, OMDb, Wikidata und Wikipedia: synthetische, deterministische Antworten.
+# Pfade werden mit dem Original-Host als erstem Segment angesprochen, z. B. /api.themoviedb.org/3/movie/862
+
+CATALOG_START = datetime.date(1990, 1, 1)
+PAGE_SIZE = 20
+
+
+@dataclass
+class UpstreamBehavior:
+    """Verhalten des Mock-Servers: Latenz, Fehlerquote und Rate-Limit (429 mit Retry-After) pro Host."""
+    catalog_size: int = 2000
+    latency_ms: float = 30.0
+    jitter_ms: float = 20.0
+    error_rate: float = 0.0  # Anteil der Requests mit HTTP 500
+    rate_limit: float = 0.0  # Requests pro Sekunde und Host, 0 = unbegrenzt
+    seed: int = 42
+
+
+def movie_release_date(movie_id):
+    """Jeder dritte Tag ab CATALOG_START hat einen Film, damit Datums-Partitionen greifen."""
+    return CATALOG_START + datetime.timedelta(days=3 * (movie_id - 1))
+
+
+def discover_result(movie_id):
+    return {"id": movie_id, "title": f"Mock Movie {movie_id}", "original_title": f"Mock Movie {movie_id}",
+            "overview": f"A synthetic family film number {movie_id}.", "release_date": f"{movie_release_date(movie_id)}",
+            "popularity": 1000.0 / movie_id, "vote_average": 5 + movie_id % 50 / 10, "vote_count": movie_id * 3,
+            "original_language": "en", "genre_ids": [16, 10751, 12], "adult": False, "video": False,
+            "poster_path": f"/poster{movie_id}.jpg", "backdrop_path": None}
+
+
+class MockUpstream:
+    def __init__(self, behavior=None):
+        self.behavior = behavior or UpstreamBehavior()
+        self.random = random.Random(self.behavior.seed)
+        self.requests = {}
+        self.windows = {}
+        self.runner = None
+        self.port = None
+
+    # ------------------ Server ------------------
+
+    async def start(self, host="127.0.0.1", port=0):
+        app = web.Application()
+        app.router.add_get("/{upstream}/{path:.*}", self.handle)
+        self.runner = web.AppRunner(app, access_log=None)
+        await self.runner.setup()
+        site = web.TCPSite(self.runner, host, port)
+        await site.start()
+        self.port = site._server.sockets[0].getsockname()[1]
+        return self
+
+    async def stop(self):
+        if self.runner:
+            await self.runner.cleanup()
+
+    @property
+    def base_url(self):
+        return f"http://127.0.0.1:{self.port}"
+
+    def _throttled(self, upstream):
+        """Einfaches Fenster-Limit je Host und Sekunde; liefert die Wartezeit für Retry-After oder 0."""
+        if not self.behavior.rate_limit:
+            return 0
+        second = int(time.monotonic())
+        window, count = self.windows.get(upstream, (second, 0))
+        if window != second:
+            window, count = second, 0
+        self.windows[upstream] = (window, count + 1)
+        return 1 if count + 1 > self.behavior.rate_limit else 0
+
+    async def handle(self, request):
+        upstream = request.match_info["upstream"]
+        self.requests[upstream] = self.requests.get(upstream, 0) + 1
+        behavior = self.behavior
+        await asyncio.sleep(max(0.0, behavior.latency_ms + self.random.uniform(-1, 1) * behavior.jitter_ms) / 1000)
+        if self._throttled(upstream):
+            return web.Response(status=429, headers={"Retry-After": "1"})
+        if behavior.error_rate and self.random.random() < behavior.error_rate:
+            return web.Response(status=500)
+
+        path, query = "/" + request.match_info["path"], request.query
+        if upstream == "api.themoviedb.org":
+            return web.json_response(self.tmdb(path, query))
+        if upstream == "www.omdbapi.com":
+            return web.json_response(self.omdb(query))
+        if upstream == "www.wikidata.org":
+            return web.json_response(self.wikidata(query))
+        if upstream == "en.wikipedia.org":
+            return web.json_response(self.wikipedia(path, query))
+        return web.json_response({"error": f"unknown upstream {upstream}"}, status=404)
+
+    # ------------------ Antworten ------------------
+
+    def tmdb(self, path, query):
+        if path.startswith("/3/discover/movie"):
+            ids = range(1, self.behavior.catalog_size + 1)
+            if "primary_release_date.gte" in query:
+                start = datetime.date.fromisoformat(query["primary_release_date.gte"])
+                end = datetime.date.fromisoformat(query["primary_release_date.lte"])
+                ids = [movie_id for movie_id in ids if start <= movie_release_date(movie_id) <= end]
+            ids = list(ids)
+            page = int(query.get("page", 1))
+            results = [discover_result(movie_id) for movie_id in ids[(page - 1) * PAGE_SIZE:page * PAGE_SIZE]]
+            return {"page": page, "results": results, "total_results": len(ids),
+                    "total_pages": -(-len(ids) // PAGE_SIZE)}
+        if path.startswith("/3/movie/changes"):
+            return {"results": [], "page": 1, "total_pages": 1}
+        movie_id = int(path.rsplit("/", 1)[-1])
+        return {**discover_result(movie_id), "status": "Released", "media_type": "movie",
+                "genres": [{"id": 16, "name": "Animation"}, {"id": 10751, "name": "Family"}],
+                "budget": movie_id * 100000, "revenue": movie_id * 250000, "homepage": "", "tagline": "",
+                "origin_country": ["US"], "production_companies": [{"id": 3, "name": "Mock Studio"}],
+                "production_countries": [{"iso_3166_1": "US", "name": "United States of America"}],
+                "spoken_languages": [{"iso_639_1": "en", "name": "English"}],
+                "imdb_id": f"tt{movie_id:07d}",
+                "external_ids": {"imdb_id": f"tt{movie_id:07d}", "wikidata_id": f"Q{movie_id}"}}
+
+    def omdb(self, query):
+        movie_id = int(query.get("i", "tt0")[2:] or 0)
+        return {"Title": f"Mock Movie {movie_id}", "Year": "2000", "Rated": "G", "Released": "01 Jan 2000",
+                "Runtime": "90 min", "Genre": "Animation", "Director": "A. Director", "Writer": "A. Writer",
+                "Actors": "A, B, C", "Plot": "A plot.", "Language": "English", "Country": "USA",
+                "Awards": "N/A", "Poster": "N/A",
+                "Ratings": [{"Source": "Internet Movie Database", "Value": "7.1/10"}, {"Source": "Metacritic", "Value": "66/100"}],
+                "Metascore": "66", "imdbRating": "7.1", "imdbVotes": "12,345", "imdbID": query.get("i"),
+                "Type": "movie", "DVD": "N/A", "BoxOffice": f"${movie_id * 250000:,}", "Production": "N/A",
+                "Website": "N/A", "Response": "True"}
+
+    def wikidata(self, query):
+        entities = {}
+        for wikidata_id in query.get("ids", "").split("|"):
+            entities[wikidata_id] = {
+                "id": wikidata_id,
+                "claims": {"P345": [{"mainsnak": {"datavalue": {"value": f"tt{int(wikidata_id[1:]):07d}"}}}]},
+                "sitelinks": {"enwiki": {"site": "enwiki", "title": f"Mock Movie {wikidata_id[1:]}",
+                                         "url": f"https://en.wikipedia.org/wiki/Mock_Movie_{wikidata_id[1:]}"}},
+            }
+        return {"entities": entities}
+
+    def wikipedia(self, path, query):
+        if path.startswith("/api/rest_v1/page/summary/"):
+            title = path.rsplit("/", 1)[-1]
+            return {"title": title, "extract": f"{title} is a synthetic film.",
+                    "content_urls": {"desktop": {"page": f"https://en.wikipedia.org/wiki/{title}"}}}
+        if query.get("list") == "search":
+            return {"query": {"search": [{"title": query.get("srsearch", "")}]}}
+        pages = [{"title": title, "extract": f"{title} is a synthetic film.",
+                  "fullurl": f"https://en.wikipedia.org/wiki/{title.replace(' ', '_')}"}
+                 for title in query.get("titles", "").split("|") if title]
+        return {"query": {"pages": pages}}
+
+
+class RoutedSession:
+    """Hülle um eine aiohttp-Session, die Requests an die echten Hosts auf den Mock-Server umleitet.
+
+    Der Request-Scheduler sieht weiterhin die Original-URL und drosselt pro echtem Upstream.
+    """
+
+    def __init__(self, session, base_url):
+        self.session = session
+        self.base_url = base_url
+
+    def get(self, url, **kwargs):
+        parts = urlsplit(url)
+        routed = f"{self.base_url}/{parts.hostname}{parts.path or '/'}"
+        if parts.query:
+            routed += f"?{parts.query}"
+        kwargs.pop("headers", None)  # Keine Revalidierung gegen den Mock
+        return self.session.get(routed, **kwargs)
+
+    def __getattr__(self, name):
+        return getattr(self.session, name)
+
+    async def __aenter__(self):
+        await self.session.__aenter__()
+        return self
+
+    async def __aexit__(self, *exc_info):
+        return await self.session.__aexit__(*exc_info)
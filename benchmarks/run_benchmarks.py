@@ -0,0 +1,302 @@
+"""Offline-Benchmarks für die Crawler-Pipeline gegen einen lokalen Mock-Upstream.
+
+Beispiele:
+    python benchmarks/run_benchmarks.py                       # alle Szenarien, mongomock, 2000 Filme
+    python benchmarks/run_benchmarks.py creation --movies 5000 --latency-ms 80 --error-rate 0.02
+    python benchmarks/run_benchmarks.py update --rate-limit 30 --json bench.json
+    python benchmarks/run_benchmarks.py imdb_datasets --movies 20000 --imdb-noise 50
+    python benchmarks/run_benchmarks.py --mongo-uri mongodb://localhost:27017/movieBench
+
+Mit `--mongo-uri` wird die angegebene Datenbank zu Beginn jedes Szenarios geleert, sie muss daher eine eigene
+Benchmark-Datenbank sein.
+"""
+import argparse
+import asyncio
+import gzip
+import json
+import os
+import resource
+import sys
+import tempfile
+import time
+
+# Vor den Projekt-Imports: keine echten Keys, kein HTTP-Cache und eine frische Kontingent-Datei je Lauf (sonst wäre
+# das Tageskontingent der Mock-Keys nach einigen Läufen erschöpft und OMDb würde stillschweigend übersprungen)
+WORKDIR = tempfile.mkdtemp(prefix="benchmark_")
+os.environ.update({
+    "TMDB_API_KEY": "benchmark",
+    "OMDB_API_KEY": "benchmark",
+    "http_cache": "off",
+    "omdb_usage_path": os.path.join(WORKDIR, "omdb_usage.json"),
+    "crawl_mode": "full",
+    "metrics_port": "0",
+})
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.append(ROOT)
+sys.path.append(os.path.join(ROOT, "Data"))
+import metrics
+import API_call.http_session as http_session
+import database_creation as dc
+import update_missed_imdb_dataset as missed
+import imdb_title_index as title_index
+import imdb_datasets
+import indexes
+import analytics
+import Data.analytics
+from logger import logger
+from benchmarks.mock_upstream import MockUpstream, UpstreamBehavior, RoutedSession, discover_result
+
+SCENARIOS = ("creation", "update", "missed_imdb", "imdb_datasets")
+MOVIES_COLLECTION = "children_movies"
+
+
+class MockMongoContext:
+    """Ersetzt MongoDBContext durch eine In-Memory-Datenbank (mongomock_motor), die über Szenarien hinweg bleibt."""
+    client = None
+
+    def __init__(self, uri=None, ensure_indexes=True):
+        pass
+
+    async def __aenter__(self):
+        if MockMongoContext.client is None:
+            from mongomock_motor import AsyncMongoMockClient
+            MockMongoContext.client = AsyncMongoMockClient()
+        return MockMongoContext.client, MockMongoContext.client["movieBench"]
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        pass
+
+
+async def _skip_analytics(db, movie_ids):
+    """mongomock kennt `$merge` nicht; die Analytics-Aktualisierung wird im Mock-Modus übersprungen."""
+
+
+def install_seams(upstream, mongo_uri):
+    """Leitet alle Sessions auf den Mock-Upstream um und wählt die Datenbank für die Szenarien."""
+    create_session = http_session.create_session
+
+    def routed_session(**kwargs):
+        # Alle Upstreams liegen hier auf demselben Host, das Pro-Host-Limit würde sie gemeinsam deckeln
+        kwargs.setdefault("limit_per_host", 0)
+        return RoutedSession(create_session(**kwargs), upstream.base_url)
+
+    http_session.create_session = routed_session
+    if mongo_uri:
+        os.environ["mongo_uri"] = mongo_uri
+    else:
+        dc.MongoDBC.MongoDBContext = MockMongoContext
+        analytics.refresh_for_movies = Data.analytics.refresh_for_movies = _skip_analytics
+
+
+async def open_db():
+    context = dc.MongoDBC.MongoDBContext(os.getenv("mongo_uri"), ensure_indexes=False)
+    client, db = await context.__aenter__()
+    return context, db
+
+
+async def reset_db():
+    context, db = await open_db()
+    try:
+        if db.name == "movieDB":
+            raise SystemExit("Refusing to benchmark against the default database movieDB, use a dedicated one.")
+        for name in await db.list_collection_names():
+            await db.drop_collection(name)
+    finally:
+        await context.__aexit__(None, None, None)
+
+
+async def count_movies(query=None):
+    context, db = await open_db()
+    try:
+        return await db[MOVIES_COLLECTION].count_documents(query or {})
+    finally:
+        await context.__aexit__(None, None, None)
+
+
+async def seed_movies(count, status, with_imdb):
+    """Legt `count` Filme aus dem Mock-Katalog mit dem gegebenen Anreicherungsstatus an."""
+    context, db = await open_db()
+    try:
+        documents = []
+        for movie_id in range(1, count + 1):
+            movie = {**discover_result(movie_id), "enrichment_status": status}
+            if with_imdb:
+                movie.update(imdb_id=f"tt{movie_id:07d}", wikidata_id=f"Q{movie_id}")
+            documents.append(movie)
+        await db[MOVIES_COLLECTION].insert_many(documents)
+    finally:
+        await context.__aexit__(None, None, None)
+
+
+def write_title_basics(path, count, noise):
+    """Synthetische title.basics.tsv.gz: jeder Mock-Film plus `noise` fremde Titel pro Film."""
+    columns = ["tconst", "titleType", "primaryTitle", "originalTitle", "isAdult", "startYear", "endYear",
+               "runtimeMinutes", "genres"]
+    with gzip.open(path, "wt", encoding="utf-8") as tsv:
+        tsv.write("\t".join(columns) + "\n")
+        for movie_id in range(1, count + 1):
+            movie = discover_result(movie_id)
+            year = movie["release_date"][:4]
+            tsv.write(f"tt{movie_id:07d}\tmovie\t{movie['title']}\t{movie['title']}\t0\t{year}\t\\N\t90\tFamily\n")
+            for n in range(noise):
+                tconst = 9000000 + movie_id * noise + n
+                title_type = "tvEpisode" if n % 2 else "movie"
+                tsv.write(f"tt{tconst}\t{title_type}\tOther Title {movie_id}-{n}\tOther Title\t0\t{year}\t\\N\t\\N\t\\N\n")
+
+
+def write_title_ratings(path, count, noise):
+    """Synthetische title.ratings.tsv.gz passend zu `write_title_basics`."""
+    with gzip.open(path, "wt", encoding="utf-8") as tsv:
+        tsv.write("tconst\taverageRating\tnumVotes\n")
+        for movie_id in range(1, count + 1):
+            tsv.write(f"tt{movie_id:07d}\t{5 + movie_id % 50 / 10:.1f}\t{movie_id * 7}\n")
+            for n in range(noise):
+                tsv.write(f"tt{9000000 + movie_id * noise + n}\t6.0\t10\n")
+
+
+# ------------------ Szenarien ------------------
+
+async def run_creation(args):
+    os.environ.update({
+        "discovery_mode": args.discovery,
+        "discover_start_year": "1990",
+        "num_pages_tmdb": str(-(-args.movies // 20)),
+    })
+    await dc.main_creation()
+    return await count_movies()
+
+
+async def run_update(args):
+    await seed_movies(args.movies, indexes.STATUS_PENDING_OMDB, with_imdb=True)
+    os.environ["imdb_ratings_path"] = os.path.join(WORKDIR, "missing_ratings.tsv.gz")
+    await dc.main_update()  # Ohne Ratings-Datei: alle Filme über OMDb
+    return await count_movies({"enrichment_status": indexes.STATUS_COMPLETE})
+
+
+async def run_missed_imdb(args):
+    with tempfile.TemporaryDirectory() as workdir:
+        file_path = os.path.join(workdir, "title.basics.tsv.gz")
+        write_title_basics(file_path, args.movies, args.imdb_noise)
+        with metrics.timer("stage_seconds", stage="imdb_index_build"):
+            title_index.build_title_index(file_path)
+        await seed_movies(args.movies, indexes.STATUS_PENDING_IMDB, with_imdb=False)
+        context, db = await open_db()
+        try:
+            await missed.get_missed_imdb_ids(db[MOVIES_COLLECTION], file_path)
+        finally:
+            await context.__aexit__(None, None, None)
+        title_index._load_title_index.cache_clear()
+    return await count_movies({"enrichment_status": indexes.STATUS_PENDING_OMDB})
+
+
+async def run_imdb_datasets(args):
+    with tempfile.TemporaryDirectory() as workdir:
+        basics_path = os.path.join(workdir, "title.basics.tsv.gz")
+        ratings_path = os.path.join(workdir, "title.ratings.tsv.gz")
+        write_title_basics(basics_path, args.movies, args.imdb_noise)
+        write_title_ratings(ratings_path, args.movies, args.imdb_noise)
+        await seed_movies(args.movies, indexes.STATUS_PENDING_OMDB, with_imdb=True)
+        context, db = await open_db()
+        try:
+            await imdb_datasets.enrich_from_imdb_datasets(db[MOVIES_COLLECTION], ratings_path, basics_path)
+        finally:
+            await context.__aexit__(None, None, None)
+    return await count_movies({"enrichment_status": indexes.STATUS_PENDING_OMDB_EXTRAS})
+
+
+RUNNERS = {"creation": run_creation, "update": run_update, "missed_imdb": run_missed_imdb,
+           "imdb_datasets": run_imdb_datasets}
+
+# ------------------ Auswertung ------------------
+
+def _series(name, label):
+    return {dict(labels).get(label, "-"): histogram
+            for labels, histogram in metrics.registry.histograms.get(name, {}).items()}
+
+
+def scenario_report(name, elapsed, movies, upstream):
+    registry = metrics.registry
+    discover = _series("stage_seconds", "stage").get("discover_page")
+    pages = discover.count if discover else 0
+    latencies = {}
+    for metric, label in (("stage_seconds", "stage"), ("http_request_seconds", "upstream"),
+                          ("scheduler_wait_seconds", "upstream"), ("json_decode_seconds", "upstream"),
+                          ("db_write_seconds", "collection")):
+        for key, histogram in sorted(_series(metric, label).items()):
+            latencies[f"{metric}[{key}]"] = {"count": histogram.count,
+                                             "p50_ms": round(histogram.quantile(0.5) * 1000, 1),
+                                             "p99_ms": round(histogram.quantile(0.99) * 1000, 1),
+                                             "max_ms": round(histogram.max * 1000, 1)}
+    responses = {f"{dict(labels)['upstream']}:{dict(labels)['status']}": int(value)
+                 for labels, value in registry.counters.get("http_responses_total", {}).items()}
+    return {
+        "scenario": name,
+        "seconds": round(elapsed, 2),
+        "movies": movies,
+        "movies_per_sec": round(movies / elapsed, 1) if elapsed else 0.0,
+        "pages": pages,
+        "pages_per_sec": round(pages / elapsed, 1) if elapsed else 0.0,
+        "peak_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),  # Linux: KiB
+        "upstream_requests": dict(upstream.requests),
+        "http_responses": responses,
+        "latencies": latencies,
+    }
+
+
+def print_report(report):
+    print(f"\n== {report['scenario']}: {report['seconds']}s, {report['movies']} movies "
+          f"({report['movies_per_sec']}/s), {report['pages']} pages ({report['pages_per_sec']}/s), "
+          f"peak RSS {report['peak_rss_mb']} MB")
+    print(f"   upstream requests: {report['upstream_requests']}")
+    print(f"   {'series':<45}{'n':>8}{'p50 ms':>10}{'p99 ms':>10}{'max ms':>10}")
+    for series, values in report["latencies"].items():
+        print(f"   {series:<45}{values['count']:>8}{values['p50_ms']:>10}{values['p99_ms']:>10}{values['max_ms']:>10}")
+
+
+async def main(args):
+    behavior = UpstreamBehavior(catalog_size=args.movies, latency_ms=args.latency_ms, jitter_ms=args.jitter_ms,
+                                error_rate=args.error_rate, rate_limit=args.rate_limit, seed=args.seed)
+    upstream = await MockUpstream(behavior).start()
+    install_seams(upstream, args.mongo_uri)
+    reports = []
+    try:
+        for name in args.scenarios or SCENARIOS:
+            await reset_db()
+            metrics.registry.reset()
+            upstream.requests.clear()
+            started = time.perf_counter()
+            movies = await RUNNERS[name](args)
+            reports.append(scenario_report(name, time.perf_counter() - started, movies, upstream))
+            print_report(reports[-1])
+    finally:
+        await upstream.stop()
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as out:
+            json.dump(reports, out, indent=2)
+        logger.info(f"Benchmark results written to {args.json}")
+    return reports
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Offline-Benchmarks der Crawler-Pipeline gegen einen Mock-Upstream.")
+    parser.add_argument("scenarios", nargs="*", help=f"Szenarien aus {', '.join(SCENARIOS)} (Standard: alle)")
+    parser.add_argument("--movies", type=int, default=2000, help="Größe des Mock-Katalogs bzw. der Seed-Daten")
+    parser.add_argument("--latency-ms", type=float, default=30.0)
+    parser.add_argument("--jitter-ms", type=float, default=20.0)
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Anteil der Antworten mit HTTP 500")
+    parser.add_argument("--rate-limit", type=float, default=0.0, help="Requests/s je Host, darüber 429 mit Retry-After")
+    parser.add_argument("--discovery", choices=["partitioned", "pages"], default="partitioned")
+    parser.add_argument("--imdb-noise", type=int, default=20, help="Fremde IMDb-Titel pro Mock-Film")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--mongo-uri", help="Echte Benchmark-Datenbank statt mongomock (wird geleert!)")
+    parser.add_argument("--json", help="Ergebnisse zusätzlich als JSON schreiben")
+    args = parser.parse_args(argv)
+    unknown = set(args.scenarios) - set(SCENARIOS)
+    if unknown:
+        parser.error(f"unknown scenarios: {', '.join(sorted(unknown))}")
+    return args
+
+
+if __name__ == "__main__":
+    asyncio.run(main(parse_args()))
@@ -0,0 +1,185 @@
+import os
+import time
+from bisect import bisect_left
+from collections import defaultdict
+from functools import wraps
+
+from logger import logger
+
+# Obergrenzen der Latenz-Buckets in Sekunden
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+
+class Histogram:
+    """Feste Buckets wie bei Prometheus; Quantile werden aus den Buckets geschätzt."""
+
+    __slots__ = ("buckets", "counts", "count", "sum", "max")
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # letzter Eintrag: +Inf
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+        self.max = max(self.max, value)
+
+    def quantile(self, q):
+        """Obergrenze des Buckets, in dem das Quantil liegt (bzw. das Maximum im +Inf-Bucket)."""
+        if not self.count:
+            return 0.0
+        rank, seen = q * self.count, 0
+        for index, count in enumerate(self.counts):
+            seen += count
+            if seen >= rank:
+                return min(self.buckets[index], self.max) if index < len(self.buckets) else self.max
+        return self.max
+
+
+def _labels(labels):
+    return tuple(sorted(labels.items()))
+
+
+def _format_labels(labels, extra=()):
+    pairs = list(labels) + list(extra)
+    return "{" + ",".join(f'{key}="{value}"' for key, value in pairs) + "}" if pairs else ""
+
+
+class MetricsRegistry:
+    """Histogramme, Zähler und Gauges je Name und Labels, für Laufzusammenfassung und Prometheus-Export."""
+
+    def __init__(self):
+        self.histograms = defaultdict(dict)
+        self.counters = defaultdict(lambda: defaultdict(float))
+        self.gauges = defaultdict(lambda: defaultdict(float))
+        self.started = time.monotonic()
+
+    def observe(self, name, value, **labels):
+        key = _labels(labels)
+        histogram = self.histograms[name].get(key)
+        if histogram is None:
+            histogram = self.histograms[name][key] = Histogram()
+        histogram.observe(value)
+
+    def inc(self, name, amount=1, **labels):
+        self.counters[name][_labels(labels)] += amount
+
+    def gauge_add(self, name, delta, **labels):
+        self.gauges[name][_labels(labels)] += delta
+
+    def reset(self):
+        self.__init__()
+
+    def summary(self):
+        """Lesbare Zusammenfassung für das Ende eines Laufs."""
+        lines = [f"Run metrics after {time.monotonic() - self.started:.1f}s:"]
+        for name, series in sorted(self.histograms.items()):
+            for labels, histogram in sorted(series.items()):
+                lines.append(f"  {name}{_format_labels(labels)}: n={histogram.count} "
+                             f"total={histogram.sum:.2f}s mean={histogram.sum / histogram.count * 1000:.0f}ms "
+                             f"p50<={histogram.quantile(0.5) * 1000:.0f}ms p95<={histogram.quantile(0.95) * 1000:.0f}ms "
+                             f"max={histogram.max * 1000:.0f}ms")
+        for name, series in sorted(self.counters.items()):
+            for labels, value in sorted(series.items()):
+                lines.append(f"  {name}{_format_labels(labels)}: {value:g}")
+        return "\n".join(lines)
+
+    def prometheus_text(self):
+        """Prometheus Text-Exposition-Format (Version 0.0.4)."""
+        lines = []
+        for name, series in sorted(self.histograms.items()):
+            lines.append(f"# TYPE {name} histogram")
+            for labels, histogram in sorted(series.items()):
+                cumulative = 0
+                for bound, count in zip(list(histogram.buckets) + ["+Inf"], histogram.counts):
+                    cumulative += count
+                    lines.append(f"{name}_bucket{_format_labels(labels, [('le', bound)])} {cumulative}")
+                lines.append(f"{name}_sum{_format_labels(labels)} {histogram.sum}")
+                lines.append(f"{name}_count{_format_labels(labels)} {histogram.count}")
+        for kind, metrics in (("counter", self.counters), ("gauge", self.gauges)):
+            for name, series in sorted(metrics.items()):
+                lines.append(f"# TYPE {name} {kind}")
+                for labels, value in sorted(series.items()):
+                    lines.append(f"{name}{_format_labels(labels)} {value:g}")
+        return "\n".join(lines) + "\n"
+
+
+registry = MetricsRegistry()
+
+
+class timer:
+    """`with timer("db_write_seconds", collection="x"):` misst die Dauer des Blocks in ein Histogramm."""
+
+    __slots__ = ("name", "labels", "started")
+
+    def __init__(self, name, **labels):
+        self.name = name
+        self.labels = labels
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        registry.observe(self.name, time.perf_counter() - self.started, **self.labels)
+
+
+def timed_stage(stage, failed=None):
+    """Dekorator für async Pipeline-Stufen: Latenz-Histogramm `stage_seconds`, laufende Aufrufe, Fehler.
+
+    Die meisten Stufen fangen ihre Fehler selbst ab und geben einen Fehlerwert zurück (`{}`, `[]`, None);
+    `failed(result)` erkennt diesen, damit auch solche Fehler in `stage_errors_total` zählen.
+    """
+    def decorator(func):
+        @wraps(func)
+        async def wrapper(*args, **kwargs):
+            registry.gauge_add("stage_in_flight", 1, stage=stage)
+            started = time.perf_counter()
+            try:
+                result = await func(*args, **kwargs)
+                if failed is not None and failed(result):
+                    registry.inc("stage_errors_total", stage=stage)
+                return result
+            except Exception:
+                registry.inc("stage_errors_total", stage=stage)
+                raise
+            finally:
+                registry.observe("stage_seconds", time.perf_counter() - started, stage=stage)
+                registry.gauge_add("stage_in_flight", -1, stage=stage)
+        return wrapper
+    return decorator
+
+
+def log_summary():
+    logger.info(registry.summary())
+
+
+async def serve(port=None):
+    """Startet im Langlauf-Modus einen `/metrics`-Endpoint (Port aus `metrics_port`); gibt den Runner zurück.
+
+    Standardmäßig nur lokal erreichbar; `metrics_host=0.0.0.0` öffnet ihn z. B. für einen Prometheus-Server im Netz.
+    """
+    port = port or int(os.getenv('metrics_port', 0))
+    host = os.getenv('metrics_host', '127.0.0.1')
+    if not port:
+        return None
+    from aiohttp import web
+
+    async def handle(request):
+        return web.Response(text=registry.prometheus_text(), content_type="text/plain", charset="utf-8")
+
+    app = web.Application()
+    app.router.add_get("/metrics", handle)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    try:
+        await web.TCPSite(runner, host, port).start()
+    except OSError:  # z. B. Port belegt: Runner nicht offen lassen
+        await runner.cleanup()
+        raise
+    logger.info(f"Metrics endpoint on http://{host}:{port}/metrics")
+    return runner
@@ -0,0 +1,52 @@
+import os
+import sys
+import tempfile
+
+import pytest
+
+# Vor den Projekt-Imports: keine echten Keys, kein HTTP-Cache, eigene Kontingent-Datei (wie benchmarks/run_benchmarks.py)
+os.environ.update({
+    "TMDB_API_KEY": "test",
+    "OMDB_API_KEY": "test",
+    "http_cache": "off",
+    "omdb_usage_path": os.path.join(tempfile.mkdtemp(prefix="tests_"), "omdb_usage.json"),
+    "metrics_port": "0",
+})
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.append(ROOT)
+sys.path.append(os.path.join(ROOT, "Data"))
+
+
+@pytest.fixture
+def db():
+    """Frische In-Memory-Datenbank (mongomock_motor) je Test."""
+    from mongomock_motor import AsyncMongoMockClient
+    return AsyncMongoMockClient()["tests"]
+
+
+@pytest.fixture(autouse=True)
+def no_analytics(monkeypatch):
+    """mongomock kennt `$merge` nicht; die Analytics-Aktualisierung wird in den Tests übersprungen."""
+    import Data.analytics
+
+    async def skip(db, movie_ids):
+        return None
+
+    monkeypatch.setattr(Data.analytics, "refresh_for_movies", skip)
+
+
+@pytest.fixture
+def upstreams(monkeypatch):
+    """TMDb-Details und Wikipedia ohne HTTP; OMDb ersetzt der jeweilige Test (Key-Pool oder `fetch_omdb`)."""
+    import API_call.get_Data_API_movie as api_movies
+    from Data.movie_model import WikipediaRecord
+
+    async def details(session, tmdb_id):
+        return {"status": "Released"}
+
+    async def wikipedia(session, title, wikidata_id):
+        return WikipediaRecord(description="Description")
+
+    monkeypatch.setattr(api_movies, "get_more_informations", details)
+    monkeypatch.setattr(api_movies, "resolve_wikipedia", wikipedia)
@@ -0,0 +1,48 @@
+import asyncio
+
+import database_creation as dc
+
+import API_call.get_Data_API_movie as api_movies
+
+
+def store_page(db, page):
+    async def run():
+        checkpoint = await dc.cp.CrawlCheckpoint(db).load()
+        async with dc.mw.MovieWriter(db["children_movies"], 10, 0.1) as writer:
+            await dc.store_data_mongo_local(None, writer, page, 20, checkpoint)
+        return checkpoint, await dc.cp.CrawlCheckpoint(db).load()
+    return asyncio.run(run())
+
+
+def test_failed_discover_page_is_not_checkpointed(db, monkeypatch):
+    async def failing_fetch(session, page, limit=20, partition=None):
+        return {}  # fetch_data nach allen Versuchen
+
+    monkeypatch.setattr(api_movies, "fetch_discover_page", failing_fetch)
+    checkpoint, reloaded = store_page(db, 7)
+
+    assert not checkpoint.is_page_done(7)
+    assert not reloaded.is_page_done(7)
+
+
+def test_page_without_new_movies_is_checkpointed(db, monkeypatch):
+    async def empty_page(session, page, limit=20, partition=None):
+        return {"page": page, "results": [], "total_pages": 1}
+
+    monkeypatch.setattr(api_movies, "fetch_discover_page", empty_page)
+    checkpoint, reloaded = store_page(db, 3)
+
+    assert checkpoint.is_page_done(3)
+    assert reloaded.is_page_done(3)
+
+
+def test_pages_of_unplanned_partitions_are_pruned(db):
+    async def run():
+        checkpoint = await dc.cp.CrawlCheckpoint(db).load()
+        await checkpoint.mark_page_done("2000-01-01..2015-12-31:1", "2000-01-01..2015-12-31")
+        await checkpoint.mark_page_done("2016-01-01..:1", "2016-01-01..")
+        await checkpoint.prune_pages(["2016-01-01.."])
+        return await dc.cp.CrawlCheckpoint(db).load()
+
+    reloaded = asyncio.run(run())
+    assert reloaded.pages_completed == {"2016-01-01..:1"}
@@ -0,0 +1,59 @@
+import asyncio
+import gzip
+
+import database_creation as dc
+
+import API_call.get_Data_API_movie as api_movies
+import Data.imdb_datasets as imdb_datasets
+import Data.indexes as indexes
+
+
+def write_tsv(path, header, rows):
+    with gzip.open(path, "wt", encoding="utf-8") as tsv:
+        tsv.write("\t".join(header) + "\n")
+        for row in rows:
+            tsv.write("\t".join(row) + "\n")
+
+
+def test_dataset_join_keeps_movies_out_of_the_omdb_pass(db, tmp_path, upstreams, monkeypatch):
+    ratings = tmp_path / "title.ratings.tsv.gz"
+    basics = tmp_path / "title.basics.tsv.gz"
+    write_tsv(ratings, ["tconst", "averageRating", "numVotes"],
+              [["tt0000001", "7.5", "1200"], ["tt0000002", "6.1", "80"], ["tt0000099", "9.9", "5"]])
+    write_tsv(basics, ["tconst", "titleType", "primaryTitle", "startYear", "runtimeMinutes"],
+              [["tt0000001", "movie", "A", "1995", "81"], ["tt0000002", "movie", "B", "2001", "\\N"]])
+    omdb_calls = []
+
+    async def fetch_omdb(session, imdb_id):
+        omdb_calls.append(imdb_id)
+        return None
+
+    monkeypatch.setattr(api_movies, "fetch_omdb", fetch_omdb)
+    monkeypatch.delenv("omdb_fetch_extras", raising=False)
+
+    async def run():
+        collection = db["children_movies"]
+        await collection.insert_many([
+            {"id": 1, "title": "A", "imdb_id": "tt0000001", "enrichment_status": "pending_omdb"},
+            {"id": 2, "title": "B", "imdb_id": "tt0000002", "enrichment_status": "pending_omdb"},
+            {"id": 3, "title": "C", "imdb_id": "tt0000003", "enrichment_status": "pending_omdb"},
+        ])
+        updated = await imdb_datasets.enrich_from_imdb_datasets(collection, str(ratings), str(basics), batch_size=2)
+        await dc.database_operation.update_movie_details_in_db(None, collection, workers=1, batch_size=10)
+        return updated, {movie["id"]: movie async for movie in collection.find({}, {"_id": 0})}
+
+    updated, stored = asyncio.run(run())
+
+    assert updated == 2
+    assert stored[1]["omdb_details"] == {"imdbRating": 7.5, "imdbVotes": 1200, "Runtime": 81, "Year": "1995"}
+    assert stored[2]["omdb_details"] == {"imdbRating": 6.1, "imdbVotes": 80, "Year": "2001"}
+    assert stored[1]["enrichment_status"] == stored[2]["enrichment_status"] == indexes.STATUS_PENDING_OMDB_EXTRAS
+    # Nur der Film ohne Dataset-Treffer kostet einen OMDb-Request
+    assert omdb_calls == ["tt0000003"]
+
+
+def test_omdb_extras_only_on_request(monkeypatch):
+    monkeypatch.delenv("omdb_fetch_extras", raising=False)
+    assert indexes.STATUS_PENDING_OMDB_EXTRAS not in indexes.pending_statuses()
+    monkeypatch.setenv("omdb_fetch_extras", "on")
+    assert indexes.STATUS_PENDING_OMDB_EXTRAS in indexes.pending_statuses()
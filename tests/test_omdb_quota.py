@@ -0,0 +1,61 @@
+import asyncio
+
+import pytest
+
+import database_creation as dc
+
+import API_call.get_Data_API_movie as api_movies
+from API_call.omdb_key_pool import OmdbKeyPool
+
+DATASET_DETAILS = {"imdbRating": 7.1, "imdbVotes": 100, "Runtime": 90, "Year": "2000"}
+
+
+@pytest.fixture
+def exhausted_pool(tmp_path, monkeypatch):
+    pool = OmdbKeyPool(["key"], daily_limit=1, usage_path=str(tmp_path / "usage.json"))
+    pool.acquire()  # Tageskontingent verbraucht
+    monkeypatch.setattr(api_movies, "get_key_pool", lambda: pool)
+    return pool
+
+
+@pytest.fixture(autouse=True)
+def with_extras(monkeypatch):
+    monkeypatch.setenv("omdb_fetch_extras", "on")  # Auch die Dataset-Filme durchlaufen den OMDb-Pass
+
+
+def update_pass(db, movies):
+    async def run():
+        collection = db["children_movies"]
+        await collection.insert_many(movies)
+        await dc.database_operation.update_movie_details_in_db(None, collection, workers=1, batch_size=10)
+        return {movie["id"]: movie async for movie in collection.find({}, {"_id": 0})}
+    return asyncio.run(run())
+
+
+def test_fetch_omdb_returns_none_when_keys_are_exhausted(exhausted_pool):
+    assert asyncio.run(api_movies.fetch_omdb(None, "tt0000001")) is None
+
+
+def test_key_exhaustion_does_not_overwrite_or_complete_movies(db, exhausted_pool, upstreams):
+    stored = update_pass(db, [
+        {"id": 1, "title": "A", "imdb_id": "tt0000001", "enrichment_status": "pending_omdb"},
+        {"id": 2, "title": "B", "imdb_id": "tt0000002", "enrichment_status": "pending_omdb_extras",
+         "omdb_details": dict(DATASET_DETAILS)},
+    ])
+
+    assert stored[1]["enrichment_status"] == "pending_omdb"
+    assert "omdb_details" not in stored[1]
+    assert stored[2]["enrichment_status"] == "pending_omdb_extras"
+    assert stored[2]["omdb_details"] == DATASET_DETAILS
+
+
+def test_movie_not_found_keeps_existing_details(db, upstreams, monkeypatch):
+    async def not_found(session, imdb_id):
+        return {"Response": "False", "Error": "Movie not found!"}
+
+    monkeypatch.setattr(api_movies, "fetch_omdb", not_found)
+    stored = update_pass(db, [{"id": 2, "title": "B", "imdb_id": "tt0000002", "enrichment_status": "pending_omdb_extras",
+                               "omdb_details": dict(DATASET_DETAILS)}])
+
+    assert stored[2]["omdb_details"] == {**DATASET_DETAILS, "fallback_title": "B"}
+    assert stored[2]["enrichment_status"] == "complete"
@@ -1,14 +1,13 @@
-def get_title_abstract(film_title):
-    replacements = {":": "%3A", ".": "%2E", "'": "%27", ",":"%2C", "?":"%3F", "&":"%26", "!":"", 
-                    "?":"","é":"%C3%A9"}  # Mapping characters to their replacements
-    film_title_list = film_title.split()
-    
-    # Replace characters in each word
-    for index in range(0,len(film_title_list)):
-        for old, new in replacements.items():
-            film_title_list[index] = film_title_list[index].replace(old, new)
+import re
+import unicodedata
+import urllib.parse
+
+_NON_ALNUM = re.compile(r"[\W_]+")
 
-    return '_'.join(film_title_list)
+
+def get_title_abstract(film_title):
+    """Artikeltitel als URL-Pfadsegment für die Wikipedia-REST-API ("Cars 3" -> "Cars_3", ":" -> "%3A", ...)."""
+    return urllib.parse.quote(film_title.strip().replace(" ", "_"), safe="")
 
 # 🔹 Tests:
 
@@ -50,7 +49,7 @@ def update_movie_details_in_db(db, imdb_id, movie_data):
     # Speichern in MongoDB
     result = collection.update_one(
         {"imdb_id": imdb_id}, 
-        {"$set": {"omdb_details": movie_data}}, 
+        {"$set": {"omdb_details": movie_data}, "$currentDate": {"updated_at": True}},
         upsert=True
     )
 
@@ -58,7 +57,8 @@ def update_movie_details_in_db(db, imdb_id, movie_data):
         collection.update_one(
             {"imdb_id": imdb_id},
             {"$set": {"wikipedia_Description": movie_data["wikipedia_Description"],
-                      "wiki_page": movie_data["wiki_page"]}},
+                      "wiki_page": movie_data["wiki_page"]},
+             "$currentDate": {"updated_at": True}},
             upsert=True
         )
         logger.info(f"Wikipedia-Beschreibung für {imdb_id} wurde gespeichert.")
@@ -108,3 +108,18 @@ def update_movie_details_in_db(db, imdb_id, movie_data):
 #     return key
 
 
+
+
+def normalize_title(title):
+    """Normalisiert einen Filmtitel für Vergleiche: Akzente, Groß-/Kleinschreibung und Satzzeichen werden entfernt."""
+    if not title:
+        return ""
+    decomposed = unicodedata.normalize("NFKD", str(title))
+    without_accents = "".join(char for char in decomposed if not unicodedata.combining(char))
+    cleaned = _NON_ALNUM.sub(" ", without_accents.casefold().replace("&", " and "))
+    return " ".join(cleaned.split())
+
+# 🔹 Tests:
+
+#print(normalize_title("Pokémon 3 the Movie: Spell of the Unown"))  # ➝ "pokemon 3 the movie spell of the unown"
+#print(normalize_title("Miraculous: Tales of Ladybug & Cat Noir"))  # ➝ "miraculous tales of ladybug and cat noir"